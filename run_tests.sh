@@ -10,17 +10,24 @@ mkdir -p logs
 # 使用固定的日志文件名
 LOG_FILE="logs/test_output.log"
 FAILED_LOG="logs/test_failed.log"
+INDEX_FILE="logs/test_index.json"
 
 # 运行测试并将输出保存到日志文件
 echo "运行测试并将输出保存到: $LOG_FILE"
 zig build test 2>&1 | tee "$LOG_FILE"
 
-# 提取失败信息到单独的文件
+# 按测试切分日志、写入索引（保留历史，用于查询和统计不稳定的测试），失败的测试和第一条错误写到单独的文件
 echo "提取失败测试信息到: $FAILED_LOG"
-grep -A 10 "failed\|error:" "$LOG_FILE" > "$FAILED_LOG" 2>/dev/null || echo "没有找到失败的测试"
+if command -v python3 >/dev/null 2>&1; then
+    python3 scripts/test_log_index.py --index "$INDEX_FILE" index "$LOG_FILE" --quiet
+    python3 scripts/test_log_index.py --index "$INDEX_FILE" failed > "$FAILED_LOG"
+else
+    grep -A 10 "failed\|error:" "$LOG_FILE" > "$FAILED_LOG" 2>/dev/null || echo "没有找到失败的测试"
+fi
 
 echo ""
 echo "测试完成！"
 echo "完整日志: $LOG_FILE"
 echo "失败信息: $FAILED_LOG"
+echo "测试索引: $INDEX_FILE（python3 scripts/test_log_index.py failed / show / flaky 查询）"
 
@@ -3,47 +3,68 @@
 分析 element-rects.json，提取关键元素的矩形区域信息
 """
 
-import json
 import sys
 
-def find_elements(data, tag_name=None, class_name=None, text_content_substring=None):
-    """查找匹配的元素"""
-    found = []
-    for item in data:
-        elem = item['element']
-        rect = item['rect']
-        
-        match = True
-        if tag_name and elem['tagName'].lower() != tag_name.lower():
-            match = False
-        if class_name and class_name not in elem['className'].split():
-            match = False
-        if text_content_substring and text_content_substring not in elem['textContent']:
-            match = False
-        
-        if match:
-            found.append({
-                'element': elem,
-                'rect': rect
-            })
-    return found
+from element_store import ElementStore
+from query_server import run_cli
 
-def print_comparison():
-    """打印关键元素的对比信息"""
-    if len(sys.argv) < 2:
-        print("Usage: python3 analyze_rects.py <element-rects.json>")
+
+def print_region_elements(store, region):
+    """打印落在区域内（--at 时为包含该点）的所有元素"""
+    from spatial_index import region_positions
+
+    x, y, width, height = region
+    positions = region_positions(store.items, region, store.spatial_index())
+    print("=" * 80)
+    if width <= 0 or height <= 0:
+        print(f"包含点 ({x:.2f}, {y:.2f}) 的元素: {len(positions)}")
+    else:
+        print(f"与区域 ({x:.2f}, {y:.2f}) {width:.2f}x{height:.2f} 相交的元素: {len(positions)}")
+    print("=" * 80)
+    for pos in positions:
+        element_info = store.items[pos]['element']
+        rect = store.items[pos]['rect']
+        title = element_info['tagName']
+        if element_info.get('className'):
+            title += f".{'.'.join(element_info['className'].split())}"
+        if element_info.get('id'):
+            title += f"#{element_info['id']}"
+        print(f"\n【{title}】 index={element_info.get('index', '?')}")
+        print(f"  x: {rect['x']:.2f}px, y: {rect['y']:.2f}px")
+        print(f"  width: {rect['width']:.2f}px, height: {rect['height']:.2f}px")
+
+def print_comparison(argv=None, load=ElementStore.load):
+    """打印关键元素的对比信息
+
+    load: 加载导出的函数，常驻查询服务（query_server.py）传入带缓存的版本
+    """
+    # spatial_index 依赖 numpy，在入口里才导入：转发给查询服务的瘦客户端不需要它
+    from spatial_index import pop_region_args
+
+    if argv is None:
+        argv = sys.argv[1:]
+    try:
+        argv, region = pop_region_args(argv)
+    except ValueError as e:
+        print(f"Error: {e}")
         sys.exit(1)
+    if not argv:
+        print("Usage: python3 analyze_rects.py <element-rects.json> [--at X,Y | --region X,Y,W,H]")
+        sys.exit(1)
+    
+    json_file = argv[0]
+    store = load(json_file)
     
-    json_file = sys.argv[1]
-    with open(json_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    if region is not None:
+        print_region_elements(store, region)
+        return
     
     print("=" * 80)
     print("Chrome 元素矩形区域分析")
     print("=" * 80)
     
     # 1. HTML
-    html_elements = find_elements(data, 'HTML')
+    html_elements = store.find('HTML')
     if html_elements:
         html = html_elements[0]
         rect = html['rect']
@@ -52,7 +73,7 @@ def print_comparison():
         print(f"  width: {rect['width']:.2f}px, height: {rect['height']:.2f}px")
     
     # 2. BODY
-    body_elements = find_elements(data, 'BODY')
+    body_elements = store.find('BODY')
     if body_elements:
         body = body_elements[0]
         rect = body['rect']
@@ -62,7 +83,7 @@ def print_comparison():
         print(f"  (getBoundingClientRect 返回的是 border box)")
     
     # 3. 第一个 H1
-    h1_elements = find_elements(data, 'H1', None, 'ZBrowser功能测试页面')
+    h1_elements = store.find('H1', text_content_substring='ZBrowser功能测试页面')
     if h1_elements:
         h1 = h1_elements[0]
         rect = h1['rect']
@@ -77,7 +98,7 @@ def print_comparison():
         print(f"    content.height = border.height - border.vertical = {rect['height']:.2f} - 4 = {rect['height'] - 4:.2f}px")
     
     # 4. block-test
-    block_test_elements = find_elements(data, 'DIV', 'block-test')
+    block_test_elements = store.find('DIV', 'block-test')
     if block_test_elements:
         block_test = block_test_elements[0]
         rect = block_test['rect']
@@ -105,7 +126,7 @@ def print_comparison():
         print(f"  (应该是 h1 的 margin-bottom = 21.44px)")
 
 if __name__ == "__main__":
-    print_comparison()
+    run_cli('analyze_rects', print_comparison)
 
 
 
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+批量一致性测试：对整个页面语料库并行运行 ZBrowser，并与预先导出的 Chrome 数据对比
+
+语料库目录结构（每个页面一个子目录，子目录可以任意嵌套）：
+  corpus/
+    page-0001/
+      index.html                       # 或目录中唯一的 .html 文件
+      element-rects.json               # get_element_rects.js 的导出（或它的 .zbsnap 快照）
+      computed-styles-structured.json  # 可选，用于还原 border box
+
+每个页面在进程池里独立运行：启动 ZBrowser，把它的 stderr 直接流式送进
+zbrowser_log 解析器，再用 rect_diff 做整页对比。结果按完成顺序实时输出，
+最后汇总成一份文本报告（可选 JSON 报告）。
+指定 --cache-dir 时，HTML、ZBrowser 可执行文件和 Chrome 导出都没变的页面直接复用缓存的结果。
+
+用法: python3 batch_conformance.py <corpus_dir> [--binary zig-out/bin/zbrowser] [--jobs N] [--json report.json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from compare_rects import parse_zbrowser_boxes
+from dump_snapshot import dump_exists, open_dump
+from rect_diff import BOX_PROPERTIES, full_page_diff
+from result_cache import DEFAULT_SIZE_MB, ResultCache
+
+RECTS_FILE = 'element-rects.json'
+STYLES_FILE = 'computed-styles-structured.json'
+DEFAULT_BINARY = os.path.join('zig-out', 'bin', 'zbrowser')
+
+
+class Page(NamedTuple):
+    name: str
+    html: str
+    rects: str
+    styles: Optional[str]
+
+
+def _pick_html(dir_path, files):
+    """页面目录中的 HTML：优先 index.html，否则取唯一的 .html 文件"""
+    if 'index.html' in files:
+        return os.path.join(dir_path, 'index.html')
+    html_files = [name for name in files if name.endswith('.html')]
+    if len(html_files) == 1:
+        return os.path.join(dir_path, html_files[0])
+    return None
+
+
+def discover_pages(corpus_dir):
+    """找出语料库中所有带 Chrome 导出的页面，按名字排序"""
+    pages = []
+    for dir_path, dir_names, files in os.walk(corpus_dir):
+        dir_names.sort()
+        rects = os.path.join(dir_path, RECTS_FILE)
+        if not dump_exists(rects):
+            continue
+        html = _pick_html(dir_path, files)
+        if html is None:
+            print(f"Warning: 跳过 '{dir_path}'：没有 index.html 或唯一的 .html 文件", file=sys.stderr)
+            continue
+        styles = os.path.join(dir_path, STYLES_FILE)
+        name = os.path.relpath(dir_path, corpus_dir)
+        pages.append(Page(name, html, rects, styles if dump_exists(styles) else None))
+    return pages
+
+
+def _summarize_diff(result, rect_items, tolerance):
+    """把 full_page_diff() 的结果压缩成可序列化的统计信息"""
+    error = result['error']
+    stats = {
+        'matched': int(len(error)),
+        'unmatched': int(result['unmatched']),
+        'over_tolerance': int((error > tolerance).sum()),
+        'max_error': float(error[0]) if len(error) else 0.0,
+        'mean_abs': [float(v) for v in np.abs(result['deltas']).mean(axis=0)] if len(error) else [0.0] * 4,
+        'worst': None,
+    }
+    if len(error):
+        elem = rect_items[int(result['chrome_idx'][0])]['element']
+        stats['worst'] = {
+            'index': elem.get('index'),
+            'tag': elem.get('tagName', '').lower(),
+            'path': result['paths'][0],
+            'delta': [float(v) for v in result['deltas'][0]],
+        }
+    return stats
+
+
+def _png_path(page, png_dir):
+    return os.path.join(png_dir, page.name.replace(os.sep, '__') + '.png')
+
+
+def render_page(page, binary, timeout=120.0, png_dir=None):
+    """运行 ZBrowser 渲染一个页面，边运行边解析 stderr
+
+    返回 (盒子列表, 运行信息)；运行信息里 error 不为 None 时盒子列表不可用。
+    """
+    info = {'returncode': None, 'error': None}
+    with tempfile.TemporaryDirectory(prefix='zbrowser-') as tmp_dir:
+        png_path = _png_path(page, png_dir) if png_dir else os.path.join(tmp_dir, 'output.png')
+        try:
+            proc = subprocess.Popen([binary, os.path.abspath(page.html), png_path],
+                                    stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            info['error'] = f"无法启动 ZBrowser: {e}"
+            return None, info
+
+        # 超时后直接杀掉进程，stderr 随之结束，解析循环自然退出
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            proc.kill()
+
+        killer = threading.Timer(timeout, kill)
+        killer.start()
+        try:
+            boxes = parse_zbrowser_boxes(proc.stderr)
+        finally:
+            killer.cancel()
+            proc.stderr.close()
+            info['returncode'] = proc.wait()
+
+    if timed_out.is_set():
+        info['error'] = f"超时（{timeout:.0f}s）"
+    elif info['returncode'] != 0:
+        info['error'] = f"ZBrowser 退出码 {info['returncode']}"
+    return boxes, info
+
+
+def _error_result(page):
+    return {'page': page.name, 'html': page.html, 'status': 'error', 'returncode': 0, 'error': None}
+
+
+def _record_exception(result, what, e):
+    result['error'] = f"{what}: {type(e).__name__}: {e}"
+    result['traceback'] = traceback.format_exc()
+
+
+def page_result(future, page):
+    """取出 run_page 的 (结果, 盒子列表)；工作进程本身出错（崩溃、结果无法传回）时记成该页面出错"""
+    try:
+        return future.result()
+    except Exception as e:
+        result = _error_result(page)
+        _record_exception(result, "工作进程出错", e)
+        result['seconds'] = 0.0
+        return result, None
+
+
+def run_page(page, binary, tolerance=0.5, timeout=120.0, png_dir=None, boxes=None):
+    """运行单个页面并与 Chrome 导出对比
+
+    boxes 不为 None 时（渲染缓存命中）跳过渲染，直接对比。
+    返回 (结果 dict（可直接写入 JSON）, 盒子列表)。
+    出错时 status 为 'error'，error 为一行说明，异常的话 traceback 里是完整的调用栈。
+    """
+    started = time.monotonic()
+    result = _error_result(page)
+
+    if boxes is None:
+        try:
+            boxes, info = render_page(page, binary, timeout, png_dir)
+        except Exception as e:
+            _record_exception(result, "渲染失败", e)
+            result['seconds'] = round(time.monotonic() - started, 3)
+            return result, None
+        result.update(info)
+        if info['error'] is not None:
+            result['seconds'] = round(time.monotonic() - started, 3)
+            return result, None
+
+    # 任何异常都只让这一个页面出错：在工作进程里抛出的异常会由 future.result() 重新抛出，中止整个批次
+    try:
+        rect_items = open_dump(page.rects, ())
+        style_items = open_dump(page.styles, BOX_PROPERTIES) if page.styles else []
+        diff = full_page_diff(rect_items, style_items, boxes)
+        summary = _summarize_diff(diff, rect_items, tolerance)
+    except Exception as e:
+        _record_exception(result, "对比失败", e)
+        result['seconds'] = round(time.monotonic() - started, 3)
+        return result, boxes
+
+    result.update(summary)
+    result['status'] = 'pass' if result['matched'] and not result['over_tolerance'] else 'fail'
+    result['seconds'] = round(time.monotonic() - started, 3)
+    return result, boxes
+
+
+def run_batch(pages, binary, jobs=None, tolerance=0.5, timeout=120.0, png_dir=None, cache=None):
+    """在进程池中运行所有页面，按完成顺序逐个产出结果
+
+    cache: ResultCache；输入没变的页面直接返回缓存的结果（带 'cached': True），
+    只有 Chrome 导出变了的页面复用缓存的盒子、只重做对比。出错的结果不缓存。
+    """
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+        for page in pages:
+            keys = None
+            boxes = None
+            if cache is not None:
+                render_key = cache.render_key(binary, page.html)
+                keys = (render_key, cache.result_key(render_key, page.rects, page.styles, tolerance))
+                # 要求保留 PNG 而 PNG 不在时必须重新渲染
+                if not png_dir or os.path.exists(_png_path(page, png_dir)):
+                    cached = cache.get('result', keys[1])
+                    if cached is not None:
+                        # key 只与内容有关，内容相同的页面共享同一个条目
+                        cached.update(page=page.name, html=page.html, cached=True)
+                        yield cached
+                        continue
+                    boxes = cache.get('render', render_key)
+            future = pool.submit(run_page, page, binary, tolerance, timeout, png_dir, boxes)
+            futures[future] = (page, keys, boxes is not None)
+
+        for future in as_completed(futures):
+            page, keys, rendered_from_cache = futures[future]
+            result, boxes = page_result(future, page)
+            if keys is not None and result['status'] != 'error':
+                if not rendered_from_cache:
+                    cache.put('render', keys[0], boxes)
+                cache.put('result', keys[1], result)
+            yield result
+
+
+def summarize(results):
+    """汇总所有页面的结果"""
+    counts = {'pass': 0, 'fail': 0, 'error': 0}
+    for r in results:
+        counts[r['status']] += 1
+    compared = [r for r in results if r['status'] != 'error']
+    summary = {'pages': len(results), **counts, 'cached': sum(1 for r in results if r.get('cached'))}
+    if compared:
+        mean_abs = np.array([r['mean_abs'] for r in compared]).mean(axis=0)
+        summary['mean_abs'] = [float(v) for v in mean_abs]
+        summary['matched'] = sum(r['matched'] for r in compared)
+        summary['unmatched'] = sum(r['unmatched'] for r in compared)
+        summary['over_tolerance'] = sum(r['over_tolerance'] for r in compared)
+    return summary
+
+
+def print_report(results, summary, top=20):
+    """打印汇总报告和误差最大的页面"""
+    print("=" * 96)
+    print("ZBrowser 批量一致性测试")
+    print("=" * 96)
+    print(f"页面: {summary['pages']}, 通过: {summary['pass']}, 失败: {summary['fail']}, 出错: {summary['error']}")
+    if summary['cached']:
+        print(f"缓存命中（未重新运行）: {summary['cached']}")
+    if 'mean_abs' in summary:
+        dx, dy, dw, dh = summary['mean_abs']
+        print(f"匹配元素: {summary['matched']}, ZBrowser 未匹配: {summary['unmatched']}, "
+              f"超出容差: {summary['over_tolerance']}")
+        print(f"平均绝对误差（按页面平均）: x={dx:.2f}, y={dy:.2f}, width={dw:.2f}, height={dh:.2f}")
+
+    failed = sorted((r for r in results if r['status'] == 'fail'), key=lambda r: -r['max_error'])
+    if failed:
+        print(f"\n{'#':>4}  {'page':<40} {'max err':>9} {'over':>6}  worst element")
+        for rank, r in enumerate(failed[:top], 1):
+            worst = r['worst'] or {}
+            print(f"{rank:>4}  {r['page'][:40]:<40} {r['max_error']:>9.2f} {r['over_tolerance']:>6}  "
+                  f"{worst.get('path', '')}")
+
+    errors = [r for r in results if r['status'] == 'error']
+    if errors:
+        print("\n出错的页面:")
+        for r in sorted(errors, key=lambda r: r['page']):
+            print(f"  {r['page']}: {r['error']}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="对页面语料库批量运行 ZBrowser 并与 Chrome 导出对比")
+    arg_parser.add_argument('corpus_dir', help="语料库目录（每个页面一个子目录）")
+    arg_parser.add_argument('--binary', default=DEFAULT_BINARY, help=f"ZBrowser 可执行文件（默认 {DEFAULT_BINARY}）")
+    arg_parser.add_argument('--jobs', '-j', type=int, default=None, help="并行进程数（默认 CPU 核数）")
+    arg_parser.add_argument('--tolerance', type=float, default=0.5, help="误差容差（px）")
+    arg_parser.add_argument('--timeout', type=float, default=120.0, help="单个页面的超时时间（秒）")
+    arg_parser.add_argument('--top', type=int, default=20, help="报告中显示误差最大的前 N 个页面")
+    arg_parser.add_argument('--png-dir', default=None, help="保留渲染结果 PNG 的目录（默认不保留）")
+    arg_parser.add_argument('--json', default=None, help="把完整结果写入 JSON 报告")
+    arg_parser.add_argument('--cache-dir', default=None, help="结果缓存目录（输入没变的页面直接复用上次的结果）")
+    arg_parser.add_argument('--cache-size', type=float, default=DEFAULT_SIZE_MB,
+                            help=f"结果缓存的容量上限（MB，默认 {DEFAULT_SIZE_MB}）")
+    args = arg_parser.parse_args()
+
+    if not os.path.isdir(args.corpus_dir):
+        print(f"Error: 语料库目录 '{args.corpus_dir}' 不存在")
+        sys.exit(1)
+    if not os.access(args.binary, os.X_OK):
+        print(f"Error: 找不到 ZBrowser 可执行文件 '{args.binary}'（先运行 zig build，或用 --binary 指定）")
+        sys.exit(1)
+    if args.png_dir:
+        os.makedirs(args.png_dir, exist_ok=True)
+
+    pages = discover_pages(args.corpus_dir)
+    if not pages:
+        print(f"Error: '{args.corpus_dir}' 中没有找到带 {RECTS_FILE} 的页面")
+        sys.exit(1)
+
+    binary = os.path.abspath(args.binary)
+    cache = ResultCache(args.cache_dir, int(args.cache_size * (1 << 20))) if args.cache_dir else None
+    results = []
+    batch = run_batch(pages, binary, args.jobs, args.tolerance, args.timeout, args.png_dir, cache)
+    for done, r in enumerate(batch, 1):
+        results.append(r)
+        detail = r['error'] if r['status'] == 'error' else f"max error {r['max_error']:.2f}px"
+        if r.get('cached'):
+            detail += " (cached)"
+        print(f"[{done}/{len(pages)}] {r['status'].upper():<5} {r['page']}  {detail}", file=sys.stderr, flush=True)
+    if cache is not None:
+        cache.close()
+
+    results.sort(key=lambda r: r['page'])
+    summary = summarize(results)
+    print_report(results, summary, args.top)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'pages': results}, f, ensure_ascii=False, indent=2)
+
+    sys.exit(0 if summary['fail'] == 0 and summary['error'] == 0 else 1)
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+ZBrowser 渲染基准测试：按阶段计时、记录峰值内存，并与保存的基线做统计对比
+
+每个页面先跑 --warmup 次（丢弃），再跑 --repeat 次采样。每次运行记录：
+  wall     启动到退出的墙钟时间
+  cpu      用户态 + 内核态 CPU 时间（os.wait4 返回的 rusage）
+  rss      峰值常驻内存（rusage 的 ru_maxrss）
+  阶段     按 stderr 中调试记录第一次出现的时间切分（Debug 构建才有这些输出）：
+             parse_style  启动 -> 第一条 [LAYOUT]（读文件、解析 HTML / CSS、cascade）
+             layout       第一条 [LAYOUT] -> 第一个 "=== Element Layout Info ==="
+             report       布局信息输出 -> 绘制开始
+             paint        绘制开始 -> GPA 泄漏报告或退出（CPU 后端绘制 + PNG 编码）
+             teardown     GPA 泄漏报告 -> 退出
+           解析和 cascade 合成一个阶段：[STYLE] 只为 font-size 大于 24px 的元素输出（style_utils.zig），
+           大多数页面上没有可靠的 cascade 起点。
+           绘制开始取布局信息的最后一行（泄漏报告之前最后一行非 [FONT] 输出）：绘制期间唯一的输出
+           [FONT] 同样只在字号大于 24px 时出现（renderer.zig），不能当作绘制起点。
+           这样布局信息输出完到真正开始绘制之间的工作（main.zig 里的收尾）也记在 paint 下，
+           stderr 经管道读取的延迟也会让边界略晚于实际时间。
+           某个边界不存在时，对应阶段并入前一个阶段；Release 构建没有调试输出，全部时间都记在 parse_style 下。
+stderr 在读取时只按行首前缀分类、打时间戳，不做完整解析，读端不会拖慢 ZBrowser。
+
+统计：每个指标取中位数和 MAD（中位数绝对偏差）。与基线对比时，中位数的增量同时超过
+--threshold（相对基线）和噪声带（3 x 1.4826 x sqrt(MAD_基线² + MAD_当前²)）才算回归；
+layout 阶段和峰值内存的回归会被标出，并让脚本以非零状态退出。
+
+用法:
+  python3 bench_render.py test_page.html [pages_dir ...] [--repeat 5] [--save-baseline bench.json]
+  python3 bench_render.py test_page.html --baseline bench.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from batch_conformance import DEFAULT_BINARY
+
+PHASES = ('parse_style', 'layout', 'report', 'paint', 'teardown')
+METRICS = ('wall', 'cpu', 'rss') + PHASES
+# 超出噪声时需要标出的指标
+FLAGGED_METRICS = ('layout', 'rss')
+MAD_SIGMA = 1.4826
+NOISE_SIGMAS = 3.0
+DEFAULT_THRESHOLD = 0.05
+
+# 行首前缀 -> 阶段边界（paint 的起点是布局信息的最后一行，见 run_once）
+_BOUNDARIES = (
+    (b'[LAYOUT]', 'layout'),
+    (b'=== Element Layout Info ===', 'report'),
+    (b'[gpa]', 'teardown'),
+    (b'error(gpa)', 'teardown'),
+)
+
+
+def _maxrss_bytes(rusage):
+    # Linux 上 ru_maxrss 的单位是 KB，macOS 上是字节
+    return rusage.ru_maxrss if sys.platform == 'darwin' else rusage.ru_maxrss * 1024
+
+
+def split_phases(started, marks, last_output, finished):
+    """阶段边界时间 -> 每个阶段的耗时（秒）
+
+    marks: {边界名: 第一次出现的时间}；last_output: 泄漏报告之前最后一行非 [FONT] 输出的时间，
+    作为绘制开始。
+    """
+    boundaries = [('parse_style', started)]
+    boundaries += [(name, marks[name]) for name in ('layout', 'report') if name in marks]
+    if 'report' in marks and last_output is not None:
+        boundaries.append(('paint', last_output))
+    if 'teardown' in marks:
+        boundaries.append(('teardown', marks['teardown']))
+    boundaries.sort(key=lambda b: b[1])
+
+    phases = dict.fromkeys(PHASES, 0.0)
+    for (name, start), (_, end) in zip(boundaries, boundaries[1:] + [('end', finished)]):
+        phases[name] += end - start
+    return phases
+
+
+def run_once(binary, html, timeout=120.0):
+    """运行一次 ZBrowser，返回测量结果 dict；出错时 'error' 不为 None"""
+    result = {'error': None}
+    with tempfile.TemporaryDirectory(prefix='zbrowser-bench-') as tmp_dir:
+        started = time.perf_counter()
+        try:
+            proc = subprocess.Popen([binary, os.path.abspath(html), os.path.join(tmp_dir, 'output.png')],
+                                    stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except OSError as e:
+            result['error'] = f"无法启动 ZBrowser: {e}"
+            return result
+
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            proc.kill()
+
+        killer = threading.Timer(timeout, kill)
+        killer.start()
+        marks = {}
+        last_output = None
+        try:
+            for line in proc.stderr:
+                now = time.perf_counter()
+                stripped = line.lstrip()
+                for prefix, name in _BOUNDARIES:
+                    if stripped.startswith(prefix):
+                        marks.setdefault(name, now)
+                        break
+                if 'teardown' not in marks and not stripped.startswith(b'[FONT]'):
+                    last_output = now
+        finally:
+            killer.cancel()
+            proc.stderr.close()
+            # 用 wait4 收尸才能拿到子进程自己的 rusage
+            _, status, rusage = os.wait4(proc.pid, 0)
+            finished = time.perf_counter()
+            proc.returncode = os.waitstatus_to_exitcode(status)
+
+    if timed_out.is_set():
+        result['error'] = f"超时（{timeout:.0f}s）"
+    elif proc.returncode != 0:
+        result['error'] = f"ZBrowser 退出码 {proc.returncode}"
+    result.update(
+        wall=finished - started,
+        cpu=rusage.ru_utime + rusage.ru_stime,
+        rss=_maxrss_bytes(rusage),
+        **split_phases(started, marks, last_output, finished),
+    )
+    return result
+
+
+def benchmark_page(binary, html, warmup=1, repeat=5, timeout=120.0):
+    """一个页面的全部采样：{'samples': {指标: [值, ...]}, 'errors': [...]}"""
+    samples = {metric: [] for metric in METRICS}
+    errors = []
+    for run in range(warmup + repeat):
+        result = run_once(binary, html, timeout)
+        if result['error'] is not None:
+            errors.append(result['error'])
+            continue
+        if run >= warmup:
+            for metric in METRICS:
+                samples[metric].append(result[metric])
+    return {'samples': samples, 'errors': errors}
+
+
+def median_mad(values):
+    """(中位数, MAD)；没有样本时返回 (None, None)"""
+    if not values:
+        return None, None
+    median = statistics.median(values)
+    return median, statistics.median(abs(v - median) for v in values)
+
+
+def compare_to_baseline(pages, baseline_pages, threshold=DEFAULT_THRESHOLD):
+    """逐页面逐指标对比，返回 [(页面, 指标, 基线中位数, 当前中位数, 噪声带, 是否回归)]"""
+    rows = []
+    for name, page in pages.items():
+        base = baseline_pages.get(name)
+        if base is None:
+            continue
+        for metric in METRICS:
+            base_median, base_mad = median_mad(base['samples'].get(metric, []))
+            median, mad = median_mad(page['samples'][metric])
+            if base_median is None or median is None:
+                continue
+            noise = NOISE_SIGMAS * MAD_SIGMA * (base_mad ** 2 + mad ** 2) ** 0.5
+            delta = median - base_median
+            # 基线中位数为 0（这个阶段在基线里不存在）时没有相对阈值可言，不算回归
+            regressed = base_median > 0 and delta > noise and delta > threshold * base_median
+            rows.append((name, metric, base_median, median, noise, regressed))
+    return rows
+
+
+def find_pages(targets):
+    """命令行里的 HTML 文件和目录（目录下递归找所有 .html），返回 {页面名: 路径}"""
+    pages = {}
+    for target in targets:
+        if os.path.isdir(target):
+            for dir_path, dir_names, files in os.walk(target):
+                dir_names.sort()
+                for name in sorted(files):
+                    if name.endswith('.html'):
+                        path = os.path.join(dir_path, name)
+                        pages[os.path.relpath(path, target)] = path
+        else:
+            pages[os.path.basename(target)] = target
+    return pages
+
+
+def _format_value(metric, value, unit=True):
+    if metric == 'rss':
+        return f"{value / (1 << 20):.1f}" + ('MB' if unit else '')
+    return f"{value * 1000:.1f}" + ('ms' if unit else '')
+
+
+def print_bench_report(pages):
+    print("=" * 110)
+    print("ZBrowser 渲染基准（中位数 ± MAD）")
+    print("=" * 110)
+    columns = ('wall', 'cpu', 'rss', 'parse_style', 'layout', 'paint')
+    print(f"{'page':<30} " + ' '.join(f"{metric:>16}" for metric in columns))
+    for name, page in pages.items():
+        cells = []
+        for metric in columns:
+            median, mad = median_mad(page['samples'][metric])
+            cells.append('-' if median is None else
+                         f"{_format_value(metric, median)}±{_format_value(metric, mad, unit=False)}")
+        print(f"{name[:30]:<30} " + ' '.join(f"{cell:>16}" for cell in cells))
+        if page['errors']:
+            print(f"  {len(page['errors'])} 次运行出错: {page['errors'][0]}")
+
+
+def print_baseline_comparison(rows, threshold):
+    print("\n" + "=" * 110)
+    print(f"与基线对比（回归 = 增量超过 {threshold:.0%} 且超过噪声带）")
+    print("=" * 110)
+    print(f"{'page':<30} {'metric':<10} {'baseline':>12} {'current':>12} {'change':>9} {'noise':>12}")
+    for name, metric, base_median, median, noise, regressed in rows:
+        change = (median - base_median) / base_median if base_median else 0.0
+        mark = ''
+        if regressed:
+            mark = '  <- 回归' if metric in FLAGGED_METRICS else '  (变慢)'
+        print(f"{name[:30]:<30} {metric:<10} {_format_value(metric, base_median):>12} "
+              f"{_format_value(metric, median):>12} {change:>+9.1%} {_format_value(metric, noise):>12}{mark}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="ZBrowser 渲染基准测试（阶段耗时、CPU、峰值内存）")
+    arg_parser.add_argument('targets', nargs='+', help="HTML 页面或包含页面的目录")
+    arg_parser.add_argument('--binary', default=DEFAULT_BINARY, help=f"ZBrowser 可执行文件（默认 {DEFAULT_BINARY}）")
+    arg_parser.add_argument('--warmup', type=int, default=1, help="每个页面的预热次数（不计入结果）")
+    arg_parser.add_argument('--repeat', type=int, default=5, help="每个页面的采样次数")
+    arg_parser.add_argument('--timeout', type=float, default=120.0, help="单次运行的超时时间（秒）")
+    arg_parser.add_argument('--baseline', default=None, help="与这份基线 JSON 对比")
+    arg_parser.add_argument('--save-baseline', default=None, help="把本次结果保存为基线 JSON")
+    arg_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help=f"相对基线的最小回归幅度（默认 {DEFAULT_THRESHOLD}）")
+    args = arg_parser.parse_args()
+
+    if not hasattr(os, 'wait4'):
+        print("Error: 当前平台没有 os.wait4，无法取得子进程的 CPU 时间和峰值内存")
+        sys.exit(1)
+    if not os.access(args.binary, os.X_OK):
+        print(f"Error: 找不到 ZBrowser 可执行文件 '{args.binary}'（先运行 zig build，或用 --binary 指定）")
+        sys.exit(1)
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error: 无法读取基线 '{args.baseline}': {e}")
+            sys.exit(1)
+    html_pages = find_pages(args.targets)
+    missing = [path for path in html_pages.values() if not os.path.isfile(path)]
+    if missing or not html_pages:
+        print(f"Error: 找不到页面 {missing[0] if missing else ' '.join(args.targets)}")
+        sys.exit(1)
+
+    binary = os.path.abspath(args.binary)
+    pages = {}
+    for done, (name, path) in enumerate(html_pages.items(), 1):
+        pages[name] = benchmark_page(binary, path, args.warmup, args.repeat, args.timeout)
+        wall, _ = median_mad(pages[name]['samples']['wall'])
+        detail = '全部出错' if wall is None else f"wall {wall * 1000:.1f}ms"
+        print(f"[{done}/{len(html_pages)}] {name}  {detail}", file=sys.stderr, flush=True)
+
+    print_bench_report(pages)
+    regressed = []
+    if baseline is not None:
+        rows = compare_to_baseline(pages, baseline['pages'], args.threshold)
+        print_baseline_comparison(rows, args.threshold)
+        regressed = [row for row in rows if row[5] and row[1] in FLAGGED_METRICS]
+        if regressed:
+            print(f"\n{len(regressed)} 项 layout / 内存回归")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump({'binary': binary, 'created': time.time(), 'warmup': args.warmup, 'repeat': args.repeat,
+                       'pages': pages}, f, indent=1)
+
+    sys.exit(1 if regressed else 0)
@@ -3,104 +3,64 @@
 对比 Chrome 的 element-rects.json 和 ZBrowser 的输出
 """
 
-import json
+import argparse
+import os
 import sys
-import re
 
-def parse_zbrowser_output(output_text):
-    """解析 ZBrowser 的输出，提取元素的位置和尺寸信息"""
-    elements = {}
-    
-    lines = output_text.split('\n')
-    i = 0
-    current_tag = None
-    current_class = None
-    
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        # 匹配 "Tag: h1" 或 "Tag: div"
-        if line.startswith('Tag:'):
-            tag_match = re.match(r'Tag:\s*(\w+)', line)
-            if tag_match:
-                current_tag = tag_match.group(1)
-                current_class = None
-                i += 1
-                continue
-        
-        # 匹配 "Class: block-test"
-        if line.startswith('Class:'):
-            class_match = re.match(r'Class:\s*([^\s]+)', line)
-            if class_match:
-                current_class = class_match.group(1)
-                i += 1
-                continue
-        
-        # 匹配 "Content: x=20.00, y=61.44, width=921.00, height=46.00"
-        if line.startswith('Content:') and current_tag:
-            content_match = re.match(r'Content:\s*x=([\d.]+),\s*y=([\d.]+),\s+width=([\d.]+),\s+height=([\d.]+)', line)
-            if content_match:
-                x = float(content_match.group(1))
-                y = float(content_match.group(2))
-                width = float(content_match.group(3))
-                height = float(content_match.group(4))
-                
-                # 创建唯一标识
-                key = f"{current_tag.lower()}"
-                if current_class:
-                    key += f".{current_class}"
-                
-                elements[key] = {
-                    'tag': current_tag,
-                    'class': current_class or '',
-                    'content': {
-                        'x': x,
-                        'y': y,
-                        'width': width,
-                        'height': height
-                    }
-                }
-        
-        i += 1
-    
-    return elements
+from dom_match import match_boxes
+from dump_snapshot import dump_exists, open_dump
+from element_store import ElementStore
+from rect_diff import BOX_PROPERTIES, full_page_diff, print_worst_offenders
+from zbrowser_log import BoxRecord, iter_records
 
-def find_chrome_element(data, tag_name, class_name=None, text_content_substring=None):
-    """在 Chrome 数据中查找元素"""
-    for item in data:
-        elem = item['element']
-        if elem['tagName'].lower() != tag_name.lower():
-            continue
-        if class_name and class_name not in elem['className'].split():
-            continue
-        if text_content_substring and text_content_substring not in elem['textContent']:
+def parse_zbrowser_boxes(source):
+    """解析 ZBrowser 的输出，按输出顺序返回每个元素的 tag / class / id 和 content box
+
+    source: 输出文件路径或二进制流（UTF-8 / PowerShell 的 UTF-16 都可以）
+    """
+    return boxes_from_records(iter_records(source))
+
+def boxes_from_records(records):
+    """同 parse_zbrowser_boxes()，输入是已经解析好的 zbrowser_log 记录"""
+    boxes = []
+    for record in records:
+        # 只有 "=== Element Layout Info ===" 块带 Tag / Class / ID
+        if not isinstance(record, BoxRecord) or record.source != 'info' or record.content is None:
             continue
-        return item
-    return None
+        x, y, width, height = record.content
+        boxes.append({
+            'tag': record.tag,
+            'class': record.class_name,
+            'id': record.id,
+            'content': {'x': x, 'y': y, 'width': width, 'height': height},
+        })
+    return boxes
 
-def compare_elements(chrome_data, zbrowser_data):
+def compare_elements(chrome_data, zbrowser_boxes):
     """对比 Chrome 和 ZBrowser 的元素位置"""
+    # Chrome 下标 -> 配对的 ZBrowser 盒子
+    matched = {
+        pos: box for pos, box in zip(match_boxes(chrome_data.items, zbrowser_boxes), zbrowser_boxes)
+        if pos is not None
+    }
+
     print("=" * 80)
     print("Chrome vs ZBrowser 元素位置对比")
     print("=" * 80)
     
     # 对比第一个 h1
-    chrome_h1 = find_chrome_element(chrome_data, 'H1', None, 'ZBrowser功能测试页面')
-    if chrome_h1:
+    chrome_h1_positions = chrome_data.find_positions('H1', text_content_substring='ZBrowser功能测试页面')
+    if chrome_h1_positions:
+        chrome_h1_pos = chrome_h1_positions[0]
+        chrome_h1 = chrome_data.items[chrome_h1_pos]
         chrome_rect = chrome_h1['rect']
         print(f"\n【第一个 H1 - ZBrowser功能测试页面】")
         print(f"Chrome (getBoundingClientRect - border box):")
         print(f"  x: {chrome_rect['x']:.2f}px, y: {chrome_rect['y']:.2f}px")
         print(f"  width: {chrome_rect['width']:.2f}px, height: {chrome_rect['height']:.2f}px")
         
-        # 查找 ZBrowser 的 h1（第一个，没有 class，且 y 坐标应该较小）
-        zbrowser_h1 = None
-        min_y = float('inf')
-        for key, elem in zbrowser_data.items():
-            if elem['tag'].lower() == 'h1' and not elem['class']:
-                if elem['content']['y'] < min_y:
-                    min_y = elem['content']['y']
-                    zbrowser_h1 = elem
+        # 通过 DOM 路径对齐找到与这个 h1 配对的 ZBrowser 盒子
+        zbrowser_h1 = matched.get(chrome_h1_pos)
         
         if zbrowser_h1:
             zb_rect = zbrowser_h1['content']
@@ -132,16 +92,18 @@ def compare_elements(chrome_data, zbrowser_data):
             print("ZBrowser: 未找到")
     
     # 对比 block-test
-    chrome_block_test = find_chrome_element(chrome_data, 'DIV', 'block-test')
-    if chrome_block_test:
+    chrome_block_test_positions = chrome_data.find_positions('DIV', 'block-test')
+    if chrome_block_test_positions:
+        chrome_block_test_pos = chrome_block_test_positions[0]
+        chrome_block_test = chrome_data.items[chrome_block_test_pos]
         chrome_rect = chrome_block_test['rect']
         print(f"\n【block-test DIV】")
         print(f"Chrome (getBoundingClientRect - border box):")
         print(f"  x: {chrome_rect['x']:.2f}px, y: {chrome_rect['y']:.2f}px")
         print(f"  width: {chrome_rect['width']:.2f}px, height: {chrome_rect['height']:.2f}px")
         
-        # 查找 ZBrowser 的 block-test
-        zbrowser_block_test = zbrowser_data.get('div.block-test')
+        # 查找与 block-test 配对的 ZBrowser 盒子
+        zbrowser_block_test = matched.get(chrome_block_test_pos)
         if zbrowser_block_test:
             zb_rect = zbrowser_block_test['content']
             print(f"ZBrowser (content box):")
@@ -167,26 +129,33 @@ def compare_elements(chrome_data, zbrowser_data):
             print("ZBrowser: 未找到")
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python3 compare_rects.py <element-rects.json> [zbrowser_output.txt]")
-        print("\n如果没有提供 zbrowser_output.txt，将从标准输入读取 ZBrowser 输出")
-        sys.exit(1)
-    
-    json_file = sys.argv[1]
+    arg_parser = argparse.ArgumentParser(
+        description="对比 Chrome 的 element-rects.json 和 ZBrowser 的输出",
+        epilog="如果没有提供 zbrowser_output.txt，将从标准输入读取 ZBrowser 输出")
+    arg_parser.add_argument('json_file', help="Chrome 导出的 element-rects.json")
+    arg_parser.add_argument('zbrowser_output', nargs='?', help="ZBrowser 的输出（默认读标准输入）")
+    arg_parser.add_argument('--full', action='store_true', help="整页对比所有匹配的元素")
+    arg_parser.add_argument('--styles', default=None,
+                            help="computed-styles-structured.json（--full 用它取 padding/border，默认与 json_file 同目录）")
+    arg_parser.add_argument('--top', type=int, default=20, help="--full 模式下显示误差最大的前 N 个元素")
+    arg_parser.add_argument('--tolerance', type=float, default=0.5, help="--full 模式下的误差容差（px）")
+    args = arg_parser.parse_args()
     
     # 读取 Chrome 数据
-    with open(json_file, 'r', encoding='utf-8') as f:
-        chrome_data = json.load(f)
+    chrome_data = ElementStore.load(args.json_file)
     
-    # 读取 ZBrowser 输出
-    if len(sys.argv) > 2:
-        with open(sys.argv[2], 'r', encoding='utf-8') as f:
-            zbrowser_output = f.read()
-    else:
-        zbrowser_output = sys.stdin.read()
+    # 解析 ZBrowser 输出（流式读取，不把整个日志读进内存）
+    zbrowser_boxes = parse_zbrowser_boxes(args.zbrowser_output or sys.stdin.buffer)
     
-    # 解析 ZBrowser 输出
-    zbrowser_data = parse_zbrowser_output(zbrowser_output)
+    if args.full:
+        styles_file = args.styles or os.path.join(os.path.dirname(args.json_file), 'computed-styles-structured.json')
+        if not dump_exists(styles_file):
+            print(f"Error: 找不到样式导出 '{styles_file}'（用 --styles 指定）")
+            sys.exit(1)
+        style_items = open_dump(styles_file, BOX_PROPERTIES)
+        result = full_page_diff(chrome_data.items, style_items, zbrowser_boxes)
+        print_worst_offenders(result, chrome_data.items, args.top, args.tolerance)
+        sys.exit(0)
     
     # 对比
-    compare_elements(chrome_data, zbrowser_data)
+    compare_elements(chrome_data, zbrowser_boxes)
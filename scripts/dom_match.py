@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+按 DOM 路径把 Chrome 元素和 ZBrowser 输出的盒子一一配对
+
+Chrome 一侧：element-rects.json 是 querySelectorAll('*') 的先序遍历结果，
+用 childElementCount 和 parentTagName 还原元素树，index 的空缺就是被导出脚本跳过的
+SCRIPT / STYLE / LINK / META（它们都是叶子节点，只占父元素的一个子元素名额）。
+
+ZBrowser 一侧：盒子按输出顺序排列，输出顺序是布局树的先序遍历的子序列；盒子带深度时
+（'depth'）深度也参与对齐。配对就是两边先序的 (深度, tag, class, id) 序列之间的保序对齐
+（最长公共子序列），与 layout_log_diff 对比两份日志用的是同一个 seq_align.align()：
+公共前后缀和唯一 key 锚点都是线性的，只有锚点之间的小空隙才做编辑距离有上限的差分，
+所以重复元素很多的大文档上代价也不会爆炸，一个多余的盒子也不会挤掉其它配对。
+
+match_boxes 用到 numpy（经 layout_log_diff），只在调用时才导入：
+style_share 经 dump_snapshot 被所有脚本导入，建树本身不需要它。
+"""
+
+from bisect import bisect_right
+
+
+class DomNode:
+    """还原出来的 Chrome 元素树节点"""
+
+    __slots__ = ('pos', 'tag', 'parent', 'children', 'path', 'remaining')
+
+    def __init__(self, pos, tag, parent, remaining):
+        self.pos = pos
+        self.tag = tag
+        self.parent = parent
+        self.children = []
+        self.path = ''
+        self.remaining = remaining
+
+
+def element_key(tag_name, class_name='', id_name=''):
+    """配对使用的 key：小写 tag + 规范化的 class 列表 + id"""
+    return tag_name.lower(), ' '.join(class_name.split()), id_name
+
+
+def _pop_finished(stack):
+    while stack and stack[-1].remaining <= 0:
+        stack.pop()
+
+
+def iter_chrome_tree(items):
+    """逐个产出 (item, DomNode)，边读边还原元素树（items 可以是流式迭代器）
+
+    产出时节点的 parent 已经确定，path 还没有分配。
+    """
+    stack = []
+    prev_index = -1
+
+    for pos, item in enumerate(items):
+        elem = item['element']
+        index = elem.get('index', prev_index + 1)
+
+        # 被跳过的元素是叶子，各占当前父元素一个子元素名额
+        for _ in range(index - prev_index - 1):
+            _pop_finished(stack)
+            if stack:
+                stack[-1].remaining -= 1
+        prev_index = index
+
+        _pop_finished(stack)
+        # 容错：childElementCount 对不上时，按 parentTagName 回退到真正的父元素
+        parent_tag = elem.get('parentTagName', '').lower()
+        while stack and stack[-1].tag != parent_tag:
+            stack.pop()
+
+        parent = stack[-1] if stack else None
+        node = DomNode(pos, elem.get('tagName', '').lower(), parent, elem.get('childElementCount', 0))
+        if parent is not None:
+            parent.remaining -= 1
+            parent.children.append(node)
+        stack.append(node)
+        yield item, node
+
+
+def build_chrome_tree(items):
+    """从先序元素列表还原元素树，返回与 items 对齐的 DomNode 列表
+
+    每个节点的 path 形如 /html[1]/body[1]/div[3]（同名兄弟中的序号，从 1 开始）。
+    """
+    nodes = [node for _, node in iter_chrome_tree(items)]
+    # 兄弟序号的计数器在所有根之间共享：多个根（比如导出里断开的子树）按同名根的顺序编号
+    counters = {}
+    for node in nodes:
+        if node.parent is None:
+            _assign_paths(node, '', counters)
+    return nodes
+
+
+def _assign_paths(root, prefix, counters):
+    """迭代地为子树分配路径（避免深层文档触发递归深度限制）"""
+    counters[root.tag] = counters.get(root.tag, 0) + 1
+    root.path = f"{prefix}/{root.tag}[{counters[root.tag]}]"
+    pending = [root]
+    while pending:
+        node = pending.pop()
+        seen = {}
+        for child in node.children:
+            seen[child.tag] = seen.get(child.tag, 0) + 1
+            child.path = f"{node.path}/{child.tag}[{seen[child.tag]}]"
+            pending.append(child)
+
+
+def _depths(nodes):
+    """每个 Chrome 节点的深度（根为 0）；nodes 是先序的，父节点总在子节点之前"""
+    depths = [0] * len(nodes)
+    for node in nodes:
+        if node.parent is not None:
+            depths[node.pos] = depths[node.parent.pos] + 1
+    return depths
+
+
+def box_depths(boxes):
+    """ZBrowser 盒子在布局树中的深度（根为 0），与 boxes 对齐
+
+    盒子带 'depth' 时直接使用；有盒子不带时返回 None，对齐只看 (tag, class, id)。
+    "=== Element Layout Info ===" 块和 [LAYOUT] 记录都没有父元素信息，只靠父元素 tag 回退
+    在同名元素嵌套（div 里的 div）时会认错父元素，得到的深度反而会让本来能配上的盒子配不上。
+    """
+    if not boxes or any('depth' not in box for box in boxes):
+        return None
+    return [box['depth'] for box in boxes]
+
+
+def _split_passes(chrome_keys, box_keys):
+    """按多轮布局切分盒子序列：某个盒子的 key 在上一个匹配点之后已经没有元素时，认为开始了新一轮
+
+    这里的前向游标只用来找每一轮的边界，轮内的配对由 align() 决定。
+    """
+    positions = {}
+    for pos, key in enumerate(chrome_keys):
+        positions.setdefault(key, []).append(pos)
+    bounds = [0]
+    last = -1
+    for j, key in enumerate(box_keys):
+        candidates = positions.get(key)
+        if not candidates:
+            continue
+        i = bisect_right(candidates, last)
+        if i == len(candidates):
+            bounds.append(j)
+            i = 0
+        last = candidates[i]
+    bounds.append(len(box_keys))
+    return list(zip(bounds, bounds[1:]))
+
+
+def _greedy_gap(chrome_keys, box_keys, a0, a1, b0, b1, matches):
+    """align() 放弃的空隙（没有唯一锚点且差异太大）里按顺序贪心配对，只影响这个空隙"""
+    positions = {}
+    for pos in range(a0, a1):
+        positions.setdefault(chrome_keys[pos], []).append(pos)
+    last = a0 - 1
+    for j in range(b0, b1):
+        candidates = positions.get(box_keys[j], ())
+        i = bisect_right(candidates, last)
+        if i < len(candidates):
+            last = candidates[i]
+            matches[j] = last
+
+
+def match_boxes(items, boxes, nodes=None, tag_only=False, restart=False):
+    """为每个 ZBrowser 盒子找到对应的 Chrome 元素
+
+    两边各自还原成树，按先序的 (深度, tag, class, id) 序列做保序对齐（最长公共子序列，
+    见 layout_log_diff.align：公共前后缀、唯一 key 锚点 + 最长递增子序列、编辑距离有上限的 Myers），
+    多出来的盒子只是配不上，不会挤掉后面的配对。盒子没有父元素信息时深度不参与对齐。
+    返回与 boxes 对齐的列表，元素是 items 中的下标，未匹配为 None。
+    tag_only: 只按 tag 配对（[LAYOUT] / [STYLE] 这类没有 class、id 的记录）
+    restart: 盒子序列里有多轮布局，每轮分别与整个文档对齐
+    """
+    import numpy as np
+    from seq_align import align, gap_regions
+
+    if nodes is None:
+        nodes = build_chrome_tree(items)
+    chrome_depths = _depths(nodes)
+    depths = box_depths(boxes)
+
+    def key_of(tag_name, class_name, id_name):
+        return (tag_name.lower(),) if tag_only else element_key(tag_name, class_name, id_name)
+
+    ids = {}
+    chrome_keys = []
+    for node in nodes:
+        elem = items[node.pos]['element']
+        key = key_of(elem.get('tagName', ''), elem.get('className', ''), elem.get('id', ''))
+        if depths is not None:
+            key = (chrome_depths[node.pos],) + key
+        chrome_keys.append(ids.setdefault(key, len(ids)))
+    box_keys = []
+    for j, box in enumerate(boxes):
+        key = key_of(box['tag'], box.get('class', ''), box.get('id', ''))
+        if depths is not None:
+            key = (depths[j],) + key
+        box_keys.append(ids.setdefault(key, len(ids)))
+
+    matches = [None] * len(boxes)
+    chrome_array = np.asarray(chrome_keys, dtype=np.int64)
+    passes = _split_passes(chrome_keys, box_keys) if restart else [(0, len(boxes))]
+    for b0, b1 in passes:
+        ia, ib = align(chrome_array, np.asarray(box_keys[b0:b1], dtype=np.int64), match_suffix=False)
+        for i, j in zip(ia.tolist(), ib.tolist()):
+            matches[b0 + j] = i
+        for a0, a1, g0, g1 in gap_regions(ia, ib, len(chrome_keys), b1 - b0):
+            if a1 > a0 and g1 > g0:
+                _greedy_gap(chrome_keys, box_keys, a0, a1, b0 + g0, b0 + g1, matches)
+    return matches
+
+
+def match_pairs(items, boxes, nodes=None):
+    """返回匹配上的 (chrome 下标列表, zbrowser 下标列表)"""
+    chrome_idx = []
+    zbrowser_idx = []
+    for j, pos in enumerate(match_boxes(items, boxes, nodes)):
+        if pos is not None:
+            chrome_idx.append(pos)
+            zbrowser_idx.append(j)
+    return chrome_idx, zbrowser_idx
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Chrome 导出数据（element-rects.json / computed-styles-structured.json）的二进制快照
+
+快照是列式存储，整个文件可以直接 mmap，打开时不需要任何解析：
+  - 字符串表：所有 tagName / className / 属性名 / 属性值只存一份，其余地方都是 uint32 id
+  - 元素列：每个字段一列 uint32（字符串字段存 id，缺失字段存 MISSING）
+  - 矩形列：float32 的 x, y, width, height, viewportX, viewportY（其余字段由它们推出）
+  - 样式：每个元素一段 (属性 id, 值 id) 对，keyStyles 同样处理
+
+用法:
+  python3 dump_snapshot.py element-rects.json [output.zbsnap]
+  python3 dump_snapshot.py computed-styles-structured.json
+
+open_dump() 会优先使用与 JSON 同名且不比它旧的 .zbsnap，找不到时透明地回退到 JSON。
+两条路径上样式都是共享的：快照里 (属性 id, 值 id) 对逐字节相同的元素共用一个 SnapshotStyles，
+JSON 经 style_share 换成去重后的共享记录。
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+
+from style_share import share_styles
+from style_stream import iter_elements
+
+MAGIC = b'ZBSNAP\x00\x01'
+VERSION = 1
+SNAPSHOT_SUFFIX = '.zbsnap'
+MISSING = 0xFFFFFFFF
+
+FLAG_RECT = 1
+FLAG_STYLES = 2
+FLAG_KEY_STYLES = 4
+
+# 元素字段：(名称, 类型)；'s' 为字符串 id，'i' 为整数，'b' 为布尔
+ELEMENT_FIELDS = (
+    ('index', 'i'),
+    ('tagName', 's'),
+    ('className', 's'),
+    ('id', 's'),
+    ('textContent', 's'),
+    ('parentTagName', 's'),
+    ('parentClassName', 's'),
+    ('parentId', 's'),
+    ('childElementCount', 'i'),
+    ('display', 's'),
+    ('position', 's'),
+    ('isVisible', 'b'),
+)
+RECT_FIELDS = ('x', 'y', 'width', 'height', 'viewportX', 'viewportY')
+
+SECTIONS = (
+    'str_offsets', 'str_data', 'elements', 'rects',
+    'style_offsets', 'style_pairs', 'key_offsets', 'key_pairs',
+)
+HEADER = struct.Struct('<8sIIII')
+SECTION_ENTRY = struct.Struct('<QQ')
+HEADER_SIZE = HEADER.size + SECTION_ENTRY.size * len(SECTIONS)
+
+
+def snapshot_path_for(json_file_path):
+    """JSON 导出对应的快照路径"""
+    base, _ = os.path.splitext(json_file_path)
+    return base + SNAPSHOT_SUFFIX
+
+
+def dump_exists(json_file_path):
+    """JSON 导出或它的快照至少有一个存在（open_dump 能打开）"""
+    return os.path.exists(json_file_path) or os.path.exists(snapshot_path_for(json_file_path))
+
+
+class _StringTable:
+    """写快照时的字符串驻留表"""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def intern(self, value):
+        sid = self.ids.get(value)
+        if sid is None:
+            sid = len(self.strings)
+            self.ids[value] = sid
+            self.strings.append(value)
+        return sid
+
+
+def _write_aligned(f, data):
+    """写入一个 section，按 8 字节对齐，返回 (offset, length)"""
+    pad = (-f.tell()) % 8
+    f.write(b'\x00' * pad)
+    offset = f.tell()
+    if isinstance(data, array):
+        if sys.byteorder != 'little':
+            data = array(data.typecode, data)
+            data.byteswap()
+        data = data.tobytes()
+    f.write(data)
+    return offset, len(data)
+
+
+def convert(json_file_path, snapshot_file_path=None):
+    """把 JSON 导出转换成快照，返回快照路径
+
+    JSON 按元素流式读取，样式 (属性, 值) 对边读边写入文件，内存只与元素数量有关。
+    """
+    if snapshot_file_path is None:
+        snapshot_file_path = snapshot_path_for(json_file_path)
+
+    strings = _StringTable()
+    columns = [array('I') for _ in ELEMENT_FIELDS]
+    rects = [array('f') for _ in RECT_FIELDS]
+    style_offsets = array('I', [0])
+    key_offsets = array('I', [0])
+    key_pairs = array('I')
+    flags = 0
+    sections = {}
+
+    tmp_path = snapshot_file_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(b'\x00' * HEADER_SIZE)
+        style_pairs_offset = f.tell()
+        style_pair_count = 0
+
+        for item in iter_elements(json_file_path):
+            elem = item.get('element', {})
+            for column, (name, kind) in zip(columns, ELEMENT_FIELDS):
+                value = elem.get(name)
+                if value is None:
+                    column.append(MISSING)
+                elif kind == 's':
+                    column.append(strings.intern(value))
+                else:
+                    column.append(int(value))
+
+            rect = item.get('rect')
+            if rect is not None:
+                flags |= FLAG_RECT
+                for column, name in zip(rects, RECT_FIELDS):
+                    column.append(rect.get(name, 0.0))
+            else:
+                for column in rects:
+                    column.append(0.0)
+
+            styles = item.get('styles')
+            if styles is not None:
+                flags |= FLAG_STYLES
+                pairs = array('I')
+                for name, value in styles.items():
+                    pairs.append(strings.intern(name))
+                    pairs.append(strings.intern(value))
+                if sys.byteorder != 'little':
+                    pairs.byteswap()
+                f.write(pairs.tobytes())
+                style_pair_count += len(styles)
+            style_offsets.append(style_pair_count)
+
+            key_styles = elem.get('keyStyles')
+            if key_styles is not None:
+                flags |= FLAG_KEY_STYLES
+                for name, value in key_styles.items():
+                    key_pairs.append(strings.intern(name))
+                    key_pairs.append(strings.intern(value))
+            key_offsets.append(len(key_pairs) // 2)
+
+        sections['style_pairs'] = (style_pairs_offset, style_pair_count * 8)
+
+        str_offsets = array('I', [0])
+        encoded = []
+        total = 0
+        for value in strings.strings:
+            data = value.encode('utf-8')
+            encoded.append(data)
+            total += len(data)
+            str_offsets.append(total)
+
+        sections['str_offsets'] = _write_aligned(f, str_offsets)
+        sections['str_data'] = _write_aligned(f, b''.join(encoded))
+        element_data = array('I')
+        for column in columns:
+            element_data.extend(column)
+        sections['elements'] = _write_aligned(f, element_data)
+        rect_data = array('f')
+        for column in rects:
+            rect_data.extend(column)
+        sections['rects'] = _write_aligned(f, rect_data)
+        sections['style_offsets'] = _write_aligned(f, style_offsets)
+        sections['key_offsets'] = _write_aligned(f, key_offsets)
+        sections['key_pairs'] = _write_aligned(f, key_pairs)
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(style_offsets) - 1, len(strings.strings), flags))
+        for name in SECTIONS:
+            f.write(SECTION_ENTRY.pack(*sections[name]))
+
+    os.replace(tmp_path, snapshot_file_path)
+    return snapshot_file_path
+
+
+def _cast(view, typecode):
+    """把 mmap 上的一段字节零拷贝地转换成数组视图（大端机器上退化为拷贝）"""
+    if sys.byteorder == 'little':
+        return view.cast(typecode)
+    data = array(typecode, view.tobytes())
+    data.byteswap()
+    return data
+
+
+class SnapshotStyles(Mapping):
+    """一个元素的样式，按需从 (属性 id, 值 id) 对解码"""
+
+    def __init__(self, snapshot, pairs, properties=None):
+        self._snapshot = snapshot
+        self._pairs = pairs
+        self._properties = properties
+        self._dict = None
+
+    def _materialize(self):
+        if self._dict is None:
+            string = self._snapshot.string
+            pairs = self._pairs
+            styles = {string(pairs[i]): string(pairs[i + 1]) for i in range(0, len(pairs), 2)}
+            if self._properties is not None:
+                styles = {name: styles[name] for name in self._properties if name in styles}
+            self._dict = styles
+        return self._dict
+
+    def __getitem__(self, name):
+        return self._materialize()[name]
+
+    def __iter__(self):
+        return iter(self._materialize())
+
+    def __len__(self):
+        return len(self._materialize())
+
+
+class Snapshot(Sequence):
+    """mmap 打开的快照，按下标返回与 JSON 导出结构相同的元素记录"""
+
+    def __init__(self, snapshot_file_path, properties=None):
+        self.path = snapshot_file_path
+        self.properties = tuple(properties) if properties is not None else None
+        self._file = open(snapshot_file_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+
+        magic, version, count, n_strings, flags = HEADER.unpack_from(view, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a ZBrowser snapshot: {snapshot_file_path}")
+        self._count = count
+        self.flags = flags
+
+        sections = {}
+        for i, name in enumerate(SECTIONS):
+            offset, length = SECTION_ENTRY.unpack_from(view, HEADER.size + i * SECTION_ENTRY.size)
+            sections[name] = view[offset:offset + length]
+
+        self._str_offsets = _cast(sections['str_offsets'], 'I')
+        self._str_data = sections['str_data']
+        self._strings = [None] * n_strings
+        self._elements = _cast(sections['elements'], 'I')
+        self._rects = _cast(sections['rects'], 'f')
+        self._style_offsets = _cast(sections['style_offsets'], 'I')
+        self._style_pairs = _cast(sections['style_pairs'], 'I')
+        self._style_bytes = sections['style_pairs']
+        self._shared_styles = {}
+        self._key_offsets = _cast(sections['key_offsets'], 'I')
+        self._key_pairs = _cast(sections['key_pairs'], 'I')
+        self._items = [None] * count
+
+    def close(self):
+        """释放 mmap 和文件
+
+        已取出的元素记录仍可能持有 mmap 上的视图（样式对），这时 mmap 无法立即关闭，
+        留给最后一个视图释放时回收；文件句柄总是立即关闭（mmap 持有自己的描述符副本）。
+        """
+        self._items = [None] * self._count
+        self._shared_styles = {}
+        self._str_offsets = self._str_data = self._elements = self._rects = None
+        self._style_offsets = self._style_pairs = self._style_bytes = None
+        self._key_offsets = self._key_pairs = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def string(self, sid):
+        """按 id 取字符串（解码结果会缓存）"""
+        value = self._strings[sid]
+        if value is None:
+            start, end = self._str_offsets[sid], self._str_offsets[sid + 1]
+            value = bytes(self._str_data[start:end]).decode('utf-8')
+            self._strings[sid] = value
+        return value
+
+    def __len__(self):
+        return self._count
+
+    def _styles(self, pos):
+        """样式对逐字节相同的元素共用同一个 SnapshotStyles，每种样式只解码一次"""
+        start, end = self._style_offsets[pos], self._style_offsets[pos + 1]
+        key = self._style_bytes[start * 8:end * 8]
+        styles = self._shared_styles.get(key)
+        if styles is None:
+            styles = self._shared_styles[key] = SnapshotStyles(
+                self, self._style_pairs[start * 2:end * 2], self.properties)
+        return styles
+
+    def column(self, name):
+        """返回某个元素字段或矩形字段的整列（uint32 / float32 视图）"""
+        n = self._count
+        for i, (field, _) in enumerate(ELEMENT_FIELDS):
+            if field == name:
+                return self._elements[i * n:(i + 1) * n]
+        i = RECT_FIELDS.index(name)
+        return self._rects[i * n:(i + 1) * n]
+
+    def _element(self, pos):
+        n = self._count
+        elem = {}
+        for i, (name, kind) in enumerate(ELEMENT_FIELDS):
+            value = self._elements[i * n + pos]
+            if value == MISSING:
+                continue
+            if kind == 's':
+                elem[name] = self.string(value)
+            elif kind == 'b':
+                elem[name] = bool(value)
+            else:
+                elem[name] = value
+        if self.flags & FLAG_KEY_STYLES:
+            start, end = self._key_offsets[pos], self._key_offsets[pos + 1]
+            pairs = self._key_pairs[start * 2:end * 2]
+            elem['keyStyles'] = {self.string(pairs[i]): self.string(pairs[i + 1])
+                                 for i in range(0, len(pairs), 2)}
+        return elem
+
+    def _rect(self, pos):
+        n = self._count
+        x, y, width, height, vx, vy = (self._rects[i * n + pos] for i in range(len(RECT_FIELDS)))
+        return {
+            'x': x, 'y': y,
+            'viewportX': vx, 'viewportY': vy,
+            'width': width, 'height': height,
+            'top': y, 'right': x + width, 'bottom': y + height, 'left': x,
+            'viewportTop': vy, 'viewportRight': vx + width,
+            'viewportBottom': vy + height, 'viewportLeft': vx,
+        }
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self[i] for i in range(*pos.indices(self._count))]
+        if pos < 0:
+            pos += self._count
+        if not 0 <= pos < self._count:
+            raise IndexError(pos)
+
+        item = self._items[pos]
+        if item is None:
+            item = {'element': self._element(pos)}
+            if self.flags & FLAG_RECT:
+                item['rect'] = self._rect(pos)
+            if self.flags & FLAG_STYLES and self.properties != ():
+                item['styles'] = self._styles(pos)
+            self._items[pos] = item
+        return item
+
+
+def open_dump(dump_file_path, properties=None):
+    """打开一个 Chrome 导出，返回元素记录序列
+
+    - 路径本身是 .zbsnap：直接 mmap 打开
+    - 存在同名且不比 JSON 旧的 .zbsnap：使用快照
+    - 否则流式读取 JSON（styles 只保留 properties 中的属性，并换成 style_share 的共享记录）
+    """
+    if dump_file_path.endswith(SNAPSHOT_SUFFIX):
+        return Snapshot(dump_file_path, properties)
+
+    snapshot_file_path = snapshot_path_for(dump_file_path)
+    if os.path.exists(snapshot_file_path):
+        if (not os.path.exists(dump_file_path) or
+                os.path.getmtime(snapshot_file_path) >= os.path.getmtime(dump_file_path)):
+            return Snapshot(snapshot_file_path, properties)
+    return share_styles(iter_elements(dump_file_path, properties))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 dump_snapshot.py <json_file> [snapshot_file]")
+        print("\nExamples:")
+        print("  python3 dump_snapshot.py element-rects.json")
+        print("  python3 dump_snapshot.py computed-styles-structured.json styles.zbsnap")
+        sys.exit(1)
+
+    json_file_path = sys.argv[1]
+    snapshot_file_path = sys.argv[2] if len(sys.argv) > 2 else None
+    output = convert(json_file_path, snapshot_file_path)
+    print(f"✓ {json_file_path} ({os.path.getsize(json_file_path)} bytes) -> "
+          f"{output} ({os.path.getsize(output)} bytes)")
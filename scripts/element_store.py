@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Chrome 元素数据的共享索引（element-rects.json / computed-styles-structured.json）
+
+一次性按 tagName、class token、id、parentClassName 建立哈希索引，
+textContent 子串查询走三元组（trigram）倒排索引，
+查询代价只与候选集大小有关，与页面元素总数无关。
+矩形的空间索引（spatial_index.SpatialIndex）同样在第一次区域查询时才建立，
+常驻查询服务缓存 store 时一起保留。
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+
+from dump_snapshot import open_dump
+
+TRIGRAM = 3
+
+
+def match_element(elem, tag_name=None, class_name=None, id_name=None,
+                  parent_class=None, text_content_substring=None):
+    """逐项校验单个元素是否满足查询条件（索引求出候选集后用它做最终确认）"""
+    if tag_name and elem.get('tagName', '').lower() != tag_name.lower():
+        return False
+    if class_name and class_name not in elem.get('className', '').split():
+        return False
+    if id_name and elem.get('id', '') != id_name:
+        return False
+    if parent_class and parent_class not in elem.get('parentClassName', '').split():
+        return False
+    if text_content_substring and text_content_substring not in elem.get('textContent', ''):
+        return False
+    return True
+
+
+def _intersect_sorted(postings):
+    """求若干个升序 posting list 的交集：从最短的开始，在其余列表里二分查找"""
+    postings = sorted(postings, key=len)
+    result = []
+    for pos in postings[0]:
+        for other in postings[1:]:
+            i = bisect_left(other, pos)
+            if i == len(other) or other[i] != pos:
+                break
+        else:
+            result.append(pos)
+    return result
+
+
+class ElementStore:
+    """元素列表 + 查询索引
+
+    items 是 Chrome 导出的元素列表（每项形如 {'element': {...}, 'rect'/'styles': ...}），
+    find() 返回原始 item，顺序与文档顺序一致。
+    """
+
+    def __init__(self, items):
+        self.items = items
+        self._by_tag = defaultdict(list)
+        self._by_class = defaultdict(list)
+        self._by_id = defaultdict(list)
+        self._by_parent_class = defaultdict(list)
+        # textContent 的 trigram 索引在第一次文本查询时才建立
+        self._by_trigram = None
+        # 矩形的空间索引在第一次区域查询时才建立（依赖 numpy）
+        self._spatial = None
+
+        for pos, item in enumerate(items):
+            elem = item['element']
+            self._by_tag[elem.get('tagName', '').lower()].append(pos)
+            for token in set(elem.get('className', '').split()):
+                self._by_class[token].append(pos)
+            if elem.get('id'):
+                self._by_id[elem['id']].append(pos)
+            for token in set(elem.get('parentClassName', '').split()):
+                self._by_parent_class[token].append(pos)
+
+    @classmethod
+    def load(cls, dump_file_path, properties=None):
+        """加载 Chrome 导出并建立索引（有快照时走 mmap 快照，否则读 JSON）
+
+        properties: styles 中需要保留的属性名，None 表示全部保留
+        """
+        return cls(open_dump(dump_file_path, properties))
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def spatial_index(self):
+        """元素 rect 的 SpatialIndex（第一次调用时建立，之后复用）"""
+        if self._spatial is None:
+            from spatial_index import SpatialIndex
+            self._spatial = SpatialIndex.from_chrome(self.items)
+        return self._spatial
+
+    def _build_text_index(self):
+        by_trigram = defaultdict(list)
+        for pos, item in enumerate(self.items):
+            text = item['element'].get('textContent', '')
+            grams = {text[i:i + TRIGRAM] for i in range(len(text) - TRIGRAM + 1)}
+            for gram in grams:
+                by_trigram[gram].append(pos)
+        self._by_trigram = by_trigram
+
+    def _text_postings(self, text):
+        """返回子串查询需要求交集的 posting list；查询短于一个 trigram 时返回 None
+
+        短查询不走索引：在其它条件求出的候选集上逐个校验，没有其它条件时扫描全表。
+        查询脚本里的短文本查询很少见，全表扫描的代价与一次 trigram 索引构建相当，
+        所以不再为它额外维护 unigram / bigram 索引。
+        """
+        if len(text) < TRIGRAM:
+            return None
+        if self._by_trigram is None:
+            self._build_text_index()
+        grams = {text[i:i + TRIGRAM] for i in range(len(text) - TRIGRAM + 1)}
+        return [self._by_trigram.get(gram, []) for gram in grams]
+
+    def find(self, tag_name=None, class_name=None, id_name=None,
+             parent_class=None, text_content_substring=None):
+        """查找匹配的元素
+
+        tagName 不区分大小写；class_name / parent_class 按 class token 精确匹配；
+        text_content_substring 是 textContent 的子串（短于 3 个字符时退化为在候选集或全表上逐个校验）。
+        """
+        return [self.items[pos] for pos in self.find_positions(
+            tag_name, class_name, id_name, parent_class, text_content_substring)]
+
+    def find_positions(self, tag_name=None, class_name=None, id_name=None,
+                       parent_class=None, text_content_substring=None):
+        """同 find()，但返回匹配元素在 items 中的下标"""
+        postings = []
+        if tag_name:
+            postings.append(self._by_tag.get(tag_name.lower(), []))
+        if class_name:
+            postings.append(self._by_class.get(class_name, []))
+        if id_name:
+            postings.append(self._by_id.get(id_name, []))
+        if parent_class:
+            postings.append(self._by_parent_class.get(parent_class, []))
+        if text_content_substring:
+            text_postings = self._text_postings(text_content_substring)
+            if text_postings is not None:
+                postings.extend(text_postings)
+
+        if postings:
+            candidates = _intersect_sorted(postings)
+        else:
+            candidates = range(len(self.items))
+
+        return [
+            pos for pos in candidates
+            if match_element(self.items[pos]['element'], tag_name, class_name, id_name,
+                             parent_class, text_content_substring)
+        ]
+
+    def find_first(self, tag_name=None, class_name=None, id_name=None,
+                   parent_class=None, text_content_substring=None):
+        """返回第一个匹配的元素，没有则返回 None"""
+        found = self.find(tag_name, class_name, id_name, parent_class, text_content_substring)
+        return found[0] if found else None
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+ZBrowser 渲染结果（output.png）与 Chrome 截图（test_page_ok.jpeg）的像素级对比
+
+- 两张图解码成 NumPy uint8 数组；PNG 自带解码器（zlib + NumPy），
+  JPEG 等其它格式需要安装 Pillow（装了 Pillow 时 PNG 也交给它解码）
+- Chrome 截图通常带 devicePixelRatio（例如 1722px 宽对应 980 CSS px），
+  默认按宽度自动计算缩放比例，用最近邻采样对齐到 ZBrowser 的像素网格
+- 每个像素的颜色距离 = max(|ΔR|, |ΔG|, |ΔB|)，超过容差即为不匹配
+  （与 tests/html/test_page_render_helpers.zig 中逐通道比较容差的方式一致）
+- 按行分块计算，全程 uint8，只有行块大小的临时数组，不会复制出整页的浮点图像
+- 可选输出热力图 PNG；给出 element-rects.json 时按 Chrome 矩形统计每个元素的不匹配比例，
+  通过标准沿用 docs/TEST_VERIFICATION_IMPROVEMENTS.md：大元素（>=100 像素）至少 50% 匹配，
+  小元素至少 80% 匹配
+
+用法: python3 image_diff.py <output.png> <test_page_ok.jpeg> [--rects element-rects.json] [--heatmap diff.png]
+"""
+
+import argparse
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from dom_match import build_chrome_tree
+from element_store import ElementStore
+from rect_diff import chrome_rect_array
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# PNG 颜色类型 -> 每像素通道数
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+DEFAULT_TOLERANCE = 10
+DEFAULT_TILE_ROWS = 256
+# 元素通过标准：面积 >= SMALL_ELEMENT_AREA 的元素至少 50% 像素匹配，更小的元素至少 80%
+SMALL_ELEMENT_AREA = 100
+LARGE_MATCH_RATIO = 0.5
+SMALL_MATCH_RATIO = 0.8
+
+
+# ---- PNG 解码 ----
+
+# Average / Paeth 行按对角线波前还原时，每批处理的行数
+WAVEFRONT_ROWS = 512
+
+
+def _predict_paeth(a, b, c):
+    pa = np.abs(b - c)
+    pb = np.abs(a - c)
+    pc = np.abs(a + b - 2 * c)
+    return np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+
+def _unfilter_wavefront(data, filters, prior, bpp):
+    """按反对角线波前还原一批行（任意滤波器混合）
+
+    Average / Paeth 依赖同一行左边已还原的像素，逐行无法向量化。但像素 (r, i) 只依赖
+    (r, i-1)、(r-1, i)、(r-1, i-1)，同一条反对角线 r + i = t 上的像素互不依赖。
+    把这批行按对角线错开存放后，每条对角线是一段连续切片，整批行只需 行数 + 行宽 步。
+    """
+    rows, stride = data.shape
+    width = stride // bpp
+    steps = rows + width - 1
+    pixels = data.reshape(rows, width, bpp)
+
+    # x[t, r] = 像素 (r, t - r) 的滤波后数据
+    r_idx = np.arange(rows)[:, None]
+    t_idx = r_idx + np.arange(width)[None, :]
+    x = np.zeros((steps, rows, bpp), dtype=np.int16)
+    x[t_idx, r_idx] = pixels
+
+    # q[t + 2, r + 1] = 像素 (r, t - r) 的还原结果；q[:, 0] 是上一行，越界位置保持 0
+    q = np.zeros((steps + 2, rows + 1, bpp), dtype=np.int16)
+    q[2:width + 1, 0] = prior.reshape(width, bpp)[1:]
+    q[1, 0] = prior[:bpp]
+    kinds = filters.astype(np.int16)[:, None]
+
+    for t in range(steps):
+        lo = max(0, t - width + 1)
+        hi = min(rows, t + 1)
+        a = q[t + 1, lo + 1:hi + 1]
+        b = q[t + 1, lo:hi]
+        c = q[t, lo:hi]
+        kind = kinds[lo:hi]
+        pred = np.select(
+            [kind == 1, kind == 2, kind == 3, kind == 4],
+            [a, b, (a + b) >> 1, _predict_paeth(a, b, c)],
+        )
+        q[t + 2, lo + 1:hi + 1] = (x[t, lo:hi] + pred) & 0xFF
+
+    return q[t_idx + 2, r_idx + 1].astype(np.uint8).reshape(rows, stride)
+
+
+def _unfilter(rows, height, stride, bpp):
+    """还原 PNG 的逐行滤波，返回 (height, stride) 的 uint8 数组"""
+    filters = rows[:, 0]
+    if filters.max(initial=0) > 4:
+        raise ValueError(f"未知的 PNG 滤波器类型 {filters.max()}")
+    data = rows[:, 1:]
+    out = np.empty((height, stride), dtype=np.uint8)
+    prior = np.zeros(stride, dtype=np.uint8)
+    y = 0
+    while y < height:
+        kind = filters[y]
+        if kind == 0:
+            out[y] = data[y]
+        elif kind == 1:
+            # Sub：每个通道在行内做前缀和（uint8 累加自动按 256 取模）
+            out[y] = np.cumsum(data[y].reshape(-1, bpp), axis=0, dtype=np.uint8).reshape(-1)
+        elif kind == 2:
+            np.add(data[y], prior, out=out[y])
+        else:
+            end = min(y + WAVEFRONT_ROWS, height)
+            out[y:end] = _unfilter_wavefront(data[y:end], filters[y:end], prior, bpp)
+            y = end
+            prior = out[y - 1]
+            continue
+        prior = out[y]
+        y += 1
+    return out
+
+
+def read_png(path):
+    """解码 8 位非交错 PNG，返回 (H, W, C) 的 uint8 数组"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError(f"'{path}' 不是 PNG 文件")
+
+    header = None
+    palette = None
+    idat = []
+    offset = len(PNG_SIGNATURE)
+    while offset + 8 <= len(data):
+        length, kind = struct.unpack_from('>I4s', data, offset)
+        body = data[offset + 8:offset + 8 + length]
+        offset += 12 + length
+        if kind == b'IHDR':
+            header = struct.unpack('>IIBBBBB', body)
+        elif kind == b'PLTE':
+            palette = np.frombuffer(body, dtype=np.uint8).reshape(-1, 3)
+        elif kind == b'IDAT':
+            idat.append(body)
+        elif kind == b'IEND':
+            break
+
+    if header is None:
+        raise ValueError(f"'{path}' 缺少 IHDR")
+    width, height, depth, color_type, _, _, interlace = header
+    if depth != 8 or interlace != 0 or color_type not in PNG_CHANNELS:
+        raise ValueError(f"不支持的 PNG 格式（位深度 {depth}, 颜色类型 {color_type}, 交错 {interlace}），"
+                         f"请安装 Pillow")
+
+    channels = PNG_CHANNELS[color_type]
+    stride = width * channels
+    raw = zlib.decompress(b''.join(idat))
+    rows = np.frombuffer(raw, dtype=np.uint8, count=height * (stride + 1)).reshape(height, stride + 1)
+    pixels = _unfilter(rows, height, stride, channels).reshape(height, width, channels)
+    if color_type == 3:
+        if palette is None:
+            raise ValueError(f"'{path}' 缺少调色板")
+        pixels = palette[pixels[:, :, 0]]
+    return pixels
+
+
+def to_rgb(pixels):
+    """统一成 (H, W, 3) 的 RGB；带 alpha 的图像合成到白色背景上"""
+    channels = pixels.shape[2]
+    if channels in (1, 2):
+        gray = pixels[:, :, :1]
+        pixels = np.concatenate([gray, gray, gray] + ([pixels[:, :, 1:]] if channels == 2 else []), axis=2)
+    if pixels.shape[2] == 4:
+        alpha = pixels[:, :, 3:]
+        if alpha.min() == 255:
+            return np.ascontiguousarray(pixels[:, :, :3])
+        rgb = pixels[:, :, :3].astype(np.uint16)
+        a = alpha.astype(np.uint16)
+        return ((rgb * a + 255 * (255 - a) + 127) // 255).astype(np.uint8)
+    return pixels
+
+
+def load_image(path):
+    """读取图像为 (H, W, 3) 的 uint8 RGB 数组"""
+    if Image is not None:
+        with Image.open(path) as img:
+            return to_rgb(np.asarray(img.convert('RGBA')))
+    with open(path, 'rb') as f:
+        is_png = f.read(len(PNG_SIGNATURE)) == PNG_SIGNATURE
+    if not is_png:
+        raise ValueError(f"'{path}' 不是 PNG，读取其它格式需要安装 Pillow（pip install pillow）")
+    return to_rgb(read_png(path))
+
+
+# ---- PNG 编码（热力图）----
+
+def _png_chunk(kind, body):
+    return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body) & 0xFFFFFFFF)
+
+
+class PngWriter:
+    """按行块写入 RGB PNG（滤波器全部为 None），整张图不需要同时在内存中"""
+
+    def __init__(self, path, width, height):
+        self.f = open(path, 'wb')
+        self.width = width
+        self.compressor = zlib.compressobj(6)
+        self.f.write(PNG_SIGNATURE)
+        self.f.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+
+    def write_rows(self, rgb):
+        rows = np.zeros((rgb.shape[0], self.width * 3 + 1), dtype=np.uint8)
+        rows[:, 1:] = rgb.reshape(rgb.shape[0], -1)
+        compressed = self.compressor.compress(rows.tobytes())
+        if compressed:
+            self.f.write(_png_chunk(b'IDAT', compressed))
+
+    def close(self):
+        self.f.write(_png_chunk(b'IDAT', self.compressor.flush()))
+        self.f.write(_png_chunk(b'IEND', b''))
+        self.f.close()
+
+
+def heatmap_tile(test_tile, distance, tolerance):
+    """热力图：匹配的像素显示为淡化的灰度原图，不匹配的像素从黄色（小偏差）到红色（大偏差）"""
+    gray = (test_tile.sum(axis=2, dtype=np.uint16) // 12 + 191).astype(np.uint8)
+    rgb = np.repeat(gray[:, :, None], 3, axis=2)
+    bad = distance > tolerance
+    if bad.any():
+        rgb[bad, 0] = 255
+        rgb[bad, 1] = 255 - np.minimum(distance[bad].astype(np.uint16) * 2, 255).astype(np.uint8)
+        rgb[bad, 2] = 0
+    return rgb
+
+
+# ---- 对比 ----
+
+def channel_distance(a, b, out, scratch):
+    """out = max(|ΔR|, |ΔG|, |ΔB|)，全程 uint8：|a - b| = max(a, b) - min(a, b)，不需要扩宽到 int16"""
+    for ch in range(3):
+        x = a[:, :, ch]
+        y = b[:, :, ch]
+        target = out if ch == 0 else scratch
+        np.subtract(np.maximum(x, y), np.minimum(x, y), out=target)
+        if ch:
+            np.maximum(out, scratch, out=out)
+
+
+def diff_images(test, ref, tolerance=DEFAULT_TOLERANCE, scale=None, tile_rows=DEFAULT_TILE_ROWS, heatmap_path=None):
+    """逐块计算两张图的颜色距离
+
+    test: ZBrowser 渲染结果 (H, W, 3)；ref: Chrome 截图 (H', W', 3)
+    scale: Chrome 截图像素 / ZBrowser 像素，None 表示按宽度自动计算
+    返回 dict：distance（重叠区域的 (h, w) uint8 距离图）、mismatched、scale 等
+    """
+    if scale is None:
+        scale = ref.shape[1] / test.shape[1]
+    height = min(test.shape[0], int(ref.shape[0] / scale))
+    width = min(test.shape[1], int(ref.shape[1] / scale))
+
+    distance = np.empty((height, width), dtype=np.uint8)
+    scratch = np.empty((min(tile_rows, height), width), dtype=np.uint8)
+    cols = np.minimum(((np.arange(width) + 0.5) * scale).astype(np.intp), ref.shape[1] - 1)
+    same_grid = scale == 1.0
+    writer = PngWriter(heatmap_path, width, height) if heatmap_path else None
+    mismatched = 0
+    try:
+        for y0 in range(0, height, tile_rows):
+            y1 = min(y0 + tile_rows, height)
+            test_tile = test[y0:y1, :width]
+            if same_grid:
+                ref_tile = ref[y0:y1, :width]
+            else:
+                rows = np.minimum(((np.arange(y0, y1) + 0.5) * scale).astype(np.intp), ref.shape[0] - 1)
+                ref_tile = ref[rows[:, None], cols[None, :]]
+            d = distance[y0:y1]
+            channel_distance(test_tile, ref_tile, d, scratch[:y1 - y0])
+            mismatched += int(np.count_nonzero(d > tolerance))
+            if writer is not None:
+                writer.write_rows(heatmap_tile(test_tile, distance[y0:y1], tolerance))
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return {
+        'distance': distance,
+        'mismatched': mismatched,
+        'compared': height * width,
+        'scale': scale,
+        'tolerance': tolerance,
+        'test_size': test.shape[:2],
+        'ref_size': ref.shape[:2],
+    }
+
+
+def summed_area_table(mask):
+    """二维前缀和（左上补一行一列 0），任意矩形内的计数都是 O(1)"""
+    table = np.zeros((mask.shape[0] + 1, mask.shape[1] + 1), dtype=np.uint32)
+    np.cumsum(mask, axis=0, dtype=np.uint32, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    return table
+
+
+def clip_rects(rects, width, height):
+    """把 (N, 4) 的 x, y, width, height 矩形裁剪成整数像素范围 (x0, y0, x1, y1)"""
+    x0 = np.clip(np.floor(rects[:, 0]), 0, width).astype(np.intp)
+    y0 = np.clip(np.floor(rects[:, 1]), 0, height).astype(np.intp)
+    x1 = np.clip(np.ceil(rects[:, 0] + rects[:, 2]), 0, width).astype(np.intp)
+    y1 = np.clip(np.ceil(rects[:, 1] + rects[:, 3]), 0, height).astype(np.intp)
+    return x0, y0, np.maximum(x1, x0), np.maximum(y1, y0)
+
+
+def element_mismatch(result, rects):
+    """每个元素矩形内不匹配像素的比例，返回 (area, mismatch_ratio, passed) 三个数组"""
+    distance = result['distance']
+    table = summed_area_table(distance > result['tolerance'])
+    x0, y0, x1, y1 = clip_rects(rects, distance.shape[1], distance.shape[0])
+    area = (x1 - x0) * (y1 - y0)
+    # uint32 前缀和相减时按 2^32 取模，结果仍然正确
+    bad = (table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0]).astype(np.int64)
+    ratio = np.divide(bad, area, out=np.zeros(len(area)), where=area > 0)
+    required = np.where(area >= SMALL_ELEMENT_AREA, LARGE_MATCH_RATIO, SMALL_MATCH_RATIO)
+    passed = (area == 0) | (1.0 - ratio >= required)
+    return area, ratio, passed
+
+
+def print_image_report(result, seconds):
+    """打印整图的对比结果"""
+    compared = result['compared']
+    print("=" * 96)
+    print("ZBrowser vs Chrome 像素对比")
+    print("=" * 96)
+    th, tw = result['test_size']
+    rh, rw = result['ref_size']
+    h, w = result['distance'].shape
+    print(f"ZBrowser: {tw}x{th}, Chrome: {rw}x{rh} (缩放 {result['scale']:.4f}), 对比区域: {w}x{h}")
+    ratio = result['mismatched'] / compared if compared else 0.0
+    print(f"容差: {result['tolerance']}, 不匹配像素: {result['mismatched']} / {compared} ({ratio:.2%}), "
+          f"耗时: {seconds * 1000:.1f} ms")
+
+
+def print_element_report(items, area, ratio, passed, top=20):
+    """打印不匹配比例最高的元素表"""
+    nodes = build_chrome_tree(items)
+    visible = area > 0
+    print(f"\n元素: {len(items)}, 在对比区域内: {int(visible.sum())}, "
+          f"未通过: {int((~passed).sum())}（大元素需 {LARGE_MATCH_RATIO:.0%} 匹配，"
+          f"小于 {SMALL_ELEMENT_AREA} 像素的需 {SMALL_MATCH_RATIO:.0%}）")
+    order = np.argsort(-np.where(visible, ratio, -1.0), kind='stable')
+    print(f"\n{'#':>4}  {'index':>6}  {'element':<32} {'area':>9} {'mismatch':>9}  {'':4}  path")
+    for rank, pos in enumerate(order[:top], 1):
+        if not visible[pos]:
+            break
+        elem = items[int(pos)]['element']
+        label = elem['tagName'].lower()
+        if elem.get('className'):
+            label += '.' + '.'.join(elem['className'].split())
+        if elem.get('id'):
+            label += '#' + elem['id']
+        status = 'OK' if passed[pos] else 'FAIL'
+        print(f"{rank:>4}  {elem.get('index', '?'):>6}  {label[:32]:<32} {int(area[pos]):>9} "
+              f"{ratio[pos]:>8.1%}  {status:<4}  {nodes[int(pos)].path}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="ZBrowser 渲染结果与 Chrome 截图的像素级对比")
+    arg_parser.add_argument('zbrowser_png', help="ZBrowser 的渲染结果（output.png）")
+    arg_parser.add_argument('chrome_image', help="Chrome 截图（test_page_ok.jpeg）")
+    arg_parser.add_argument('--tolerance', type=int, default=DEFAULT_TOLERANCE,
+                            help=f"每个通道允许的颜色偏差（默认 {DEFAULT_TOLERANCE}）")
+    arg_parser.add_argument('--scale', type=float, default=None,
+                            help="Chrome 截图像素 / ZBrowser 像素（默认按图像宽度自动计算）")
+    arg_parser.add_argument('--heatmap', default=None, help="输出差异热力图 PNG")
+    arg_parser.add_argument('--rects', default=None, help="element-rects.json，按元素统计不匹配比例")
+    arg_parser.add_argument('--top', type=int, default=20, help="显示不匹配比例最高的前 N 个元素")
+    arg_parser.add_argument('--tile-rows', type=int, default=DEFAULT_TILE_ROWS, help="每块处理的行数")
+    args = arg_parser.parse_args()
+
+    try:
+        test_image = load_image(args.zbrowser_png)
+        ref_image = load_image(args.chrome_image)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    diff = diff_images(test_image, ref_image, args.tolerance, args.scale, args.tile_rows, args.heatmap)
+    print_image_report(diff, time.perf_counter() - started)
+
+    if args.rects:
+        store = ElementStore.load(args.rects)
+        area, ratio, passed = element_mismatch(diff, chrome_rect_array(store.items))
+        print_element_report(store.items, area, ratio, passed, args.top)
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+布局回归历史：把每次对比的逐元素误差存进本地 SQLite，跨构建查询
+
+表结构：
+  builds    一个 ZBrowser 可执行文件（按 sha256 区分，可带标签，如 git 提交）
+  runs      一次对比：哪个构建、哪个页面、什么时候，以及整页的汇总
+  elements  页面上的元素（按 DOM 路径区分），保存 tag / class / id 供选择器查询
+  deltas    每次运行、每个匹配元素的 x / y / width / height 误差（Chrome - ZBrowser）
+            和样式不一致的数量；主键 (run_id, element_id)，另有 element_id 索引
+  style_mismatches  样式不一致的明细（属性、Chrome 值、ZBrowser 值）
+
+deltas 是 WITHOUT ROWID 表，按 (run_id, element_id) 聚簇：两个构建之间的对比是两次
+按运行的范围扫描加主键查找，单个元素的趋势走 element_id 索引，都与历史总行数无关。
+写入用 executemany 批量插入，一次运行一个事务。
+
+用法:
+  python3 layout_history.py record <db> <element-rects.json> <zbrowser_output.txt> [--binary zbrowser] [--label rev]
+  python3 layout_history.py regressions <db> <build A> <build B> [--threshold 0.5]
+  python3 layout_history.py trend <db> div.block-test [--page test_page]
+  python3 layout_history.py builds <db>
+构建可以用标签、sha256 前缀、latest 或 previous 指定。
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from batch_conformance import DEFAULT_BINARY, STYLES_FILE
+from compare_rects import boxes_from_records
+from dom_match import build_chrome_tree
+from dump_snapshot import dump_exists, open_dump
+from rect_diff import BOX_PROPERTIES, full_page_diff
+from style_diff import (COMPARED_PROPERTIES, HELPER_PROPERTIES, ValueTable, chrome_value_matrix, diff_styles,
+                        zbrowser_value_rows)
+from zbrowser_log import iter_records
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY,
+    binary_hash TEXT NOT NULL UNIQUE,
+    label TEXT,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    build_id INTEGER NOT NULL REFERENCES builds(id),
+    page TEXT NOT NULL,
+    created REAL NOT NULL,
+    matched INTEGER NOT NULL,
+    unmatched INTEGER NOT NULL,
+    max_error REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_build_page ON runs(build_id, page, created);
+CREATE TABLE IF NOT EXISTS elements (
+    id INTEGER PRIMARY KEY,
+    page TEXT NOT NULL,
+    path TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    class_name TEXT NOT NULL,
+    elem_id TEXT NOT NULL,
+    UNIQUE(page, path)
+);
+CREATE INDEX IF NOT EXISTS elements_tag ON elements(tag);
+CREATE TABLE IF NOT EXISTS deltas (
+    run_id INTEGER NOT NULL,
+    element_id INTEGER NOT NULL,
+    dx REAL NOT NULL,
+    dy REAL NOT NULL,
+    dw REAL NOT NULL,
+    dh REAL NOT NULL,
+    error REAL NOT NULL,
+    style_mismatches INTEGER NOT NULL,
+    PRIMARY KEY (run_id, element_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS deltas_element ON deltas(element_id);
+CREATE TABLE IF NOT EXISTS style_mismatches (
+    run_id INTEGER NOT NULL,
+    element_id INTEGER NOT NULL,
+    property TEXT NOT NULL,
+    chrome TEXT NOT NULL,
+    zbrowser TEXT NOT NULL,
+    PRIMARY KEY (run_id, element_id, property)
+) WITHOUT ROWID;
+"""
+
+_SELECTOR_RE = re.compile(r'([A-Za-z][A-Za-z0-9-]*)?((?:\.[\w-]+)*)(?:#([\w-]+))?')
+
+
+def open_history(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def binary_digest(binary):
+    """可执行文件的 sha256（按块读取）"""
+    h = hashlib.sha256()
+    with open(binary, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def ensure_build(conn, binary_hash, label=None):
+    """返回构建 id（没有就新建）；给了标签时更新标签"""
+    row = conn.execute('SELECT id FROM builds WHERE binary_hash = ?', (binary_hash,)).fetchone()
+    if row is None:
+        return conn.execute('INSERT INTO builds (binary_hash, label, created) VALUES (?, ?, ?)',
+                            (binary_hash, label, time.time())).lastrowid
+    if label:
+        conn.execute('UPDATE builds SET label = ? WHERE id = ?', (label, row[0]))
+    return row[0]
+
+
+def resolve_build(conn, ref):
+    """标签 / sha256 前缀 / latest / previous -> 构建 id；找不到或不唯一时抛 ValueError"""
+    if ref in ('latest', 'previous'):
+        rows = conn.execute('SELECT id FROM builds ORDER BY created DESC LIMIT 2').fetchall()
+        index = 0 if ref == 'latest' else 1
+        if len(rows) <= index:
+            raise ValueError(f"历史中没有 {ref} 构建")
+        return rows[index][0]
+    rows = conn.execute('SELECT id FROM builds WHERE label = ?', (ref,)).fetchall()
+    if not rows and len(ref) >= 4:
+        # 不用 LIKE：'_' / '%' 会被当作通配符
+        prefix = ref.lower()
+        rows = conn.execute('SELECT id FROM builds WHERE substr(binary_hash, 1, ?) = ?',
+                            (len(prefix), prefix)).fetchall()
+    if not rows:
+        raise ValueError(f"找不到构建 '{ref}'")
+    if len(rows) > 1:
+        raise ValueError(f"构建 '{ref}' 不唯一（匹配 {len(rows)} 个）")
+    return rows[0][0]
+
+
+def element_style_mismatches(style_items, records, tolerance=0.5):
+    """样式对比（style_diff），返回 {元素 index: [(属性, Chrome 值, ZBrowser 值), ...]}"""
+    properties = COMPARED_PROPERTIES + HELPER_PROPERTIES
+    table = ValueTable()
+    nodes = build_chrome_tree(style_items)
+    chrome_matrix = chrome_value_matrix(style_items, properties, table)
+    elem, prop, zb_ids = zbrowser_value_rows(records, style_items, properties, table, nodes)
+    result = diff_styles(chrome_matrix, elem, prop, zb_ids, table, tolerance)
+
+    mismatches = {}
+    for row in np.flatnonzero(result['mismatch']):
+        index = style_items[int(elem[row])]['element'].get('index')
+        mismatches.setdefault(index, []).append((
+            properties[int(prop[row])],
+            table.labels[int(result['chrome_ids'][row])],
+            table.labels[int(zb_ids[row])],
+        ))
+    return mismatches
+
+
+def record_run(conn, build_id, page, rect_items, diff, style_mismatches=None):
+    """把一次 full_page_diff() 的结果写入历史，返回运行 id（一个事务）"""
+    style_mismatches = style_mismatches or {}
+    chrome_idx = diff['chrome_idx']
+    elems = [rect_items[int(pos)]['element'] for pos in chrome_idx]
+    with conn:
+        run_id = conn.execute(
+            'INSERT INTO runs (build_id, page, created, matched, unmatched, max_error) VALUES (?, ?, ?, ?, ?, ?)',
+            (build_id, page, time.time(), len(chrome_idx), int(diff['unmatched']),
+             float(diff['error'][0]) if len(chrome_idx) else 0.0)).lastrowid
+
+        conn.executemany(
+            'INSERT OR IGNORE INTO elements (page, path, tag, class_name, elem_id) VALUES (?, ?, ?, ?, ?)',
+            [(page, path, elem.get('tagName', '').lower(), elem.get('className', ''), elem.get('id', ''))
+             for path, elem in zip(diff['paths'], elems)])
+        element_ids = dict(conn.execute('SELECT path, id FROM elements WHERE page = ?', (page,)))
+
+        ids = [element_ids[path] for path in diff['paths']]
+        counts = [len(style_mismatches.get(elem.get('index'), ())) for elem in elems]
+        conn.executemany(
+            'INSERT INTO deltas (run_id, element_id, dx, dy, dw, dh, error, style_mismatches) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            zip([run_id] * len(ids), ids, *diff['deltas'].T.tolist(), diff['error'].tolist(), counts))
+        conn.executemany(
+            'INSERT OR REPLACE INTO style_mismatches (run_id, element_id, property, chrome, zbrowser) '
+            'VALUES (?, ?, ?, ?, ?)',
+            [(run_id, element_id, *mismatch)
+             for element_id, elem in zip(ids, elems)
+             for mismatch in style_mismatches.get(elem.get('index'), ())])
+    return run_id
+
+
+def latest_runs(conn, build_id, page=None):
+    """每个页面在该构建下最新的一次运行：{页面: 运行 id}"""
+    sql = 'SELECT page, id FROM runs WHERE build_id = ?'
+    params = [build_id]
+    if page:
+        sql += ' AND page = ?'
+        params.append(page)
+    return dict(conn.execute(sql + ' ORDER BY created', params))
+
+
+def find_regressions(conn, build_a, build_b, page=None, threshold=0.5, top=50):
+    """构建 B 相对构建 A 误差增大超过 threshold 的元素，按增大量降序
+
+    两个构建在同一页面都取最新的一次运行；返回 (行列表, 对比的页面数)。
+    """
+    runs_a = latest_runs(conn, build_a, page)
+    runs_b = latest_runs(conn, build_b, page)
+    rows = []
+    pages = sorted(set(runs_a) & set(runs_b))
+    for name in pages:
+        rows += conn.execute("""
+            SELECT e.page, e.path, e.tag, e.class_name, e.elem_id, a.error, b.error,
+                   b.dx, b.dy, b.dw, b.dh, a.style_mismatches, b.style_mismatches
+            FROM deltas b
+            JOIN deltas a ON a.run_id = ? AND a.element_id = b.element_id
+            JOIN elements e ON e.id = b.element_id
+            WHERE b.run_id = ? AND (b.error - a.error > ? OR b.style_mismatches > a.style_mismatches)
+            ORDER BY b.error - a.error DESC
+            LIMIT ?""", (runs_a[name], runs_b[name], threshold, top)).fetchall()
+    rows.sort(key=lambda row: row[5] - row[6])
+    return rows[:top], len(pages)
+
+
+def select_elements(conn, selector, page=None):
+    """按 'div.block-test' / 'h1#title' / DOM 路径查找元素 id"""
+    if selector.startswith('/'):
+        sql, params = 'SELECT id FROM elements WHERE path = ?', [selector]
+    else:
+        m = _SELECTOR_RE.fullmatch(selector)
+        if m is None or not selector:
+            raise ValueError(f"无法解析选择器 '{selector}'")
+        tag, classes, id_name = m.groups()
+        clauses, params = [], []
+        if tag:
+            clauses.append('tag = ?')
+            params.append(tag.lower())
+        # 按空格分隔的整词精确匹配；LIKE 会把 '_' / '%' 当通配符，而且不区分大小写（CSS 类名区分）
+        for class_name in classes.split('.')[1:]:
+            clauses.append("instr(' ' || class_name || ' ', ?) > 0")
+            params.append(f' {class_name} ')
+        if id_name:
+            clauses.append('elem_id = ?')
+            params.append(id_name)
+        sql = 'SELECT id FROM elements WHERE ' + ' AND '.join(clauses)
+    if page:
+        sql += ' AND page = ?'
+        params.append(page)
+    return [row[0] for row in conn.execute(sql, params)]
+
+
+def element_trend(conn, element_ids, last=None):
+    """元素在历次运行中的误差，按时间排序"""
+    if not element_ids:
+        return []
+    placeholders = ','.join('?' * len(element_ids))
+    rows = conn.execute(f"""
+        SELECT e.page, e.path, r.created, b.label, b.binary_hash, d.dx, d.dy, d.dw, d.dh, d.error,
+               d.style_mismatches
+        FROM deltas d
+        JOIN runs r ON r.id = d.run_id
+        JOIN builds b ON b.id = r.build_id
+        JOIN elements e ON e.id = d.element_id
+        WHERE d.element_id IN ({placeholders})
+        ORDER BY e.page, e.path, r.created""", element_ids).fetchall()
+    if last:
+        kept, count = [], {}
+        for row in reversed(rows):
+            key = (row[0], row[1])
+            count[key] = count.get(key, 0) + 1
+            if count[key] <= last:
+                kept.append(row)
+        rows = kept[::-1]
+    return rows
+
+
+def _build_label(label, binary_hash):
+    return label or binary_hash[:12]
+
+
+def _element_label(tag, class_name, elem_id):
+    label = tag
+    if class_name:
+        label += '.' + '.'.join(class_name.split())
+    if elem_id:
+        label += '#' + elem_id
+    return label
+
+
+def _timestamp(created):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(created))
+
+
+def print_regressions(rows, pages, label_a, label_b, threshold):
+    print("=" * 110)
+    print(f"布局回归: {label_a} -> {label_b}（对比页面 {pages}，误差增大超过 {threshold}px 或样式不一致增多）")
+    print("=" * 110)
+    if not rows:
+        print("没有回归")
+        return
+    print(f"{'page':<20} {'element':<28} {'err A':>8} {'err B':>8} {'Δerr':>8}  "
+          f"{'dx':>7} {'dy':>7} {'dw':>7} {'dh':>7}  {'style':>7}  path")
+    for page, path, tag, class_name, elem_id, err_a, err_b, dx, dy, dw, dh, style_a, style_b in rows:
+        print(f"{page[:20]:<20} {_element_label(tag, class_name, elem_id)[:28]:<28} {err_a:>8.2f} {err_b:>8.2f} "
+              f"{err_b - err_a:>+8.2f}  {dx:>7.2f} {dy:>7.2f} {dw:>7.2f} {dh:>7.2f}  "
+              f"{style_a:>3}->{style_b:<3}  {path}")
+
+
+def print_trend(rows):
+    if not rows:
+        print("没有匹配的记录")
+        return
+    current = None
+    for page, path, created, label, binary_hash, dx, dy, dw, dh, error, style in rows:
+        if (page, path) != current:
+            current = (page, path)
+            print(f"\n{page}  {path}")
+            print(f"  {'time':<19}  {'build':<14} {'error':>8}  {'dx':>7} {'dy':>7} {'dw':>7} {'dh':>7}  {'style':>5}")
+        print(f"  {_timestamp(created):<19}  {_build_label(label, binary_hash)[:14]:<14} {error:>8.2f}  "
+              f"{dx:>7.2f} {dy:>7.2f} {dw:>7.2f} {dh:>7.2f}  {style:>5}")
+
+
+def print_builds(conn):
+    rows = conn.execute("""
+        SELECT b.binary_hash, b.label, b.created, COUNT(r.id), MAX(r.max_error)
+        FROM builds b LEFT JOIN runs r ON r.build_id = b.id
+        GROUP BY b.id ORDER BY b.created""").fetchall()
+    print(f"{'build':<14} {'sha256':<14} {'first seen':<19} {'runs':>6} {'max err':>9}")
+    for binary_hash, label, created, runs, max_error in rows:
+        print(f"{(label or '-')[:14]:<14} {binary_hash[:12]:<14} {_timestamp(created):<19} {runs:>6} "
+              f"{max_error or 0.0:>9.2f}")
+
+
+def _cmd_record(args, conn):
+    if args.build is None and not os.path.exists(args.binary):
+        print(f"Error: 找不到 ZBrowser 可执行文件 '{args.binary}'（用 --binary 指定，或用 --build 给出构建名）")
+        sys.exit(1)
+    styles_file = args.styles or os.path.join(os.path.dirname(args.json_file), STYLES_FILE)
+    if not dump_exists(styles_file):
+        print(f"Error: 找不到样式导出 '{styles_file}'（用 --styles 指定）")
+        sys.exit(1)
+
+    records = list(iter_records(args.zbrowser_output or sys.stdin.buffer))
+    rect_items = open_dump(args.json_file, ())
+    style_items = open_dump(styles_file, tuple(dict.fromkeys(BOX_PROPERTIES + COMPARED_PROPERTIES + HELPER_PROPERTIES)))
+    diff = full_page_diff(rect_items, style_items, boxes_from_records(records))
+    mismatches = element_style_mismatches(style_items, records, args.tolerance)
+
+    binary_hash = f'build:{args.build}' if args.build is not None else binary_digest(args.binary)
+    build_id = ensure_build(conn, binary_hash, args.label or args.build)
+    page = args.page or os.path.basename(os.path.dirname(os.path.abspath(args.json_file)))
+    run_id = record_run(conn, build_id, page, rect_items, diff, mismatches)
+    print(f"✓ 运行 {run_id}: 页面 {page}, 构建 {_build_label(args.label or args.build, binary_hash)}, "
+          f"{len(diff['chrome_idx'])} 个元素, 样式不一致 {sum(len(v) for v in mismatches.values())}")
+
+
+def _cmd_regressions(args, conn):
+    build_a = resolve_build(conn, args.build_a)
+    build_b = resolve_build(conn, args.build_b)
+    started = time.perf_counter()
+    rows, pages = find_regressions(conn, build_a, build_b, args.page, args.threshold, args.top)
+    print_regressions(rows, pages, args.build_a, args.build_b, args.threshold)
+    print(f"\n查询耗时 {(time.perf_counter() - started) * 1000:.1f}ms")
+
+
+def _cmd_trend(args, conn):
+    started = time.perf_counter()
+    rows = element_trend(conn, select_elements(conn, args.selector, args.page), args.last)
+    print_trend(rows)
+    print(f"\n查询耗时 {(time.perf_counter() - started) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="布局误差的跨构建历史（SQLite）")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    record = commands.add_parser('record', help="对比一次 ZBrowser 输出并写入历史")
+    record.add_argument('db', help="历史数据库文件")
+    record.add_argument('json_file', help="Chrome 导出的 element-rects.json")
+    record.add_argument('zbrowser_output', nargs='?', help="ZBrowser 的输出（默认读标准输入）")
+    record.add_argument('--styles', default=None,
+                        help="computed-styles-structured.json（默认与 json_file 同目录）")
+    record.add_argument('--binary', default=DEFAULT_BINARY, help=f"产生这份输出的 ZBrowser（默认 {DEFAULT_BINARY}）")
+    record.add_argument('--build', default=None, help="不对可执行文件取哈希，直接用这个名字标识构建")
+    record.add_argument('--label', default=None, help="构建的标签（如 git 提交）")
+    record.add_argument('--page', default=None, help="页面名（默认取 json_file 所在目录名）")
+    record.add_argument('--tolerance', type=float, default=0.5, help="样式长度的误差容差（px）")
+
+    regressions = commands.add_parser('regressions', help="列出构建 B 相对构建 A 变差的元素")
+    regressions.add_argument('db', help="历史数据库文件")
+    regressions.add_argument('build_a', help="基准构建（标签 / sha256 前缀 / latest / previous）")
+    regressions.add_argument('build_b', help="新构建")
+    regressions.add_argument('--page', default=None, help="只看这个页面")
+    regressions.add_argument('--threshold', type=float, default=0.5, help="误差增大多少算回归（px）")
+    regressions.add_argument('--top', type=int, default=50, help="最多列出 N 个元素")
+
+    trend = commands.add_parser('trend', help="元素误差随构建的变化")
+    trend.add_argument('db', help="历史数据库文件")
+    trend.add_argument('selector', help="tag.class#id 形式的选择器，或 DOM 路径（如 /html[1]/body[1]/div[1]）")
+    trend.add_argument('--page', default=None, help="只看这个页面")
+    trend.add_argument('--last', type=int, default=None, help="每个元素只显示最近 N 次运行")
+
+    builds = commands.add_parser('builds', help="列出历史中的构建")
+    builds.add_argument('db', help="历史数据库文件")
+    args = arg_parser.parse_args()
+
+    if args.command != 'record' and not os.path.exists(args.db):
+        print(f"Error: 历史数据库 '{args.db}' 不存在")
+        sys.exit(1)
+    conn = open_history(args.db)
+    try:
+        if args.command == 'record':
+            _cmd_record(args, conn)
+        elif args.command == 'regressions':
+            _cmd_regressions(args, conn)
+        elif args.command == 'trend':
+            _cmd_trend(args, conn)
+        else:
+            print_builds(conn)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
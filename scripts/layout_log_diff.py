@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+两次构建的 ZBrowser 布局日志直接对比（不需要 Chrome 导出）
+
+同一个页面用上一次构建和这一次构建各跑一遍，对比两份调试输出里的盒子几何：
+  [LAYOUT] Element: div, is_root: false + margin: / padding: / content: 子行   -> 12 个数值
+  [UPDATE Y] child: p, content_height=..., margin.bottom=..., total_height=..., y after=...  -> 4 个数值
+只报告几何变化超过 --tolerance 的盒子，以及只在一边出现的盒子（新增 / 消失）。
+
+日志可能有好几 GB，所以：
+  - 第一遍：每份日志流式扫一遍，在大块字节上用一个以字面量开头的正则定位记录（扫描在 C 里完成，
+    UTF-8 日志不解码），每条记录只保留 tag 编号（int32）和记录原文的哈希（int64），不保留数值
+  - 对齐：先按哈希去掉相同的公共前缀 / 后缀，再以两边都只出现一次的哈希为锚点，用最长递增子序列
+    选出不交叉的锚点（patience diff）；锚点之间的空隙再按 tag 做同样的对齐。
+    按哈希配上的记录原文完全相同，不用再看
+  - 第二遍：只解析按 tag 配上、但哈希不同的记录的数值，按容差比较
+内存只与记录条数（每条 12 字节）和有变化的记录数有关。
+UTF-16 日志（PowerShell 的 `> output.txt`）会先拼回折行，报告里的行号是拼接后的行号。
+
+用法: python3 layout_log_diff.py old_output.txt new_output.txt [--tolerance 0.5] [--top 30]
+退出状态：有超出容差的变化、新增 / 消失的盒子，或原文不同但数值没解析出来的盒子时为 1。
+"""
+
+import argparse
+import re
+import sys
+from array import array
+
+import numpy as np
+
+from seq_align import align, gap_regions
+from zbrowser_log import NUM, iter_lines, open_log
+
+CHUNK_BYTES = 8 << 20
+UTF16_BATCH_LINES = 1 << 16
+
+ELEMENT_FIELDS = tuple(f'{box}.{edge}' for box in ('margin', 'padding') for edge in ('top', 'right', 'bottom', 'left')) \
+    + ('content.x', 'content.y', 'content.width', 'content.height')
+UPDATE_Y_FIELDS = ('content_height', 'margin.bottom', 'total_height', 'y_after')
+
+# 两种记录都以 '[' 开头，正则引擎可以直接跳到候选位置；在字节上匹配，UTF-8 日志不用解码
+_RECORD_RE = re.compile(
+    rb'\[(?:LAYOUT\] Element: (?P<element>\S+), is_root: \w+'
+    rb'(?:\r?\n[ \t]*margin: (?P<margin>[^\r\n]*))?'
+    rb'(?:\r?\n[ \t]*padding: (?P<padding>[^\r\n]*))?'
+    rb'(?:\r?\n[ \t]*content: (?P<content>[^\r\n]*))?'
+    rb'|UPDATE Y\] child: (?P<update_y>\S+), (?P<values>content_height=[^\r\n]*))'
+)
+# UPDATE Y 的数值按字段名取，某个字段没解析出来时不会把后面的数值错位到它身上
+_UPDATE_Y_RES = tuple(re.compile((re.escape(name) + '=' + NUM).encode())
+                      for name in ('content_height', 'margin.bottom', 'total_height', 'y after'))
+_EDGE_RE = re.compile(('top=' + NUM + ', right=' + NUM + ', bottom=' + NUM + ', left=' + NUM).encode())
+_CONTENT_RE = re.compile(('x=' + NUM + r',\s*y=' + NUM + r',\s*width=' + NUM + r',\s*height=' + NUM).encode())
+
+
+def _byte_chunks(source):
+    """把日志切成以完整记录结尾的 UTF-8 字节块：(块, 块首行号)"""
+    stream, is_utf16 = open_log(source)
+    with stream:
+        if is_utf16:
+            # PowerShell 日志：解码、拼回折行后再编码成 UTF-8
+            batch = []
+            first = 1
+            for line_no, line in iter_lines(stream, unwrap=True):
+                if not batch:
+                    first = line_no
+                batch.append(line)
+                if len(batch) >= UTF16_BATCH_LINES and line.startswith('['):
+                    # 在记录开头处切分，保证 Element 块和它的子行在同一块里
+                    yield ('\n'.join(batch[:-1]) + '\n').encode('utf-8', 'replace'), first
+                    batch = batch[-1:]
+                    first = line_no
+            if batch:
+                yield ('\n'.join(batch) + '\n').encode('utf-8', 'replace'), first
+            return
+
+        raw = stream.buffer
+        tail = b''
+        line_no = 1
+        while True:
+            chunk = raw.read(CHUNK_BYTES)
+            if not chunk:
+                break
+            chunk = tail + chunk
+            # 在最后一个以 '[' 开头的行之前切分（Element 的子行都是缩进的）
+            cut = chunk.rfind(b'\n[') + 1
+            if cut == 0:
+                cut = chunk.rfind(b'\n') + 1
+            tail = chunk[cut:]
+            yield chunk[:cut], line_no
+            line_no += chunk.count(b'\n', 0, cut)
+        if tail:
+            yield tail, line_no
+
+
+class LogSequence:
+    """一份日志里的记录序列：tag 编号 + 记录原文哈希"""
+
+    def __init__(self, source, tags):
+        self.source = source
+        self.keys = array('i')
+        self.hashes = array('q')
+        for chunk, _ in _byte_chunks(source):
+            for m in _RECORD_RE.finditer(chunk):
+                element = m.group('element')
+                tag_key = (b'E', element) if element is not None else (b'Y', m.group('update_y'))
+                key = tags.get(tag_key)
+                if key is None:
+                    key = tags[tag_key] = len(tags)
+                self.keys.append(key)
+                self.hashes.append(hash(m.group(0)))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def values(self, wanted):
+        """第二遍：只解析 wanted（升序下标）这些记录，返回 {下标: (行号, 数值元组)}"""
+        result = {}
+        if not len(wanted):
+            return result
+        wanted = iter(wanted)
+        target = next(wanted)
+        index = 0
+        for chunk, first_line in _byte_chunks(self.source):
+            counted_to, line_no = 0, first_line
+            for m in _RECORD_RE.finditer(chunk):
+                if index == target:
+                    line_no += chunk.count(b'\n', counted_to, m.start())
+                    counted_to = m.start()
+                    result[index] = (line_no, _record_values(m))
+                    target = next(wanted, None)
+                    if target is None:
+                        return result
+                index += 1
+        return result
+
+
+def _parse(regex, text, count):
+    m = regex.search(text) if text else None
+    return tuple(float(v) for v in m.groups()) if m else (float('nan'),) * count
+
+
+def _record_values(m):
+    if m.group('element') is not None:
+        return (_parse(_EDGE_RE, m.group('margin'), 4) + _parse(_EDGE_RE, m.group('padding'), 4)
+                + _parse(_CONTENT_RE, m.group('content'), 4))
+    values = m.group('values')
+    return sum((_parse(regex, values, 1) for regex in _UPDATE_Y_RES), ())
+
+
+def _name(tag_key):
+    kind, tag = tag_key
+    return kind.decode(), tag.decode('utf-8', 'replace')
+
+
+def diff_logs(old_source, new_source, tolerance=0.5):
+    """对比两份日志，返回汇总 dict（changed 按最大变化量降序）"""
+    tags = {}
+    old = LogSequence(old_source, tags)
+    new = LogSequence(new_source, tags)
+    old_keys = np.frombuffer(old.keys, dtype=np.int32)
+    new_keys = np.frombuffer(new.keys, dtype=np.int32)
+    old_hashes = np.frombuffer(old.hashes, dtype=np.int64)
+    new_hashes = np.frombuffer(new.hashes, dtype=np.int64)
+
+    # 先按原文哈希对齐（配上的记录完全相同），再在剩下的空隙里按 tag 对齐
+    same_a, same_b = align(old_hashes, new_hashes)
+    pair_a = []
+    pair_b = []
+    removed = []
+    added = []
+    for a0, a1, b0, b1 in gap_regions(same_a, same_b, len(old), len(new)):
+        ia, ib = align(old_keys[a0:a1], new_keys[b0:b1])
+        pair_a.append(ia + a0)
+        pair_b.append(ib + b0)
+        removed.append(np.setdiff1d(np.arange(a0, a1), ia + a0, assume_unique=True))
+        added.append(np.setdiff1d(np.arange(b0, b1), ib + b0, assume_unique=True))
+    pair_a = np.concatenate(pair_a).astype(np.intp) if pair_a else np.empty(0, dtype=np.intp)
+    pair_b = np.concatenate(pair_b).astype(np.intp) if pair_b else np.empty(0, dtype=np.intp)
+    removed = np.concatenate(removed).astype(np.intp) if removed else np.empty(0, dtype=np.intp)
+    added = np.concatenate(added).astype(np.intp) if added else np.empty(0, dtype=np.intp)
+
+    # 第二遍只解析需要的记录
+    old_values = old.values(np.union1d(pair_a, removed))
+    new_values = new.values(np.union1d(pair_b, added))
+    names = {key: tag_key for tag_key, key in tags.items()}
+
+    changed = []
+    unparsed = []
+    within = 0
+    for i, j in zip(pair_a.tolist(), pair_b.tolist()):
+        old_line, before = old_values[i]
+        new_line, after = new_values[j]
+        delta = np.subtract(after, before)
+        # 只有一边是 NaN 算作变化；两边都是 NaN 时这个字段没解析出来，原文又不同，
+        # 变化可能就藏在这里，不能算作容差内
+        both_nan = np.isnan(before) & np.isnan(after)
+        moved = np.where(np.isnan(delta), np.isnan(before) != np.isnan(after), np.abs(delta) > tolerance)
+        kind, tag = _name(names[int(old_keys[i])])
+        fields = ELEMENT_FIELDS if kind == 'E' else UPDATE_Y_FIELDS
+        if both_nan.any():
+            unparsed.append({
+                'kind': kind, 'tag': tag, 'old_line': old_line, 'new_line': new_line,
+                'fields': [fields[k] for k in np.flatnonzero(both_nan)],
+            })
+        if not moved.any():
+            if not both_nan.any():
+                within += 1
+            continue
+        changed.append({
+            'kind': kind, 'tag': tag, 'old_line': old_line, 'new_line': new_line,
+            'max_delta': float(np.nanmax(np.abs(delta))) if not np.isnan(delta).all() else float('inf'),
+            'fields': [(fields[k], before[k], after[k]) for k in np.flatnonzero(moved)],
+        })
+    changed.sort(key=lambda c: -c['max_delta'])
+
+    def one_sided(indices, keys, values):
+        return [dict(zip(('kind', 'tag'), _name(names[int(keys[i])])), line=values[i][0])
+                for i in indices.tolist()]
+
+    return {
+        'old_records': len(old), 'new_records': len(new),
+        'identical': len(same_a), 'within_tolerance': within,
+        'changed': changed,
+        'unparsed': unparsed,
+        'removed': one_sided(removed, old_keys, old_values),
+        'added': one_sided(added, new_keys, new_values),
+    }
+
+
+def _value(value):
+    return '-' if value != value else f"{value:.2f}"
+
+
+def _label(kind, tag):
+    return f"[LAYOUT] {tag}" if kind == 'E' else f"[UPDATE Y] {tag}"
+
+
+def print_log_diff(result, tolerance=0.5, top=30):
+    print("=" * 100)
+    print("ZBrowser 布局日志对比（旧构建 -> 新构建）")
+    print("=" * 100)
+    print(f"记录: 旧 {result['old_records']}, 新 {result['new_records']}; 完全相同 {result['identical']}, "
+          f"容差内 {result['within_tolerance']}, 超出容差 {len(result['changed'])}, "
+          f"消失 {len(result['removed'])}, 新增 {len(result['added'])}, 数值未解析 {len(result['unparsed'])}")
+
+    if result['changed']:
+        print(f"\n几何变化超过 {tolerance}px 的盒子（按最大变化量排序）:")
+        for change in result['changed'][:top]:
+            print(f"  {_label(change['kind'], change['tag']):<28} 旧 line {change['old_line']:>8}  "
+                  f"新 line {change['new_line']:>8}  max |Δ| {change['max_delta']:.2f}")
+            for name, before, after in change['fields']:
+                delta = '' if before != before or after != after else f"  ({after - before:+.2f})"
+                print(f"      {name:<16} {_value(before):>10} -> {_value(after):>10}{delta}")
+        if len(result['changed']) > top:
+            print(f"  ... 还有 {len(result['changed']) - top} 个")
+
+    if result['unparsed']:
+        print("\n原文不同、但有字段两边都没解析出数值的盒子（无法判断是否变化）:")
+        for record in result['unparsed'][:top]:
+            print(f"  {_label(record['kind'], record['tag']):<28} 旧 line {record['old_line']:>8}  "
+                  f"新 line {record['new_line']:>8}  {', '.join(record['fields'])}")
+        if len(result['unparsed']) > top:
+            print(f"  ... 还有 {len(result['unparsed']) - top} 个")
+
+    for title, records in (("只在旧日志中出现", result['removed']), ("只在新日志中出现", result['added'])):
+        if records:
+            print(f"\n{title}:")
+            for record in records[:top]:
+                print(f"  {_label(record['kind'], record['tag']):<28} line {record['line']}")
+            if len(records) > top:
+                print(f"  ... 还有 {len(records) - top} 个")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="对比两次构建的 ZBrowser 布局日志，报告几何变化的盒子")
+    arg_parser.add_argument('old_log', help="旧构建的输出")
+    arg_parser.add_argument('new_log', help="新构建的输出")
+    arg_parser.add_argument('--tolerance', type=float, default=0.5, help="误差容差（px）")
+    arg_parser.add_argument('--top', type=int, default=30, help="每类最多列出的盒子数")
+    args = arg_parser.parse_args()
+
+    try:
+        result = diff_logs(args.old_log, args.new_log, args.tolerance)
+    except OSError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print_log_diff(result, args.tolerance, args.top)
+    if result['changed'] or result['unparsed'] or result['removed'] or result['added']:
+        sys.exit(1)
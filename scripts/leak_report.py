@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+汇总 GeneralPurposeAllocator 的内存泄漏报告（leak_details.log / leak_stack.log 或 ZBrowser 的 stderr）
+
+每条报告形如：
+  [gpa] (err): memory address 0x7fa006280d40 leaked:
+  /.../src/layout/inline.zig:47:52: 0x12fb0c2 in layoutInline (inline.zig)
+      const new_ifc = try layout_box.allocator.create(...);    <- 源码行和 ^ 行被跳过
+  /.../src/layout/engine.zig:217:36: 0x12fd627 in layout (engine.zig)
+  ...（递归的 engine.zig:217 layout 可以有很多层）
+
+逐行流式解析，每条报告的栈在读入时就折叠递归：栈尾出现连续重复的帧序列（周期 1..MAX_PERIOD）
+时只保留一份，所以无论递归多深，单条报告占用的内存都是有界的。折叠后的栈就是这条泄漏的签名，
+分配点是最内层的非标准库帧。按 (分配点, 签名) 计数，内存只与不同签名的数量有关，与报告数量无关。
+
+输出按分配点排名的汇总，可选输出 flamegraph.pl / speedscope 能读的 folded stack 文件
+（每行 "最外层;...;最内层 次数"）和用于跨运行跟踪的 JSON。
+
+grep / Select-String 截出来的日志里，'--' 分隔的片段可能只有帧没有报告头，
+这样的片段不计为泄漏，单独统计；只有报告头没有帧的泄漏记在 "(无栈帧)" 名下。
+
+用法: python3 leak_report.py leak_details.log [more.log ...] [--folded leaks.folded] [--json leaks.json]
+"""
+
+import argparse
+import json
+import re
+import sys
+from collections import Counter
+
+from zbrowser_log import open_log
+
+MAX_PERIOD = 8
+NO_FRAMES = '(无栈帧)'
+
+_HEADER_RE = re.compile(r'(?:\[gpa\] \(err\)|error\(gpa\)): memory address (0x[0-9a-fA-F]+) leaked:')
+_FRAME_RE = re.compile(r'(.+?):(\d+|\?):(\d+|\?): 0x[0-9a-fA-F]+ in (.+?) \([^()]*\)\s*$')
+_STD_MARKERS = ('/lib/std/', '\\lib\\std\\', '/lib/zig/std/')
+
+
+def frame_label(path, line, func):
+    """'/home/.../src/layout/engine.zig', '217', 'layout' -> 'layout (layout/engine.zig:217)'"""
+    normalized = path.replace('\\', '/')
+    if any(marker in path for marker in _STD_MARKERS):
+        short = 'std/' + normalized.rsplit('/std/', 1)[-1]
+    elif '/src/' in normalized:
+        short = normalized.rsplit('/src/', 1)[-1]
+    else:
+        short = normalized.rsplit('/', 1)[-1]
+    return f"{func} ({short}:{line})"
+
+
+def is_std_frame(label):
+    return '(std/' in label or label.startswith('???')
+
+
+def push_frame(frames, frame):
+    """把帧追加到栈尾，栈尾出现周期 ≤ MAX_PERIOD 的重复时折叠掉，返回折叠掉的帧数"""
+    frames.append(frame)
+    removed = 0
+    folded = True
+    while folded:
+        folded = False
+        n = len(frames)
+        for period in range(1, min(MAX_PERIOD, n // 2) + 1):
+            # 先比较最后一帧，绝大多数周期在这里就被排除，不用切片
+            if frames[n - 1] == frames[n - 1 - period] and frames[-period:] == frames[-2 * period:-period]:
+                del frames[-period:]
+                removed += period
+                folded = True
+                break
+    return removed
+
+
+class LeakAggregator:
+    """按签名计数的泄漏汇总（流式，内存与不同签名的数量成正比）"""
+
+    def __init__(self):
+        self.stacks = Counter()
+        self.max_folded = {}
+        self.leaks = 0
+        self.fragments = 0
+        self._frames = None
+        self._folded = 0
+        self._fragment = False
+        # 原始帧行 -> 帧标签；同一个调用点的帧行逐字相同，只有第一次需要跑正则
+        self._labels = {}
+
+    def _finish(self):
+        if self._frames is not None:
+            signature = tuple(self._frames) if self._frames else (NO_FRAMES,)
+            self.stacks[signature] += 1
+            self.max_folded[signature] = max(self.max_folded.get(signature, 0), self._folded)
+            self.leaks += 1
+        elif self._fragment:
+            self.fragments += 1
+        self._frames = None
+        self._folded = 0
+        self._fragment = False
+
+    def feed(self, line):
+        """处理一行（不含行尾换行）"""
+        if not line or line[0] in ' \t':
+            # 源码行、^ 行和 ZBrowser 的缩进调试输出
+            return
+        label = self._labels.get(line)
+        if label is None:
+            if 'leaked:' in line and _HEADER_RE.search(line):
+                self._finish()
+                self._frames = []
+                return
+            m = _FRAME_RE.match(line)
+            if m is None:
+                # '--' 分隔符或其它输出：当前报告结束
+                self._finish()
+                return
+            label = self._labels[line] = frame_label(m.group(1), m.group(2), m.group(4))
+        if self._frames is None:
+            self._fragment = True
+            return
+        self._folded += push_frame(self._frames, label)
+
+    def feed_log(self, source):
+        stream, _ = open_log(source)
+        with stream:
+            for line in stream:
+                # 缩进行（源码行、^ 行）和空行占了大部分，在这里就跳过
+                if line[0] not in ' \t\n':
+                    self.feed(line.rstrip('\r\n'))
+        self._finish()
+
+    @staticmethod
+    def site_of(signature):
+        """分配点：最内层的非标准库帧"""
+        for frame in signature:
+            if not is_std_frame(frame):
+                return frame
+        return signature[0]
+
+    def sites(self):
+        """[(分配点, 次数, 签名数)]，按次数降序"""
+        counts = Counter()
+        variants = Counter()
+        for signature, count in self.stacks.items():
+            site = self.site_of(signature)
+            counts[site] += count
+            variants[site] += 1
+        return [(site, count, variants[site]) for site, count in counts.most_common()]
+
+    def write_folded(self, f):
+        for signature, count in self.stacks.most_common():
+            f.write(';'.join(reversed(signature)) + f' {count}\n')
+
+    def to_json(self):
+        return {
+            'leaks': self.leaks,
+            'fragments': self.fragments,
+            'sites': [{'site': site, 'count': count, 'signatures': n} for site, count, n in self.sites()],
+            'stacks': [{'frames': list(signature), 'count': count, 'max_folded': self.max_folded[signature]}
+                       for signature, count in self.stacks.most_common()],
+        }
+
+
+def print_leak_report(aggregator, top=20, stacks_per_site=3):
+    print("=" * 100)
+    print("GPA 内存泄漏汇总（按分配点）")
+    print("=" * 100)
+    print(f"泄漏: {aggregator.leaks}, 分配点: {len(aggregator.sites())}, 不同的栈: {len(aggregator.stacks)}")
+    if aggregator.fragments:
+        print(f"没有报告头的栈片段（未计入）: {aggregator.fragments}")
+    if not aggregator.leaks:
+        return
+
+    by_site = {}
+    for signature, count in aggregator.stacks.most_common():
+        by_site.setdefault(aggregator.site_of(signature), []).append((signature, count))
+
+    for rank, (site, count, _) in enumerate(aggregator.sites()[:top], 1):
+        print(f"\n{rank:>3}. {site}  {count} 次 ({count / aggregator.leaks:.1%})")
+        for signature, stack_count in by_site[site][:stacks_per_site]:
+            folded = aggregator.max_folded[signature]
+            note = f"，折叠递归帧最多 {folded} 个" if folded else ''
+            print(f"     {stack_count} 次{note}:")
+            for frame in signature:
+                print(f"       {frame}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="汇总 GPA 内存泄漏报告，按分配点排名")
+    arg_parser.add_argument('logs', nargs='*', help="泄漏日志（默认读标准输入）")
+    arg_parser.add_argument('--folded', default=None, help="写出 folded stack 文件（flamegraph.pl / speedscope）")
+    arg_parser.add_argument('--json', default=None, help="把汇总写入 JSON（跨运行跟踪用）")
+    arg_parser.add_argument('--top', type=int, default=20, help="显示前 N 个分配点")
+    arg_parser.add_argument('--stacks', type=int, default=3, help="每个分配点显示的栈数量")
+    args = arg_parser.parse_args()
+
+    aggregator = LeakAggregator()
+    try:
+        for log in args.logs or [sys.stdin.buffer]:
+            aggregator.feed_log(log)
+    except OSError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print_leak_report(aggregator, args.top, args.stacks)
+    if args.folded:
+        with open(args.folded, 'w', encoding='utf-8') as f:
+            aggregator.write_folded(f)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(aggregator.to_json(), f, ensure_ascii=False, indent=2)
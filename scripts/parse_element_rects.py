@@ -3,39 +3,19 @@
 解析 element-rects.json 文件，显示元素的矩形区域信息
 """
 
-import json
 import sys
 
-def parse_rect_file(json_file_path):
-    """解析 element-rects.json 文件"""
-    with open(json_file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    return data
-
-def find_element_rects(data, tag_name=None, class_name=None, text_content_substring=None):
-    """查找匹配的元素"""
-    found_elements = []
-    for item in data:
-        element_info = item['element']
-        rect = item['rect']
-
-        match = True
-        if tag_name and element_info['tagName'].lower() != tag_name.lower():
-            match = False
-        if class_name and class_name not in element_info['className'].split():
-            match = False
-        if text_content_substring and text_content_substring not in element_info['textContent']:
-            match = False
+from element_store import ElementStore
+from query_server import run_cli
 
-        if match:
-            found_elements.append({'element_info': element_info, 'rect': rect})
-    return found_elements
+def parse_rect_file(json_file_path):
+    """解析 element-rects.json 文件，返回建好索引的 ElementStore"""
+    return ElementStore.load(json_file_path)
 
 def print_element_rect(element_data, title):
     """打印元素的矩形区域信息"""
     print(f"\n=== {title} ===")
-    element_info = element_data['element_info']
+    element_info = element_data['element']
     rect = element_data['rect']
 
     print(f"  Tag: {element_info['tagName']}")
@@ -72,40 +52,59 @@ def compare_with_zbrowser(rect_data, zbrowser_output):
     # 这里可以添加比较逻辑
     pass
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python3 parse_element_rects.py <json_file_path> [tag_name] [class_name] [text_content]")
+def main(argv=None, load=parse_rect_file):
+    """命令行入口；load 为加载导出的函数，常驻查询服务（query_server.py）传入带缓存的版本"""
+    # spatial_index 依赖 numpy，在入口里才导入：转发给查询服务的瘦客户端不需要它
+    from spatial_index import pop_region_args, region_positions
+
+    if argv is None:
+        argv = sys.argv[1:]
+    try:
+        argv, region = pop_region_args(argv)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if len(argv) < 1:
+        print("Usage: python3 parse_element_rects.py <json_file_path> [tag_name] [class_name] [text_content] "
+              "[--at X,Y | --region X,Y,W,H]")
         print("\nExamples:")
         print("  python3 parse_element_rects.py element-rects.json")
         print("  python3 parse_element_rects.py element-rects.json h1")
         print("  python3 parse_element_rects.py element-rects.json div block-test")
         print("  python3 parse_element_rects.py element-rects.json h1 '' 'ZBrowser功能测试页面'")
+        print("  python3 parse_element_rects.py element-rects.json --at 100,200")
+        print("  python3 parse_element_rects.py element-rects.json div --region 0,0,980,600")
         sys.exit(1)
 
-    json_file_path = sys.argv[1]
-    tag_name = sys.argv[2] if len(sys.argv) > 2 else None
-    class_name = sys.argv[3] if len(sys.argv) > 3 else None
-    text_content = sys.argv[4] if len(sys.argv) > 4 else None
-
-    data = parse_rect_file(json_file_path)
-    print(f"Total elements: {len(data)}")
-
-    if tag_name or class_name or text_content:
-        # 查找特定元素
-        found_elements = find_element_rects(data, tag_name, class_name, text_content)
+    json_file_path = argv[0]
+    tag_name = argv[1] if len(argv) > 1 else None
+    class_name = argv[2] if len(argv) > 2 else None
+    text_content = argv[3] if len(argv) > 3 else None
+
+    store = load(json_file_path)
+    print(f"Total elements: {len(store)}")
+
+    if tag_name or class_name or text_content or region is not None:
+        # 查找特定元素（指定了区域时只保留区域内的元素）
+        positions = store.find_positions(tag_name, class_name, text_content_substring=text_content)
+        if region is not None:
+            in_region = set(region_positions(store.items, region, store.spatial_index()))
+            positions = [pos for pos in positions if pos in in_region]
+        found_elements = [store.items[pos] for pos in positions]
         if found_elements:
             for i, element_data in enumerate(found_elements):
                 title = f"Element {i+1}"
-                if element_data['element_info']['className']:
-                    title += f" ({element_data['element_info']['className']})"
+                if element_data['element']['className']:
+                    title += f" ({element_data['element']['className']})"
                 print_element_rect(element_data, title)
         else:
             print(f"No elements found matching criteria.")
     else:
         # 显示所有元素（限制数量）
         print(f"\nShowing first 10 elements (use filters to find specific elements):")
-        for i, item in enumerate(data[:10]):
-            element_info = item['element_info']
+        for i, item in enumerate(store.items[:10]):
+            element_info = item['element']
             rect = item['rect']
             title = f"{element_info['tagName']}"
             if element_info['className']:
@@ -116,6 +115,5 @@ if __name__ == "__main__":
             print(f"   Page: ({rect['x']:.1f}, {rect['y']:.1f}) size: {rect['width']:.1f}x{rect['height']:.1f}")
             print(f"   Visible: {element_info['isVisible']}")
 
-
-
-
+if __name__ == "__main__":
+    run_cli('parse_element_rects', main)
@@ -1,35 +1,36 @@
 #!/usr/bin/env python3
 """
 解析结构化的 Chrome 样式 JSON 文件
-用法: python3 parse_structured_styles.py computed-styles-structured.json
+用法: python3 parse_structured_styles.py computed-styles-structured.json [property ...]
 """
 
 import json
 import sys
 
-def find_element(elements, tag_name=None, class_name=None, id_name=None, parent_class=None):
-    """查找匹配的元素"""
-    results = []
-    for item in elements:
-        elem = item.get('element', {})
-        match = True
-        
-        if tag_name and elem.get('tagName') != tag_name:
-            match = False
-        if class_name and class_name not in elem.get('className', ''):
-            match = False
-        if id_name and elem.get('id') != id_name:
-            match = False
-        if parent_class and parent_class not in elem.get('parentClassName', ''):
-            match = False
-            
-        if match:
-            results.append(item)
-    
-    return results
+from element_store import ElementStore, match_element
+from query_server import run_cli
+from style_stream import iter_elements
+
+def load_style_store(json_file, properties=()):
+    """加载样式导出并建立索引（快照或流式 JSON），styles 只保留 properties 中的属性"""
+    return ElementStore.load(json_file, properties)
+
+def find_element(source, tag_name=None, class_name=None, id_name=None, parent_class=None,
+                 properties=()):
+    """查找匹配的元素
+
+    source 为 ElementStore 时走索引；为文件路径时单遍流式扫描，
+    只有命中的元素（以及 properties 中的样式）会留在内存里。
+    """
+    if isinstance(source, ElementStore):
+        return source.find(tag_name, class_name, id_name, parent_class)
+    return [
+        item for item in iter_elements(source, properties)
+        if match_element(item['element'], tag_name, class_name, id_name, parent_class)
+    ]
 
 def print_element_info(item):
-    """打印元素信息"""
+    """打印元素信息（keyStyles 以及加载时保留下来的 styles 属性）"""
     elem = item.get('element', {})
     styles = item.get('styles', {})
     key_styles = elem.get('keyStyles', {})
@@ -55,16 +56,27 @@ def print_element_info(item):
     print(f"  color: {key_styles.get('color', 'N/A')}")
     print(f"  font-size: {key_styles.get('fontSize', 'N/A')}")
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 parse_structured_styles.py <json_file>")
+    if styles:
+        print(f"\nStyles:")
+        for name, value in styles.items():
+            print(f"  {name}: {value}")
+
+def main(argv=None, load=load_style_store):
+    """命令行入口；load 为加载导出的函数，常驻查询服务（query_server.py）传入带缓存的版本"""
+    if argv is None:
+        argv = sys.argv[1:]
+    if len(argv) < 1:
+        print("Usage: python3 parse_structured_styles.py <json_file> [property ...]")
+        print("\nExamples:")
+        print("  python3 parse_structured_styles.py computed-styles-structured.json")
+        print("  python3 parse_structured_styles.py computed-styles-structured.json line-height font-family")
         sys.exit(1)
     
-    json_file = sys.argv[1]
+    json_file = argv[0]
+    properties = argv[1:]
     
     try:
-        with open(json_file, 'r') as f:
-            data = json.load(f)
+        data = load(json_file, properties)
         
         print(f"Total elements: {len(data)}")
         
@@ -104,7 +116,7 @@ def main():
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
+    run_cli('parse_structured_styles', main)
 
 
 
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+按 element-rects.json 自动做逐元素的像素验证
+
+tests/html/test_page_render_helpers.zig 里的 verifyElementPositionAndSize 需要手写矩形和颜色；
+这里改为从数据驱动：每个元素的期望颜色取自 computed-styles-structured.json 的
+background-color / color，在 ZBrowser 渲染结果中统计期望颜色的覆盖率。
+
+背景色、文字颜色和平均颜色通过积分图（summed-area table）批量计算，每个矩形的代价是 O(1)：
+- 每个颜色通道一张 uint32 积分图，给出矩形内的平均颜色
+- 每种期望颜色一张匹配掩码的积分图（只覆盖需要这种颜色的矩形的外接框），给出覆盖率
+
+例外是被遮挡的背景：后画的背景（子孙、后画的定位元素）盖住的部分不应算作祖先的，
+这些元素的可见像素不是一个矩形，积分图给不出。空间索引（spatial_index）先找出与后画的背景
+重叠的元素，只对它们在其外接框内按绘制顺序涂一张归属图（每个像素记录最后画上去的元素），
+再按像素统计。这部分的代价与外接框的面积成正比，不是 O(1)；页面根元素画了背景时
+外接框就是整页。绘制顺序近似为：普通流元素按文档先序，定位元素（及其子孙）整体排在它们之后。
+uint32 积分图在整页上可能溢出，但矩形求和是按 2^32 取模的加减，只要单个矩形内的和
+不超过 2^32 结果就是精确的（980x8000 整页 x 255 约 2e9，不会超过）。
+
+判定：背景色按 docs/TEST_VERIFICATION_IMPROVEMENTS.md 的阈值（大元素 50%，小元素 80%，按可见面积区分）；
+文字颜色只检查直接包含文字的元素（文字全在子元素里的不算），要求至少出现一个匹配像素。
+透明或半透明的颜色不检查。
+
+用法: python3 pixel_verify.py <output.png> <element-rects.json> [--styles computed-styles-structured.json]
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from dom_match import build_chrome_tree
+from dump_snapshot import dump_exists, open_dump
+from element_store import ElementStore
+from image_diff import (LARGE_MATCH_RATIO, SMALL_ELEMENT_AREA, SMALL_MATCH_RATIO, channel_distance, clip_rects,
+                        load_image, summed_area_table)
+from rect_diff import chrome_rect_array
+from spatial_index import SpatialIndex
+from style_diff import KIND_COLOR, normalize_value
+
+COLOR_PROPERTIES = ('background-color', 'color')
+DEFAULT_TOLERANCE = 10
+# 计算归属图覆盖率时每次处理的行数（限制临时数组的大小）
+BAND_ROWS = 512
+# 导出脚本把 textContent 截断到前 100 个字符
+TEXT_PREVIEW_LENGTH = 100
+
+_color_cache = {}
+
+
+def parse_css_color(value):
+    """'rgb(51, 51, 51)' -> (51, 51, 51)；透明、半透明或无法解析的值返回 None（结果按字符串缓存）
+
+    颜色按 style_diff.normalize_value 归一化，与样式对比的写法一致。
+    """
+    if value in _color_cache:
+        return _color_cache[value]
+    result = None
+    if value:
+        kind, key, _ = normalize_value(value)
+        if kind == KIND_COLOR and key[4] == 255:
+            result = key[1:4]
+    _color_cache[value] = result
+    return result
+
+
+def expected_colors(rect_items, style_items, prop):
+    """每个 Chrome 元素的期望颜色，返回 (N, 3) int16 数组，不检查的元素为 -1"""
+    by_index = {}
+    for item in style_items:
+        color = parse_css_color(item.get('styles', {}).get(prop, ''))
+        if color is not None:
+            by_index[item['element']['index']] = color
+    colors = np.full((len(rect_items), 3), -1, dtype=np.int16)
+    for pos, item in enumerate(rect_items):
+        color = by_index.get(item['element']['index'])
+        if color is not None:
+            colors[pos] = color
+    return colors
+
+
+def _rect_sums(table, x0, y0, x1, y1):
+    """积分图上的矩形求和（uint32 按 2^32 取模相减）"""
+    return (table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0]).astype(np.int64)
+
+
+def mean_colors(image, x0, y0, x1, y1):
+    """每个矩形内的平均颜色，返回 (N, 3) float 数组（空矩形为 nan）"""
+    area = (x1 - x0) * (y1 - y0)
+    means = np.full((len(area), 3), np.nan)
+    nonempty = area > 0
+    for ch in range(3):
+        table = summed_area_table(image[:, :, ch])
+        means[nonempty, ch] = _rect_sums(table, x0, y0, x1, y1)[nonempty] / area[nonempty]
+    return means
+
+
+def color_coverage(image, x0, y0, x1, y1, colors, tolerance=DEFAULT_TOLERANCE):
+    """每个矩形内期望颜色（逐通道容差内）的像素占比，不检查的矩形为 nan
+
+    每种颜色只在需要它的矩形的外接框内算一次掩码和积分图，然后批量查询所有矩形。
+    """
+    area = (x1 - x0) * (y1 - y0)
+    coverage = np.full(len(area), np.nan)
+    checked = (colors[:, 0] >= 0) & (area > 0)
+    if not checked.any():
+        return coverage
+
+    palette, inverse = np.unique(colors[checked], axis=0, return_inverse=True)
+    positions = np.flatnonzero(checked)
+    for k, color in enumerate(palette):
+        sel = positions[inverse.reshape(-1) == k]
+        bx0, by0 = x0[sel].min(), y0[sel].min()
+        bx1, by1 = x1[sel].max(), y1[sel].max()
+        crop = image[by0:by1, bx0:bx1]
+        distance = np.empty(crop.shape[:2], dtype=np.uint8)
+        channel_distance(crop, color.astype(np.uint8).reshape(1, 1, 3), distance, np.empty_like(distance))
+        table = summed_area_table(distance <= tolerance)
+        hits = _rect_sums(table, x0[sel] - bx0, y0[sel] - by0, x1[sel] - bx0, y1[sel] - by0)
+        coverage[sel] = hits / area[sel]
+    return coverage
+
+
+def paint_order(rect_items, nodes):
+    """近似的绘制顺序：普通流元素按文档先序，定位元素及其子孙排在后面（保持先序）"""
+    positioned = np.zeros(len(rect_items), dtype=bool)
+    for pos, node in enumerate(nodes):
+        own = rect_items[pos]['element'].get('position', 'static') not in ('static', '')
+        positioned[pos] = own or (node.parent is not None and positioned[node.parent.pos])
+    return np.argsort(positioned, kind='stable')
+
+
+def occluded_mask(x0, y0, x1, y1, colors, order):
+    """画背景的元素中，border box 与后画的背景重叠的元素"""
+    painted = (colors[:, 0] >= 0) & (x1 > x0) & (y1 > y0)
+    occluded = np.zeros(len(colors), dtype=bool)
+    if not painted.any():
+        return occluded
+    rects = np.column_stack((x0, y0, np.where(painted, x1 - x0, 0), np.where(painted, y1 - y0, 0)))
+    pairs = SpatialIndex(rects).overlapping_pairs()
+    rank = np.empty(len(order), dtype=np.intp)
+    rank[order] = np.arange(len(order))
+    a, b = pairs[:, 0], pairs[:, 1]
+    occluded[np.where(rank[a] < rank[b], a, b)] = True
+    return occluded
+
+
+def background_owners(bounds, x0, y0, x1, y1, colors, order):
+    """在 bounds = (bx0, by0, bx1, by1) 内按绘制顺序涂出每个像素的可见背景属于哪个元素
+
+    返回 bounds 大小的归属图，没有元素画背景的像素为 -1。
+    """
+    bx0, by0, bx1, by1 = bounds
+    owners = np.full((by1 - by0, bx1 - bx0), -1, dtype=np.int32)
+    painted = (colors[:, 0] >= 0) & (x1 > x0) & (y1 > y0) & (x0 < bx1) & (x1 > bx0) & (y0 < by1) & (y1 > by0)
+    for pos in order[painted[order]]:
+        owners[max(y0[pos], by0) - by0:min(y1[pos], by1) - by0, max(x0[pos], bx0) - bx0:min(x1[pos], bx1) - bx0] = pos
+    return owners
+
+
+def owned_coverage(image, owners, colors, tolerance=DEFAULT_TOLERANCE):
+    """每个元素可见像素中期望颜色的占比，返回 (可见像素数, 覆盖率)；没有可见像素的覆盖率为 nan"""
+    n = len(colors)
+    visible = np.zeros(n, dtype=np.int64)
+    hits = np.zeros(n, dtype=np.int64)
+    expected = colors.astype(np.int16)
+    for row in range(0, owners.shape[0], BAND_ROWS):
+        band = owners[row:row + BAND_ROWS].ravel()
+        mask = band >= 0
+        owner = band[mask]
+        pixels = image[row:row + BAND_ROWS].reshape(-1, 3)[mask].astype(np.int16)
+        matched = np.abs(pixels - expected[owner]).max(axis=1) <= tolerance
+        visible += np.bincount(owner, minlength=n)
+        hits += np.bincount(owner[matched], minlength=n)
+    coverage = np.full(n, np.nan)
+    shown = visible > 0
+    coverage[shown] = hits[shown] / visible[shown]
+    return visible, coverage
+
+
+def _has_direct_text(text, children):
+    """元素的 textContent 里是否有不属于任何子元素的文字
+
+    textContent 是子孙文字的拼接（首尾空白已去掉，最多 TEXT_PREVIEW_LENGTH 个字符），
+    按顺序把子元素的 textContent 从开头消掉，剩下非空白的部分就是直接文字。
+    子元素的文字被截断时后面的归属无法确定，按没有直接文字处理。
+    """
+    rest = text
+    for child in children:
+        rest = rest.lstrip()
+        if not child:
+            continue
+        if not rest:
+            return False
+        if rest.startswith(child):
+            if len(child) >= TEXT_PREVIEW_LENGTH:
+                return False
+            rest = rest[len(child):]
+        elif child.startswith(rest):
+            # 父元素的预览在这个子元素中间截断
+            return False
+        else:
+            return True
+    return bool(rest.strip())
+
+
+def direct_text_mask(rect_items, nodes):
+    """每个元素是否直接包含文字（文字全在子元素里的元素不检查文字颜色）"""
+    texts = [item['element'].get('textContent', '') for item in rect_items]
+    return np.array([_has_direct_text(texts[pos], [texts[child.pos] for child in node.children])
+                     for pos, node in enumerate(nodes)], dtype=bool)
+
+
+def verify_elements(image, rect_items, style_items, tolerance=DEFAULT_TOLERANCE):
+    """对所有元素做背景色 / 文字颜色覆盖率检查，返回按列组织的结果 dict"""
+    height, width = image.shape[:2]
+    x0, y0, x1, y1 = clip_rects(chrome_rect_array(rect_items), width, height)
+    area = (x1 - x0) * (y1 - y0)
+    nodes = build_chrome_tree(rect_items)
+
+    background = expected_colors(rect_items, style_items, 'background-color')
+    text = expected_colors(rect_items, style_items, 'color')
+    text[~direct_text_mask(rect_items, nodes)] = -1
+
+    # 没被遮挡的背景整个矩形都可见，用积分图；被遮挡的才涂归属图
+    order = paint_order(rect_items, nodes)
+    occluded = occluded_mask(x0, y0, x1, y1, background, order)
+    visible = area.copy()
+    bg_coverage = color_coverage(image, x0, y0, x1, y1, np.where(occluded[:, None], -1, background), tolerance)
+    if occluded.any():
+        bounds = (x0[occluded].min(), y0[occluded].min(), x1[occluded].max(), y1[occluded].max())
+        owners = background_owners(bounds, x0, y0, x1, y1, background, order)
+        owned_visible, owned = owned_coverage(image[bounds[1]:bounds[3], bounds[0]:bounds[2]], owners,
+                                              background, tolerance)
+        visible[occluded] = owned_visible[occluded]
+        bg_coverage[occluded] = owned[occluded]
+    text_coverage = color_coverage(image, x0, y0, x1, y1, text, tolerance)
+
+    required = np.where(visible >= SMALL_ELEMENT_AREA, LARGE_MATCH_RATIO, SMALL_MATCH_RATIO)
+    bg_failed = ~np.isnan(bg_coverage) & (bg_coverage < required)
+    text_failed = ~np.isnan(text_coverage) & (text_coverage == 0)
+    return {
+        'area': area,
+        'visible': visible,
+        'background': background,
+        'background_coverage': bg_coverage,
+        'text': text,
+        'text_coverage': text_coverage,
+        'mean_color': mean_colors(image, x0, y0, x1, y1),
+        'failed': bg_failed | text_failed,
+    }
+
+
+def _format_color(color):
+    return '-' if color[0] < 0 else f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}"
+
+
+def _format_ratio(value):
+    return '-' if np.isnan(value) else f"{value:.1%}"
+
+
+def print_verify_report(rect_items, result, tolerance, top=20, failures_only=False):
+    """打印验证结果，覆盖率最低的元素排在前面"""
+    nodes = build_chrome_tree(rect_items)
+    failed = result['failed']
+    checked = ~np.isnan(result['background_coverage']) | ~np.isnan(result['text_coverage'])
+    print("=" * 110)
+    print("ZBrowser 逐元素像素验证（期望颜色来自 Chrome computed styles）")
+    print("=" * 110)
+    print(f"元素: {len(rect_items)}, 检查: {int(checked.sum())}, 未通过: {int(failed.sum())}, 容差: {tolerance}")
+
+    rows = np.flatnonzero(failed if failures_only else checked)
+    # 未通过的在前，其次按背景色覆盖率从低到高
+    bg_coverage = np.nan_to_num(result['background_coverage'][rows], nan=1.0)
+    rows = rows[np.lexsort((bg_coverage, ~failed[rows]))]
+
+    print(f"\n{'index':>6}  {'element':<28} {'area':>8} {'visible':>8}  {'bg':>7} {'bg cov':>7}  {'text':>7} {'txt cov':>7}"
+          f"  {'mean':>7}  {'':4}  path")
+    for pos in rows[:top]:
+        elem = rect_items[int(pos)]['element']
+        label = elem['tagName'].lower()
+        if elem.get('className'):
+            label += '.' + '.'.join(elem['className'].split())
+        if elem.get('id'):
+            label += '#' + elem['id']
+        mean = result['mean_color'][pos]
+        mean_label = '-' if np.isnan(mean[0]) else _format_color(np.rint(mean).astype(int))
+        status = 'FAIL' if failed[pos] else 'OK'
+        print(f"{elem.get('index', '?'):>6}  {label[:28]:<28} {int(result['area'][pos]):>8} {int(result['visible'][pos]):>8}  "
+              f"{_format_color(result['background'][pos]):>7} {_format_ratio(result['background_coverage'][pos]):>7}  "
+              f"{_format_color(result['text'][pos]):>7} {_format_ratio(result['text_coverage'][pos]):>7}  "
+              f"{mean_label:>7}  {status:<4}  {nodes[int(pos)].path}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="按 Chrome 矩形和 computed styles 验证 ZBrowser 渲染结果的颜色")
+    arg_parser.add_argument('zbrowser_png', help="ZBrowser 的渲染结果（output.png）")
+    arg_parser.add_argument('json_file', help="Chrome 导出的 element-rects.json")
+    arg_parser.add_argument('--styles', default=None,
+                            help="computed-styles-structured.json（默认与 json_file 同目录）")
+    arg_parser.add_argument('--tolerance', type=int, default=DEFAULT_TOLERANCE,
+                            help=f"每个通道允许的颜色偏差（默认 {DEFAULT_TOLERANCE}）")
+    arg_parser.add_argument('--top', type=int, default=30, help="最多显示 N 个元素")
+    arg_parser.add_argument('--failures-only', action='store_true', help="只显示未通过的元素")
+    args = arg_parser.parse_args()
+
+    styles_file = args.styles or os.path.join(os.path.dirname(args.json_file), 'computed-styles-structured.json')
+    if not dump_exists(styles_file):
+        print(f"Error: 找不到样式导出 '{styles_file}'（用 --styles 指定）")
+        sys.exit(1)
+
+    try:
+        image = load_image(args.zbrowser_png)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    store = ElementStore.load(args.json_file)
+    style_items = open_dump(styles_file, COLOR_PROPERTIES)
+    result = verify_elements(image, store.items, style_items, args.tolerance)
+    print_verify_report(store.items, result, args.tolerance, args.top, args.failures_only)
+    sys.exit(1 if result['failed'].any() else 0)
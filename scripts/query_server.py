@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+常驻查询服务：把 Chrome 导出加载一次并常驻内存，查询脚本变成瘦客户端
+
+parse_element_rects.py / analyze_rects.py / parse_structured_styles.py 每次运行都要
+重新读取并解析 JSON、重建索引，而回答一个查询本身只需要几毫秒。服务启动后：
+  - 这些脚本把命令行参数转发给服务，服务在进程内运行同一个入口函数并返回输出
+  - 加载过的 ElementStore（连同它的索引）按 (路径, 属性列表) 缓存
+  - JSON 或它的 .zbsnap 快照的 mtime / 大小变化时才重新加载
+没有服务在运行时，脚本照常在本进程里加载和查询，输出完全一样。
+客户端路径（run_cli）只导入标准库里的轻量模块：asyncio、ElementStore 等服务端才用到的模块都在用到时才导入，
+脚本自己的 spatial_index（numpy）等依赖也放到入口函数里导入，转发一次查询不需要付出加载它们的代价。
+脚本入口在单线程的执行器里逐个运行，事件循环不会被阻塞，ping / stats 随时可以响应；
+缓存的快照在重新加载时关闭（mmap 和文件句柄）。
+
+协议是换行分隔的 JSON（NDJSON），每行一个请求、一行一个响应，一个连接上可以发多个请求：
+  {"op": "run", "script": "analyze_rects", "argv": [...], "cwd": "..."}
+      -> {"ok": true, "exit": 0, "output": "..."}
+  {"op": "ping"} / {"op": "stats"} / {"op": "shutdown"}
+  出错时 -> {"ok": false, "error": "..."}
+
+监听地址：支持 Unix socket 的平台默认用临时目录下的 socket 文件，
+否则（Windows）或设置了 ZBROWSER_QUERY_PORT 时用 127.0.0.1 上的 TCP 端口。
+设置 ZBROWSER_QUERY_SOCKET 可以改 socket 路径，ZBROWSER_NO_SERVER=1 让脚本不连接服务。
+
+用法:
+  python3 query_server.py            # 前台运行服务
+  python3 query_server.py --status   # 查看服务和已加载的文件
+  python3 query_server.py --stop     # 停止服务
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+import traceback
+
+DEFAULT_PORT = 47613
+CONNECT_TIMEOUT = 0.5
+
+# 可以转发给服务的脚本：模块名 -> 入口函数（签名为 entry(argv, load=...)）
+SCRIPTS = {
+    'analyze_rects': 'print_comparison',
+    'parse_element_rects': 'main',
+    'parse_structured_styles': 'main',
+}
+
+
+def server_address():
+    """服务地址：Unix socket 路径（str）或 (host, port)"""
+    port = os.environ.get('ZBROWSER_QUERY_PORT')
+    if port or not hasattr(socket, 'AF_UNIX'):
+        return ('127.0.0.1', int(port or DEFAULT_PORT))
+    default_path = os.path.join(tempfile.gettempdir(), f'zbrowser-query-{os.getuid()}.sock')
+    return os.environ.get('ZBROWSER_QUERY_SOCKET', default_path)
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class StoreCache:
+    """按 (绝对路径, 属性列表) 缓存的 ElementStore，文件变化时重新加载"""
+
+    def __init__(self):
+        self._entries = {}
+        self.hits = 0
+        self.loads = 0
+
+    def _stamp(self, path):
+        from dump_snapshot import snapshot_path_for
+
+        # open_dump 可能用 JSON 也可能用快照，两者任何一个变化都要重新加载
+        return (_file_stamp(path), _file_stamp(snapshot_path_for(path)))
+
+    def load(self, dump_file_path, properties=None):
+        """与 ElementStore.load 相同的签名，命中且文件没变时直接返回缓存的 store"""
+        from element_store import ElementStore
+
+        path = os.path.abspath(dump_file_path)
+        key = (path, None if properties is None else tuple(properties))
+        stamp = self._stamp(path)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            self.hits += 1
+            return entry[1]
+        if entry is not None:
+            self._close(entry[1])
+        store = ElementStore.load(path, properties)
+        self._entries[key] = (stamp, store)
+        self.loads += 1
+        return store
+
+    @staticmethod
+    def _close(store):
+        """文件变了，旧的 store 不会再被用到：快照要关掉 mmap 和文件句柄，JSON 加载的列表交给垃圾回收"""
+        close = getattr(store.items, 'close', None)
+        if close is not None:
+            close()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'loads': self.loads,
+            'files': sorted({path for path, _ in self._entries}),
+        }
+
+
+# ---- 服务端 ----
+
+class QueryServer:
+    def __init__(self):
+        self.cache = StoreCache()
+        self.started = time.time()
+        self.requests = 0
+        self._entries = {}
+        self._stopped = None
+        self._executor = None
+
+    def _entry(self, script):
+        if script not in SCRIPTS:
+            raise ValueError(f"未知脚本 '{script}'")
+        if script not in self._entries:
+            module = importlib.import_module(script)
+            self._entries[script] = getattr(module, SCRIPTS[script])
+        return self._entries[script]
+
+    def run_script(self, script, argv, cwd):
+        """在本进程里运行脚本入口，返回 (退出码, 输出)
+
+        chdir 和 stdout 重定向是进程级的，所以脚本都在同一个单线程执行器里逐个运行，不会相互干扰。
+        """
+        entry = self._entry(script)
+        output = io.StringIO()
+        old_cwd = os.getcwd()
+        exit_code = 0
+        try:
+            os.chdir(cwd)
+            with contextlib.redirect_stdout(output):
+                try:
+                    entry(argv, load=self.cache.load)
+                except SystemExit as e:
+                    if isinstance(e.code, int):
+                        exit_code = e.code
+                    elif e.code is not None:
+                        print(e.code)
+                        exit_code = 1
+                except Exception:
+                    traceback.print_exc(file=output)
+                    exit_code = 1
+        finally:
+            os.chdir(old_cwd)
+        return exit_code, output.getvalue()
+
+    async def handle(self, request):
+        import asyncio
+
+        op = request.get('op')
+        if op == 'run':
+            exit_code, output = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self.run_script, request['script'], request.get('argv', []),
+                request.get('cwd', os.getcwd()))
+            return {'ok': True, 'exit': exit_code, 'output': output}
+        if op == 'ping':
+            return {'ok': True, 'pid': os.getpid()}
+        if op == 'stats':
+            return {'ok': True, 'pid': os.getpid(), 'uptime': time.time() - self.started,
+                    'requests': self.requests, **self.cache.stats()}
+        if op == 'shutdown':
+            return {'ok': True}
+        raise ValueError(f"未知操作 '{op}'")
+
+    async def _serve_client(self, reader, writer):
+        shutdown = False
+        try:
+            while not shutdown:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.requests += 1
+                try:
+                    request = json.loads(line)
+                    response = await self.handle(request)
+                    shutdown = request.get('op') == 'shutdown'
+                except Exception as e:
+                    response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            # 回复发出、连接关闭之后再停止服务
+            if shutdown:
+                self._stopped.set()
+
+    async def serve(self, address):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+
+        self._stopped = asyncio.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='query')
+        if isinstance(address, str):
+            server = await asyncio.start_unix_server(self._serve_client, path=address)
+            os.chmod(address, 0o600)
+        else:
+            server = await asyncio.start_server(self._serve_client, *address)
+        async with server:
+            await self._stopped.wait()
+        self._executor.shutdown(wait=True)
+        if isinstance(address, str):
+            with contextlib.suppress(OSError):
+                os.unlink(address)
+
+
+# ---- 客户端 ----
+
+def _connect(address):
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(address)
+    except OSError:
+        sock.close()
+        raise
+    sock.settimeout(None)
+    return sock
+
+
+def request(message, address=None):
+    """发送一个请求并返回响应；没有服务在运行时返回 None"""
+    if address is None:
+        address = server_address()
+    try:
+        sock = _connect(address)
+    except OSError:
+        return None
+    with sock, sock.makefile('rwb') as f:
+        f.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+        f.flush()
+        line = f.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def run_cli(script, entry, argv=None):
+    """脚本入口：有服务时转发参数并原样输出结果，否则在本进程里运行 entry(argv)"""
+    if argv is None:
+        argv = sys.argv[1:]
+    response = None
+    if not os.environ.get('ZBROWSER_NO_SERVER'):
+        response = request({'op': 'run', 'script': script, 'argv': argv, 'cwd': os.getcwd()})
+    if response is None:
+        entry(argv)
+        return
+    if not response.get('ok'):
+        print(f"Error: 查询服务出错: {response.get('error')}")
+        sys.exit(1)
+    sys.stdout.write(response['output'])
+    sys.exit(response['exit'])
+
+
+def _address_label(address):
+    return address if isinstance(address, str) else f"{address[0]}:{address[1]}"
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="常驻内存的 Chrome 导出查询服务")
+    arg_parser.add_argument('--status', action='store_true', help="查看运行中的服务")
+    arg_parser.add_argument('--stop', action='store_true', help="停止运行中的服务")
+    args = arg_parser.parse_args()
+
+    address = server_address()
+    if args.status or args.stop:
+        response = request({'op': 'shutdown' if args.stop else 'stats'}, address)
+        if response is None:
+            print(f"Error: {_address_label(address)} 上没有运行中的服务")
+            sys.exit(1)
+        if args.stop:
+            print("服务已停止")
+        else:
+            print(f"服务 pid {response['pid']}，地址 {_address_label(address)}")
+            print(f"  运行时间: {response['uptime']:.0f}s, 请求: {response['requests']}, "
+                  f"加载: {response['loads']}, 缓存命中: {response['hits']}")
+            for path in response['files']:
+                print(f"  {path}")
+        sys.exit(0)
+
+    if request({'op': 'ping'}, address) is not None:
+        print(f"Error: {_address_label(address)} 上已经有服务在运行")
+        sys.exit(1)
+    if isinstance(address, str) and os.path.exists(address):
+        # 上一个服务异常退出留下的 socket 文件
+        os.unlink(address)
+
+    print(f"查询服务监听 {_address_label(address)}（Ctrl+C 或 --stop 停止）")
+    import asyncio
+
+    try:
+        asyncio.run(QueryServer().serve(address))
+    except KeyboardInterrupt:
+        if isinstance(address, str):
+            with contextlib.suppress(OSError):
+                os.unlink(address)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+整页 Chrome vs ZBrowser 矩形对比（NumPy 向量化）
+
+Chrome 的 getBoundingClientRect 是 border box，ZBrowser 输出的是 content box。
+这里用每个元素在 computed-styles-structured.json 中真实的 padding / border
+把 ZBrowser 的 content box 还原成 border box，再对所有匹配上的元素一次性计算
+x / y / width / height 的差值。
+"""
+
+import numpy as np
+
+from dom_match import build_chrome_tree, match_pairs
+from dump_snapshot import Snapshot
+
+# 还原 border box 需要的样式属性，顺序即 box_edge_array() 返回数组的列顺序
+BOX_PROPERTIES = (
+    'padding-top', 'padding-right', 'padding-bottom', 'padding-left',
+    'border-top-width', 'border-right-width', 'border-bottom-width', 'border-left-width',
+)
+RECT_COLUMNS = ('x', 'y', 'width', 'height')
+
+_px_cache = {}
+
+
+def parse_px(value):
+    """'15px' -> 15.0；非 px 的值（如 'auto'）视为 0（结果按字符串缓存）"""
+    result = _px_cache.get(value)
+    if result is None:
+        result = 0.0
+        if value.endswith('px'):
+            try:
+                result = float(value[:-2])
+            except ValueError:
+                pass
+        _px_cache[value] = result
+    return result
+
+
+def chrome_rect_array(items):
+    """Chrome 元素的 border box，返回 (N, 4) float64 数组：x, y, width, height"""
+    if isinstance(items, Snapshot):
+        # 快照里的矩形本来就是列存的，直接零拷贝取列
+        return np.stack([np.asarray(items.column(name), dtype=np.float64) for name in RECT_COLUMNS], axis=1)
+    rows = [(r['x'], r['y'], r['width'], r['height']) for r in (item['rect'] for item in items)]
+    return np.array(rows, dtype=np.float64).reshape(len(items), 4)
+
+
+def box_edge_array(rect_items, style_items):
+    """每个 Chrome 元素的 padding / border，返回 (N, 8) 数组，列顺序同 BOX_PROPERTIES
+
+    两份导出通过 element.index 对齐；样式导出里找不到的元素按 0 处理。
+    """
+    edges_by_index = {}
+    for item in style_items:
+        styles = item.get('styles', {})
+        edges_by_index[item['element']['index']] = [parse_px(styles.get(name, '0px')) for name in BOX_PROPERTIES]
+
+    zeros = [0.0] * len(BOX_PROPERTIES)
+    rows = [edges_by_index.get(item['element']['index'], zeros) for item in rect_items]
+    return np.array(rows, dtype=np.float64).reshape(len(rect_items), len(BOX_PROPERTIES))
+
+
+def zbrowser_content_array(boxes):
+    """ZBrowser 的 content box，返回 (M, 4) 数组"""
+    rows = [(c['x'], c['y'], c['width'], c['height']) for c in (box['content'] for box in boxes)]
+    return np.array(rows, dtype=np.float64).reshape(len(boxes), 4)
+
+
+def diff_rects(chrome_rects, edges, zb_content, chrome_idx, zbrowser_idx):
+    """一次性计算所有匹配元素的差值
+
+    返回 (K, 4) 的 Chrome - ZBrowser border box 差值（x, y, width, height），
+    以及 (K, 4) 的 ZBrowser border box。
+    """
+    e = edges[chrome_idx]
+    top, right, bottom, left = e[:, 0] + e[:, 4], e[:, 1] + e[:, 5], e[:, 2] + e[:, 6], e[:, 3] + e[:, 7]
+    c = zb_content[zbrowser_idx]
+    zb_border = np.column_stack((
+        c[:, 0] - left,
+        c[:, 1] - top,
+        c[:, 2] + left + right,
+        c[:, 3] + top + bottom,
+    ))
+    return chrome_rects[chrome_idx] - zb_border, zb_border
+
+
+def full_page_diff(rect_items, style_items, boxes):
+    """整页对比，返回按最大绝对误差降序排列的结果"""
+    chrome_rects = chrome_rect_array(rect_items)
+    edges = box_edge_array(rect_items, style_items)
+    zb_content = zbrowser_content_array(boxes)
+    nodes = build_chrome_tree(rect_items)
+    chrome_idx, zbrowser_idx = (np.asarray(idx, dtype=np.intp) for idx in match_pairs(rect_items, boxes, nodes))
+
+    deltas, zb_border = diff_rects(chrome_rects, edges, zb_content, chrome_idx, zbrowser_idx)
+    error = np.abs(deltas).max(axis=1) if len(deltas) else np.empty(0)
+    order = np.argsort(-error, kind='stable')
+    return {
+        'chrome_idx': chrome_idx[order],
+        'zbrowser_idx': zbrowser_idx[order],
+        'chrome_rects': chrome_rects[chrome_idx[order]],
+        'zbrowser_rects': zb_border[order],
+        'deltas': deltas[order],
+        'error': error[order],
+        'paths': [nodes[pos].path for pos in chrome_idx[order]],
+        'unmatched': len(boxes) - len(zbrowser_idx),
+    }
+
+
+def print_worst_offenders(result, rect_items, top=20, tolerance=0.5):
+    """打印误差最大的元素表"""
+    deltas = result['deltas']
+    error = result['error']
+    print("=" * 96)
+    print("Chrome vs ZBrowser 整页对比 (border box, Chrome - ZBrowser)")
+    print("=" * 96)
+    print(f"匹配元素: {len(error)}, ZBrowser 未匹配: {result['unmatched']}, "
+          f"超出容差 {tolerance}px: {int((error > tolerance).sum())}")
+    if len(error):
+        mean_abs = np.abs(deltas).mean(axis=0)
+        print(f"平均绝对误差: x={mean_abs[0]:.2f}, y={mean_abs[1]:.2f}, "
+              f"width={mean_abs[2]:.2f}, height={mean_abs[3]:.2f}")
+
+    print(f"\n{'#':>4}  {'index':>6}  {'element':<32} {'dx':>9} {'dy':>9} {'dw':>9} {'dh':>9}  path")
+    for rank in range(min(top, len(error))):
+        elem = rect_items[int(result['chrome_idx'][rank])]['element']
+        label = elem['tagName'].lower()
+        if elem.get('className'):
+            label += '.' + '.'.join(elem['className'].split())
+        if elem.get('id'):
+            label += '#' + elem['id']
+        dx, dy, dw, dh = deltas[rank]
+        print(f"{rank + 1:>4}  {elem.get('index', '?'):>6}  {label[:32]:<32} "
+              f"{dx:>9.2f} {dy:>9.2f} {dw:>9.2f} {dh:>9.2f}  {result['paths'][rank]}")
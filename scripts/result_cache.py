@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+一致性测试的内容哈希结果缓存
+
+两级缓存，都以输入文件内容的哈希为 key：
+  render: hash(ZBrowser 可执行文件, HTML)                  -> 解析出的 ZBrowser 盒子列表
+  result: render key + hash(Chrome 导出) + 对比参数          -> 对比结果
+HTML 没变的页面不需要重新渲染；Chrome 导出也没变时连对比都跳过。
+
+缓存条目是 cache_dir 下的 JSON 文件，命中时更新 mtime，超过容量上限时
+按 mtime 从旧到新淘汰（LRU）。文件哈希按 (path, size, mtime, inode) 记忆在
+digests.json 中，没改过的大文件不会被重复读取。
+
+用法: python3 result_cache.py <cache_dir> [--prune MB] [--clear]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from dump_snapshot import snapshot_path_for
+
+# 缓存格式版本：条目结构或对比算法变化时递增，旧条目自动失效
+CACHE_VERSION = 1
+DEFAULT_SIZE_MB = 512
+DIGESTS_FILE = 'digests.json'
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def _file_sha256(path):
+    """文件内容的 sha256（按块读取，不把整个文件读进内存）"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _write_json_atomic(path, data):
+    """先写临时文件再改名，并发的读者不会看到写了一半的条目"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _hash_parts(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class ResultCache:
+    """磁盘上的内容哈希缓存（大小有上限，LRU 淘汰）"""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_SIZE_MB << 20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.join(cache_dir, 'render'), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, 'result'), exist_ok=True)
+
+        self._digests_path = os.path.join(cache_dir, DIGESTS_FILE)
+        self._digests_dirty = False
+        try:
+            with open(self._digests_path, 'r', encoding='utf-8') as f:
+                self._digests = json.load(f)
+        except (OSError, ValueError):
+            self._digests = {}
+
+    # ---- 文件哈希 ----
+
+    def file_digest(self, path):
+        """文件内容的 sha256；文件的 stat 没变时直接用记忆的结果"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = [st.st_size, st.st_mtime_ns, st.st_ino]
+        memo = self._digests.get(path)
+        if memo is not None and memo[0] == stamp:
+            return memo[1]
+        digest = _file_sha256(path)
+        self._digests[path] = [stamp, digest]
+        self._digests_dirty = True
+        return digest
+
+    def dump_digest(self, dump_file_path):
+        """Chrome 导出的哈希：JSON 不存在时用它的快照"""
+        if dump_file_path is None:
+            return ''
+        if not os.path.exists(dump_file_path):
+            dump_file_path = snapshot_path_for(dump_file_path)
+        return self.file_digest(dump_file_path)
+
+    def render_key(self, binary, html):
+        return _hash_parts('render', CACHE_VERSION, self.file_digest(binary), self.file_digest(html))
+
+    def result_key(self, render_key, rects, styles, *params):
+        return _hash_parts('result', CACHE_VERSION, render_key,
+                           self.dump_digest(rects), self.dump_digest(styles), *params)
+
+    # ---- 条目读写 ----
+
+    def _entry_path(self, kind, key):
+        return os.path.join(self.cache_dir, kind, key[:2], key + '.json')
+
+    def get(self, kind, key):
+        """读取条目，命中时更新 mtime（LRU 时间戳）；未命中返回 None"""
+        path = self._entry_path(kind, key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, kind, key, value):
+        path = self._entry_path(kind, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_json_atomic(path, value)
+
+    # ---- 维护 ----
+
+    def _entries(self):
+        for kind in ('render', 'result'):
+            for bucket in os.scandir(os.path.join(self.cache_dir, kind)):
+                if not bucket.is_dir():
+                    continue
+                for entry in os.scandir(bucket.path):
+                    if entry.name.endswith('.json'):
+                        st = entry.stat()
+                        yield st.st_mtime_ns, st.st_size, entry.path
+
+    def prune(self, max_bytes=None):
+        """把缓存总大小压到上限以内（最久未使用的先删），返回删除的条目数"""
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        for kind in ('render', 'result'):
+            shutil.rmtree(os.path.join(self.cache_dir, kind), ignore_errors=True)
+            os.makedirs(os.path.join(self.cache_dir, kind))
+        self._digests = {}
+        self._digests_dirty = True
+
+    def close(self):
+        """保存文件哈希记忆并按容量上限淘汰"""
+        if self._digests_dirty:
+            # 只保留仍然存在的文件，记忆表不会无限增长
+            self._digests = {path: memo for path, memo in self._digests.items() if os.path.exists(path)}
+            _write_json_atomic(self._digests_path, self._digests)
+            self._digests_dirty = False
+        self.prune()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="查看和维护一致性测试的结果缓存")
+    arg_parser.add_argument('cache_dir', help="缓存目录")
+    arg_parser.add_argument('--prune', type=float, default=None, metavar='MB', help="把缓存压缩到 MB 以内")
+    arg_parser.add_argument('--clear', action='store_true', help="清空缓存")
+    args = arg_parser.parse_args()
+
+    if not os.path.isdir(args.cache_dir):
+        print(f"Error: 缓存目录 '{args.cache_dir}' 不存在")
+        sys.exit(1)
+
+    cache = ResultCache(args.cache_dir)
+    if args.clear:
+        cache.clear()
+    if args.prune is not None:
+        print(f"删除了 {cache.prune(int(args.prune * (1 << 20)))} 个条目")
+    cache.close()
+    print(f"缓存大小: {cache.size() / (1 << 20):.2f} MB")
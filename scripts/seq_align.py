@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+两个 key 序列（int64 数组）的对齐，layout_log_diff（两份日志的记录）和 dom_match（Chrome 元素与
+ZBrowser 盒子）共用
+
+  - 公共前缀 / 后缀直接配对
+  - 中间以两边都只出现一次的 key 为锚点，用最长递增子序列选出不交叉的一组（patience diff），
+    锚点之间的空隙递归处理
+  - 空隙里没有唯一 key 时改用编辑距离有上限的 Myers 差分，超过上限就不再配对
+返回的是配对的下标，没配上的是新增 / 消失；gap_regions() 列出配对之间的空隙。
+"""
+
+from bisect import bisect_left
+
+import numpy as np
+
+# 没有唯一锚点的空隙改用 Myers 差分，编辑距离超过它时放弃配对
+MAX_EDIT_DISTANCE = 512
+
+
+def _common_prefix(a, b):
+    n = min(len(a), len(b))
+    diff = np.flatnonzero(a[:n] != b[:n])
+    return int(diff[0]) if len(diff) else n
+
+
+def _unique_positions(keys):
+    """只出现一次的 key -> 它的下标（两个数组：key 升序，下标）"""
+    uniq, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    once = counts == 1
+    return uniq[once], first[once]
+
+
+def _longest_increasing(values):
+    """最长严格递增子序列的下标（O(k log k)）"""
+    tails = []
+    tail_idx = []
+    prev = [-1] * len(values)
+    for i, v in enumerate(values):
+        j = bisect_left(tails, v)
+        if j == len(tails):
+            tails.append(v)
+            tail_idx.append(i)
+        else:
+            tails[j] = v
+            tail_idx[j] = i
+        prev[i] = tail_idx[j - 1] if j else -1
+    result = []
+    i = tail_idx[-1] if tail_idx else -1
+    while i >= 0:
+        result.append(i)
+        i = prev[i]
+    return result[::-1]
+
+
+def _snake(a, b, x, y):
+    """从 (x, y) 开始两边相同的长度（按倍增的块用 numpy 比较）"""
+    length = 0
+    step = 64
+    while True:
+        block_a = a[x + length:x + length + step]
+        block_b = b[y + length:y + length + step]
+        n = min(len(block_a), len(block_b))
+        same = _common_prefix(block_a[:n], block_b[:n])
+        length += same
+        if same < n or n == 0:
+            return length
+        step *= 2
+
+
+def _myers(a, b, max_d=MAX_EDIT_DISTANCE):
+    """Myers O(ND) 差分，返回配对的 (ia, ib)；编辑距离超过 max_d 时返回 None"""
+    n, m = len(a), len(b)
+    v = {1: 0}
+    trace = []
+    for d in range(max_d + 1):
+        trace.append(v.copy())
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[k - 1] < v[k + 1]):
+                x = v[k + 1]
+            else:
+                x = v[k - 1] + 1
+            x += _snake(a, b, x, x - k)
+            v[k] = x
+            if x >= n and x - k >= m:
+                return _backtrack(trace, n, m)
+    return None
+
+
+def _backtrack(trace, x, y):
+    """从终点沿 trace 回溯，收集对角线段（相同的部分）"""
+    runs = []
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if d == 0:
+            prev_x = prev_y = 0
+        else:
+            prev_k = k + 1 if k == -d or (k != d and v[k - 1] < v[k + 1]) else k - 1
+            prev_x = v[prev_k]
+            prev_y = prev_x - prev_k
+        length = min(x - prev_x, y - prev_y) if d else x
+        if length > 0:
+            runs.append((x - length, y - length, length))
+        x, y = prev_x, prev_y
+    ia = [np.arange(xs, xs + length) for xs, _, length in reversed(runs)]
+    ib = [np.arange(ys, ys + length) for _, ys, length in reversed(runs)]
+    return (np.concatenate(ia) if ia else np.empty(0, dtype=np.intp),
+            np.concatenate(ib) if ib else np.empty(0, dtype=np.intp))
+
+
+def align(a, b, match_suffix=True):
+    """对齐两个 key 序列，返回配对的下标 (ia, ib)（都升序）；没配上的是新增 / 消失
+
+    公共前缀 / 后缀直接配对（match_suffix=False 时不配后缀：b 是 a 的一小段子序列时，
+    重复的 key 应该配到最靠前的位置，而不是被后缀拉到文档末尾）；中间以两边都只出现一次的 key 为锚点（取不交叉的最长一组），
+    锚点之间的空隙递归处理。空隙里没有唯一 key 时（重复结构很多的页面）改用编辑距离有上限的
+    Myers 差分，超过上限就不再配对。
+    """
+    pairs_a = []
+    pairs_b = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        a0, a1, b0, b1 = stack.pop()
+        prefix = _common_prefix(a[a0:a1], b[b0:b1])
+        pairs_a.append(np.arange(a0, a0 + prefix))
+        pairs_b.append(np.arange(b0, b0 + prefix))
+        a0 += prefix
+        b0 += prefix
+        suffix = _common_prefix(a[a0:a1][::-1], b[b0:b1][::-1]) if match_suffix else 0
+        pairs_a.append(np.arange(a1 - suffix, a1))
+        pairs_b.append(np.arange(b1 - suffix, b1))
+        a1 -= suffix
+        b1 -= suffix
+        if a0 == a1 or b0 == b1:
+            continue
+
+        keys_a, pos_a = _unique_positions(a[a0:a1])
+        keys_b, pos_b = _unique_positions(b[b0:b1])
+        _, ia, ib = np.intersect1d(keys_a, keys_b, assume_unique=True, return_indices=True)
+        if not len(ia):
+            matched = _myers(a[a0:a1], b[b0:b1])
+            if matched is not None:
+                pairs_a.append(matched[0] + a0)
+                pairs_b.append(matched[1] + b0)
+            continue
+        order = np.argsort(pos_a[ia], kind='stable')
+        anchor_a = pos_a[ia][order] + a0
+        anchor_b = pos_b[ib][order] + b0
+        keep = _longest_increasing(anchor_b.tolist())
+        anchor_a = anchor_a[keep]
+        anchor_b = anchor_b[keep]
+        pairs_a.append(anchor_a)
+        pairs_b.append(anchor_b)
+        starts_a = np.concatenate(([a0], anchor_a + 1))
+        starts_b = np.concatenate(([b0], anchor_b + 1))
+        ends_a = np.concatenate((anchor_a, [a1]))
+        ends_b = np.concatenate((anchor_b, [b1]))
+        for gap in np.flatnonzero((ends_a > starts_a) & (ends_b > starts_b)):
+            stack.append((int(starts_a[gap]), int(ends_a[gap]), int(starts_b[gap]), int(ends_b[gap])))
+
+    ia = np.concatenate(pairs_a).astype(np.intp) if pairs_a else np.empty(0, dtype=np.intp)
+    ib = np.concatenate(pairs_b).astype(np.intp) if pairs_b else np.empty(0, dtype=np.intp)
+    order = np.argsort(ia, kind='stable')
+    return ia[order], ib[order]
+
+
+def gap_regions(ia, ib, len_a, len_b):
+    """配对之间的空隙：[(a0, a1, b0, b1)]"""
+    starts_a = np.concatenate(([0], ia + 1))
+    starts_b = np.concatenate(([0], ib + 1))
+    ends_a = np.concatenate((ia, [len_a]))
+    ends_b = np.concatenate((ib, [len_b]))
+    gaps = np.flatnonzero((ends_a > starts_a) | (ends_b > starts_b))
+    return [(int(starts_a[g]), int(ends_a[g]), int(starts_b[g]), int(ends_b[g])) for g in gaps]
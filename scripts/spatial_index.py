@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+元素矩形的空间索引（均匀网格）
+
+从 Chrome 导出（border box）或 ZBrowser 输出（content box）一次性建立，支持：
+  at(x, y)            -> 包含该点的所有元素
+  query(x, y, w, h)   -> 与该矩形相交的所有元素
+  overlapping_pairs() -> 所有相互重叠的元素对（可限定为同一父元素下的兄弟）
+
+网格的格子边长取矩形面积中位数的平方根（典型元素约占一个格子），若此时典型矩形覆盖的格子
+超过 TARGET_CELLS_PER_RECT 再放大；每个矩形登记到它覆盖的格子里（CSR 存储），
+覆盖格子太多的大矩形（html、body 这类）单独放在一个列表里逐个检查。
+查询只访问相关格子里的候选，代价与候选数量有关，与元素总数无关。
+矩形按半开区间 [x, x + width) x [y, y + height) 处理，面积为 0 的矩形不参与。
+
+用法: python3 spatial_index.py <element-rects.json> (--at X,Y | --region X,Y,W,H | --overlaps) [--zbrowser output.txt]
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from compare_rects import parse_zbrowser_boxes
+from dom_match import build_chrome_tree, match_boxes
+from element_store import ElementStore
+from rect_diff import chrome_rect_array, zbrowser_content_array
+
+# 覆盖格子数超过这个值的矩形放进大矩形列表
+MAX_CELLS_PER_RECT = 64
+# 自动选取格子大小时，覆盖格子数的中位数不超过这个值
+TARGET_CELLS_PER_RECT = 8
+MIN_CELL_SIZE = 8.0
+
+
+def default_cell_size(widths, heights):
+    """按矩形尺寸选格子边长
+
+    不能取 max(w, h) 的中位数：页面上大多是整行宽的块（879 x 20 这类），
+    那样格子和页面一样宽，网格退化成几条横带，每格几十个候选。
+    面积中位数的平方根让典型元素约占一个格子；细长矩形会跨多个格子，
+    所以再检查覆盖格子数的中位数，超过 TARGET_CELLS_PER_RECT 时逐步放大。
+    """
+    widths = np.asarray(widths, dtype=np.float64)
+    heights = np.asarray(heights, dtype=np.float64)
+    size = max(MIN_CELL_SIZE, float(np.sqrt(np.median(widths * heights))))
+    limit = max(float(widths.max()), float(heights.max()))
+    while size < limit and np.median(np.ceil(widths / size) * np.ceil(heights / size)) > TARGET_CELLS_PER_RECT:
+        size *= 1.5
+    return size
+
+
+class SpatialIndex:
+    """(N, 4) 的 x, y, width, height 矩形上的均匀网格索引，查询返回升序的矩形下标"""
+
+    def __init__(self, rects, cell_size=None):
+        rects = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+        self.x0 = rects[:, 0]
+        self.y0 = rects[:, 1]
+        self.x1 = rects[:, 0] + rects[:, 2]
+        self.y1 = rects[:, 1] + rects[:, 3]
+        valid = (rects[:, 2] > 0) & (rects[:, 3] > 0)
+
+        if not valid.any():
+            self.cell_size = cell_size or MIN_CELL_SIZE
+            self.origin = (0.0, 0.0)
+            self.cols = self.rows = 0
+            self.offsets = np.zeros(1, dtype=np.intp)
+            self.members = np.empty(0, dtype=np.intp)
+            self.big = np.empty(0, dtype=np.intp)
+            return
+
+        if cell_size is None:
+            cell_size = default_cell_size(rects[valid, 2], rects[valid, 3])
+        self.cell_size = cell_size
+        self.origin = (float(self.x0[valid].min()), float(self.y0[valid].min()))
+        self.cols = int((self.x1[valid].max() - self.origin[0]) // cell_size) + 1
+        self.rows = int((self.y1[valid].max() - self.origin[1]) // cell_size) + 1
+
+        ids = np.flatnonzero(valid)
+        cx0, cy0, cx1, cy1 = self._cell_range(self.x0[ids], self.y0[ids], self.x1[ids], self.y1[ids])
+        span_x = cx1 - cx0 + 1
+        span_y = cy1 - cy0 + 1
+        cells = span_x * span_y
+        big = cells > MAX_CELLS_PER_RECT
+        self.big = ids[big]
+
+        # 把每个小矩形展开成 (格子, 矩形) 对，按格子排序后存成 CSR
+        small = ~big
+        ids, cx0, cy0, span_x, cells = ids[small], cx0[small], cy0[small], span_x[small], cells[small]
+        owner = np.repeat(np.arange(len(ids)), cells)
+        k = np.arange(len(owner)) - np.repeat(np.cumsum(cells) - cells, cells)
+        cell = (cy0[owner] + k // span_x[owner]) * self.cols + cx0[owner] + k % span_x[owner]
+        order = np.argsort(cell, kind='stable')
+        self.members = ids[owner[order]]
+        self.offsets = np.zeros(self.cols * self.rows + 1, dtype=np.intp)
+        np.cumsum(np.bincount(cell, minlength=self.cols * self.rows), out=self.offsets[1:])
+
+    @classmethod
+    def from_chrome(cls, items, cell_size=None):
+        """Chrome 导出的 border box"""
+        return cls(chrome_rect_array(items), cell_size)
+
+    @classmethod
+    def from_boxes(cls, boxes, cell_size=None):
+        """ZBrowser 输出解析出的 content box（compare_rects.parse_zbrowser_boxes 的结果）"""
+        return cls(zbrowser_content_array(boxes), cell_size)
+
+    def __len__(self):
+        return len(self.x0)
+
+    def _cell_range(self, x0, y0, x1, y1):
+        """半开矩形覆盖的格子范围（闭区间，已裁剪到网格内）"""
+        ox, oy = self.origin
+        size = self.cell_size
+        cx0 = np.clip(np.floor((np.asarray(x0) - ox) / size), 0, self.cols - 1).astype(np.intp)
+        cy0 = np.clip(np.floor((np.asarray(y0) - oy) / size), 0, self.rows - 1).astype(np.intp)
+        cx1 = np.clip(np.ceil((np.asarray(x1) - ox) / size) - 1, 0, self.cols - 1).astype(np.intp)
+        cy1 = np.clip(np.ceil((np.asarray(y1) - oy) / size) - 1, 0, self.rows - 1).astype(np.intp)
+        return cx0, cy0, np.maximum(cx1, cx0), np.maximum(cy1, cy0)
+
+    def _candidates(self, x0, y0, x1, y1):
+        if self.cols == 0:
+            return self.big
+        ox, oy = self.origin
+        if x1 <= ox or y1 <= oy or x0 >= ox + self.cols * self.cell_size or y0 >= oy + self.rows * self.cell_size:
+            return self.big
+        cx0, cy0, cx1, cy1 = (int(v) for v in self._cell_range(x0, y0, x1, y1))
+        # 同一行的格子在 CSR 里是连续的，每行只需要一个切片
+        parts = [self.members[self.offsets[cy * self.cols + cx0]:self.offsets[cy * self.cols + cx1 + 1]]
+                 for cy in range(cy0, cy1 + 1)]
+        parts.append(self.big)
+        return np.unique(np.concatenate(parts))
+
+    def at(self, x, y):
+        """包含点 (x, y) 的矩形"""
+        ids = self._candidates(x, y, np.nextafter(x, np.inf), np.nextafter(y, np.inf))
+        hit = (self.x0[ids] <= x) & (x < self.x1[ids]) & (self.y0[ids] <= y) & (y < self.y1[ids])
+        return np.sort(ids[hit])
+
+    def query(self, x, y, width, height):
+        """与矩形 [x, x + width) x [y, y + height) 相交的矩形；宽高为 0 时等同于点查询"""
+        if width <= 0 or height <= 0:
+            return self.at(x, y)
+        x1, y1 = x + width, y + height
+        ids = self._candidates(x, y, x1, y1)
+        hit = (self.x0[ids] < x1) & (x < self.x1[ids]) & (self.y0[ids] < y1) & (y < self.y1[ids])
+        return np.sort(ids[hit])
+
+    def overlapping_pairs(self, groups=None):
+        """所有面积为正地重叠的矩形对，返回 (K, 2) 数组（每行 a < b，按 a、b 排序）
+
+        groups: 与矩形对齐的分组标签，只返回同组的矩形对（例如父元素下标 -> 兄弟重叠）
+        """
+        firsts = []
+        seconds = []
+        counts = np.diff(self.offsets)
+        triangles = {}
+        for cell in np.flatnonzero(counts >= 2):
+            members = self.members[self.offsets[cell]:self.offsets[cell + 1]]
+            pairs = triangles.get(len(members))
+            if pairs is None:
+                pairs = triangles[len(members)] = np.triu_indices(len(members), 1)
+            firsts.append(members[pairs[0]])
+            seconds.append(members[pairs[1]])
+        for big in self.big:
+            others = self.query(self.x0[big], self.y0[big], self.x1[big] - self.x0[big], self.y1[big] - self.y0[big])
+            others = others[others != big]
+            firsts.append(np.full(len(others), big))
+            seconds.append(others)
+        if not firsts:
+            return np.empty((0, 2), dtype=np.intp)
+
+        a = np.concatenate(firsts).astype(np.intp)
+        b = np.concatenate(seconds).astype(np.intp)
+        a, b = np.minimum(a, b), np.maximum(a, b)
+        keep = (np.maximum(self.x0[a], self.x0[b]) < np.minimum(self.x1[a], self.x1[b])) & \
+               (np.maximum(self.y0[a], self.y0[b]) < np.minimum(self.y1[a], self.y1[b]))
+        if groups is not None:
+            groups = np.asarray(groups)
+            keep &= groups[a] == groups[b]
+        key = np.unique(a[keep] * len(self) + b[keep])
+        return np.column_stack((key // len(self), key % len(self)))
+
+
+def sibling_groups(nodes):
+    """每个元素的父元素下标（根为 -1），配合 overlapping_pairs() 找重叠的兄弟元素"""
+    return np.array([-1 if node.parent is None else node.parent.pos for node in nodes], dtype=np.intp)
+
+
+def parse_numbers(text, count, flag):
+    """'10,20' -> (10.0, 20.0)"""
+    try:
+        values = tuple(float(v) for v in text.split(','))
+    except ValueError:
+        values = ()
+    if len(values) != count:
+        raise ValueError(f"{flag} 需要 {count} 个逗号分隔的数字，得到 '{text}'")
+    return values
+
+
+def pop_region_args(argv):
+    """从命令行参数中取出 --at X,Y / --region X,Y,W,H，返回 (剩余参数, 区域)
+
+    区域是 (x, y, width, height)，--at 的宽高为 0；没有指定时为 None。
+    """
+    rest = []
+    region = None
+    args = iter(argv)
+    for arg in args:
+        if arg in ('--at', '--region'):
+            value = next(args, '')
+            if arg == '--at':
+                region = parse_numbers(value, 2, arg) + (0.0, 0.0)
+            else:
+                region = parse_numbers(value, 4, arg)
+        else:
+            rest.append(arg)
+    return rest, region
+
+
+def region_positions(items, region, index=None):
+    """Chrome 元素中落在区域内的下标（升序）；index 为 items 上已建好的索引（如 ElementStore.spatial_index()）"""
+    if index is None:
+        index = SpatialIndex.from_chrome(items)
+    return [int(pos) for pos in index.query(*region)]
+
+
+def _label(tag, class_name, id_name):
+    label = tag.lower()
+    if class_name:
+        label += '.' + '.'.join(class_name.split())
+    if id_name:
+        label += '#' + id_name
+    return label
+
+
+def print_hits(index, ids, labels, paths=None):
+    """每个命中的矩形打印一行：下标、元素、位置和尺寸、DOM 路径"""
+    for pos in ids:
+        x0, y0 = index.x0[pos], index.y0[pos]
+        w, h = index.x1[pos] - x0, index.y1[pos] - y0
+        path = paths[pos] if paths else ''
+        print(f"  [{pos:>5}] {labels[pos][:36]:<36} ({x0:8.2f}, {y0:8.2f}) {w:8.2f}x{h:<8.2f} {path}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="元素矩形的空间查询（点命中、区域相交、兄弟元素重叠）")
+    arg_parser.add_argument('json_file', help="Chrome 导出的 element-rects.json")
+    arg_parser.add_argument('--zbrowser', default=None, help="改为查询 ZBrowser 输出中的盒子（content box）")
+    group = arg_parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--at', help="X,Y：包含该点的元素")
+    group.add_argument('--region', help="X,Y,W,H：与该矩形相交的元素")
+    group.add_argument('--overlaps', action='store_true', help="列出相互重叠的兄弟元素")
+    args = arg_parser.parse_args()
+
+    try:
+        if args.at:
+            region = parse_numbers(args.at, 2, '--at') + (0.0, 0.0)
+        elif args.region:
+            region = parse_numbers(args.region, 4, '--region')
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    store = ElementStore.load(args.json_file)
+    nodes = build_chrome_tree(store.items)
+    if args.zbrowser:
+        boxes = parse_zbrowser_boxes(args.zbrowser)
+        index = SpatialIndex.from_boxes(boxes)
+        labels = [_label(box['tag'], box.get('class', ''), box.get('id', '')) for box in boxes]
+        matches = match_boxes(store.items, boxes, nodes)
+        paths = [nodes[pos].path if pos is not None else '' for pos in matches]
+        # 没配对上的盒子各自成组，不会被当成兄弟
+        groups = [-(j + 2) if pos is None else -1 if nodes[pos].parent is None else nodes[pos].parent.pos
+                  for j, pos in enumerate(matches)]
+    else:
+        index = store.spatial_index()
+        labels = [_label(e['tagName'], e.get('className', ''), e.get('id', ''))
+                  for e in (item['element'] for item in store.items)]
+        paths = [node.path for node in nodes]
+        groups = sibling_groups(nodes)
+
+    if args.overlaps:
+        pairs = index.overlapping_pairs(groups)
+        print(f"重叠的兄弟元素: {len(pairs)} 对")
+        for a, b in pairs:
+            print(f"\n  {paths[a]}  <->  {paths[b]}")
+            print_hits(index, (a, b), labels)
+    else:
+        hits = index.query(*region)
+        print(f"命中 {len(hits)} 个元素（共 {len(index)} 个）:")
+        print_hits(index, hits, labels, paths)
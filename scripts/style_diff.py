@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Chrome computed styles 与 ZBrowser 解析结果的批量对比
+
+ZBrowser 一侧的样式值来自调试输出（zbrowser_log）：
+  [LAYOUT] Element / Element Layout Info 块 -> margin-* / padding-* / border-*-width / width / height
+  [STYLE] h1 font-size parsed: 32.0px        -> font-size（ZBrowser 只记录大于 24px 的字体）
+记录通过 dom_match 与 Chrome 元素配对（没有 class / id 的记录只按 tag 对齐）。
+[STYLE] 只有 tag，只在 Chrome font-size 同样大于 24px 的同名元素里按文档顺序配对；
+没有这样的元素时列为无法定位，不计入对比（否则会配到第一个同名元素上，报出不存在的差异）。
+
+所有 CSS 值都经过 ValueTable 归一化并驻留：同一个字符串只解析一次，
+'0px' / '0.0px'、'rgb(0, 0, 0)' / 'rgba(0, 0, 0, 1)' 这类等价写法得到同一个 id。
+对比时 Chrome 和 ZBrowser 的值都是 id 列，按 id 查出类别和数值后整列向量化比较：
+长度按像素容差比较，其它值按归一化后的 id 比较；类别不同（如 Chrome 的 'auto'）不计为差异。
+
+用法: python3 style_diff.py <computed-styles-structured.json> [zbrowser_output.txt] [--tolerance 0.5] [--top 30]
+"""
+
+import argparse
+import re
+import sys
+from array import array
+
+import numpy as np
+
+from dom_match import build_chrome_tree, match_boxes
+from dump_snapshot import open_dump
+from zbrowser_log import BoxRecord, StyleRecord, iter_records
+
+EDGES = ('top', 'right', 'bottom', 'left')
+BOX_FIELDS = {
+    'margin': tuple(f'margin-{edge}' for edge in EDGES),
+    'padding': tuple(f'padding-{edge}' for edge in EDGES),
+    'border': tuple(f'border-{edge}-width' for edge in EDGES),
+}
+# ZBrowser 调试输出中能取到的属性，也是默认对比的属性
+COMPARED_PROPERTIES = BOX_FIELDS['margin'] + BOX_FIELDS['padding'] + BOX_FIELDS['border'] + (
+    'width', 'height', 'font-size')
+# 只用于换算、不参与对比的属性
+HELPER_PROPERTIES = ('box-sizing',)
+# ZBrowser 只为字号大于这个值的元素输出 [STYLE]（layout/style_utils.zig）
+STYLE_LOG_MIN_FONT_SIZE = 24.0
+
+KIND_KEYWORD = 0
+KIND_LENGTH = 1
+KIND_COLOR = 2
+KIND_NUMBER = 3
+
+_NUMBER_RE = re.compile(r'-?(?:\d+\.?\d*|\.\d+)(?:e[-+]?\d+)?')
+_COLOR_RE = re.compile(r'rgba?\(\s*([\d.]+),\s*([\d.]+),\s*([\d.]+)(?:,\s*([\d.]+))?\s*\)')
+
+
+def normalize_value(value):
+    """把 CSS 值归一化成 (类别, 规范 key, 数值)"""
+    text = value.strip()
+    lowered = text.lower()
+    if lowered.endswith('px') and _NUMBER_RE.fullmatch(lowered[:-2]):
+        number = float(lowered[:-2])
+        return KIND_LENGTH, ('px', number), number
+    if _NUMBER_RE.fullmatch(lowered):
+        number = float(lowered)
+        return KIND_NUMBER, ('number', number), number
+    m = _COLOR_RE.fullmatch(lowered)
+    if m:
+        alpha = float(m.group(4)) if m.group(4) is not None else 1.0
+        rgba = (int(float(m.group(1))), int(float(m.group(2))), int(float(m.group(3))), round(alpha * 255))
+        return KIND_COLOR, ('color',) + rgba, float((rgba[0] << 24) | (rgba[1] << 16) | (rgba[2] << 8) | rgba[3])
+    if lowered == 'transparent':
+        return KIND_COLOR, ('color', 0, 0, 0, 0), 0.0
+    return KIND_KEYWORD, ('keyword', sys.intern(lowered)), np.nan
+
+
+class ValueTable:
+    """CSS 值的驻留表：原始字符串 -> id（按字符串记忆），等价的值共享同一个 id
+
+    kinds() / numbers() 返回按 id 索引的 NumPy 数组，用于整列向量化查表。
+    """
+
+    def __init__(self):
+        self._by_raw = {}
+        self._by_key = {}
+        self.labels = []
+        self._kinds = array('b')
+        self._numbers = array('d')
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _add(self, kind, key, number, label):
+        vid = self._by_key.get(key)
+        if vid is None:
+            vid = len(self.labels)
+            self._by_key[key] = vid
+            self.labels.append(label)
+            self._kinds.append(kind)
+            self._numbers.append(number)
+        return vid
+
+    def intern(self, value):
+        vid = self._by_raw.get(value)
+        if vid is None:
+            kind, key, number = normalize_value(value)
+            vid = self._add(kind, key, number, value.strip())
+            self._by_raw[value] = vid
+        return vid
+
+    def intern_px(self, number):
+        """ZBrowser 输出的数值（像素）直接驻留，不经过字符串"""
+        number = float(number)
+        return self._add(KIND_LENGTH, ('px', number), number, f"{number:g}px")
+
+    def kinds(self):
+        return np.frombuffer(self._kinds, dtype=np.int8) if len(self) else np.empty(0, dtype=np.int8)
+
+    def numbers(self):
+        return np.frombuffer(self._numbers, dtype=np.float64) if len(self) else np.empty(0)
+
+
+def chrome_value_matrix(style_items, properties, table):
+    """Chrome 样式导出 -> (N, P) int32 的值 id 矩阵（缺失为 -1）"""
+    intern = table.intern
+    rows = []
+    for item in style_items:
+        styles = item.get('styles', {})
+        rows.append([-1 if value is None else intern(value) for value in map(styles.get, properties)])
+    return np.array(rows, dtype=np.int32).reshape(len(style_items), len(properties))
+
+
+def _record_values(record, box_sizing_border):
+    """一条 ZBrowser 记录里能取到的 (属性, 像素值 / 字符串)"""
+    if isinstance(record, StyleRecord):
+        yield record.property, record.value
+        return
+    for field, props in BOX_FIELDS.items():
+        edges = getattr(record, field)
+        if edges is not None:
+            yield from zip(props, edges)
+    if record.content is not None:
+        width, height = record.content[2], record.content[3]
+        if box_sizing_border:
+            # Chrome 的 width / height 在 border-box 下包含 padding 和 border
+            padding = record.padding or (0.0,) * 4
+            border = record.border or (0.0,) * 4
+            width += padding[1] + padding[3] + border[1] + border[3]
+            height += padding[0] + padding[2] + border[0] + border[2]
+        yield 'width', width
+        if record.source == 'info':
+            # [LAYOUT] Element 在布局子元素之前输出，此时 height 还没有算出来
+            yield 'height', height
+
+
+def anchor_style_records(records, style_items, table):
+    """[STYLE] 记录 -> Chrome 元素下标（无法定位时为 None）
+
+    候选只有 Chrome font-size 大于 STYLE_LOG_MIN_FONT_SIZE 的同名元素，按文档顺序依次分配，
+    用完后从头再来（每轮样式计算都会重新输出）。
+    """
+    font_sizes = [(pos, table.intern(item['styles']['font-size'])) for pos, item in enumerate(style_items)
+                  if 'font-size' in item.get('styles', {})]
+    kinds = table.kinds()
+    numbers = table.numbers()
+    candidates = {}
+    for pos, vid in font_sizes:
+        if kinds[vid] == KIND_LENGTH and numbers[vid] > STYLE_LOG_MIN_FONT_SIZE:
+            candidates.setdefault(style_items[pos]['element'].get('tagName', '').lower(), []).append(pos)
+
+    cursors = {}
+    matches = []
+    for record in records:
+        positions = candidates.get(record.tag.lower())
+        if not positions:
+            matches.append(None)
+            continue
+        cursor = cursors.get(record.tag.lower(), 0) % len(positions)
+        matches.append(positions[cursor])
+        cursors[record.tag.lower()] = cursor + 1
+    return matches
+
+
+def zbrowser_value_rows(records, style_items, properties, table, nodes=None, unanchored=None):
+    """把 ZBrowser 记录配对到 Chrome 元素，返回 (元素下标, 属性下标, 值 id) 三列
+
+    同一个元素的同一属性出现多次时（多轮布局），以输出中最后一次为准。
+    unanchored: 传入列表时，收集无法定位的 [STYLE] 记录
+    """
+    if nodes is None:
+        nodes = build_chrome_tree(style_items)
+    prop_index = {prop: col for col, prop in enumerate(properties)}
+    border_box = table.intern('border-box')
+    sizing_col = prop_index.get('box-sizing')
+
+    # 三类记录分开对齐：Info 块带 class / id，另外两类只有 tag，并且每轮布局会从头再来一遍；
+    # [STYLE] 另按字号定位（anchor_style_records）
+    groups = {'info': [], 'layout': [], 'style': []}
+    for record in records:
+        if isinstance(record, StyleRecord):
+            groups['style'].append(record)
+        elif isinstance(record, BoxRecord):
+            groups[record.source].append(record)
+
+    values = {}
+    for name, group in groups.items():
+        boxes = [{'tag': r.tag, 'class': getattr(r, 'class_name', ''), 'id': getattr(r, 'id', '')} for r in group]
+        if name == 'style':
+            matches = anchor_style_records(group, style_items, table)
+        else:
+            matches = match_boxes(style_items, boxes, nodes, tag_only=(name != 'info'), restart=(name != 'info'))
+        for record, pos in zip(group, matches):
+            if pos is None:
+                if name == 'style' and unanchored is not None:
+                    unanchored.append(record)
+                continue
+            border_sizing = False
+            if sizing_col is not None and isinstance(record, BoxRecord):
+                border_sizing = table.intern(style_items[pos]['styles'].get('box-sizing', '')) == border_box
+            for prop, value in _record_values(record, border_sizing):
+                col = prop_index.get(prop)
+                if col is None:
+                    continue
+                vid = table.intern(value) if isinstance(value, str) else table.intern_px(value)
+                previous = values.get((pos, col))
+                if previous is None or previous[0] <= record.line:
+                    values[(pos, col)] = (record.line, vid)
+
+    count = len(values)
+    elem = np.fromiter((key[0] for key in values), dtype=np.intp, count=count)
+    prop = np.fromiter((key[1] for key in values), dtype=np.intp, count=count)
+    vids = np.fromiter((v[1] for v in values.values()), dtype=np.int32, count=count)
+    return elem, prop, vids
+
+
+def diff_styles(chrome_matrix, elem, prop, zb_ids, table, tolerance=0.5):
+    """向量化对比：返回每个 (元素, 属性) 对的 Chrome id、差值和是否不一致"""
+    chrome_ids = chrome_matrix[elem, prop]
+    kinds = table.kinds()
+    numbers = table.numbers()
+
+    present = chrome_ids >= 0
+    safe_ids = np.where(present, chrome_ids, 0)
+    chrome_kind = np.where(present, kinds[safe_ids], -1)
+    zb_kind = kinds[zb_ids]
+    comparable = present & (chrome_kind == zb_kind)
+
+    delta = np.where(comparable & (zb_kind == KIND_LENGTH), numbers[zb_ids] - numbers[safe_ids], 0.0)
+    numeric = (zb_kind == KIND_LENGTH) | (zb_kind == KIND_NUMBER)
+    mismatch = comparable & np.where(numeric, np.abs(delta) > tolerance, chrome_ids != zb_ids)
+    return {
+        'elem': elem,
+        'prop': prop,
+        'chrome_ids': chrome_ids,
+        'zbrowser_ids': zb_ids,
+        'delta': delta,
+        'comparable': comparable,
+        'mismatch': mismatch,
+    }
+
+
+def print_style_report(result, properties, style_items, table, nodes, top=30, unanchored=()):
+    """按属性汇总，并列出差异最大的 (元素, 属性)；unanchored 为无法定位的 [STYLE] 记录"""
+    prop = result['prop']
+    comparable = result['comparable']
+    mismatch = result['mismatch']
+    abs_delta = np.abs(result['delta'])
+    n_props = len(properties)
+
+    compared = np.bincount(prop, weights=comparable, minlength=n_props)
+    mismatched = np.bincount(prop, weights=mismatch, minlength=n_props)
+    max_delta = np.zeros(n_props)
+    np.maximum.at(max_delta, prop, np.where(comparable, abs_delta, 0.0))
+
+    print("=" * 100)
+    print("Chrome vs ZBrowser computed style 对比")
+    print("=" * 100)
+    print(f"配对上的 (元素, 属性): {len(prop)}, 可比较: {int(comparable.sum())}, 不一致: {int(mismatch.sum())}, "
+          f"驻留的不同取值: {len(table)}")
+
+    print(f"\n{'property':<24} {'compared':>9} {'mismatch':>9} {'max |Δ|':>9}")
+    for col in np.flatnonzero(compared):
+        print(f"{properties[col]:<24} {int(compared[col]):>9} {int(mismatched[col]):>9} {max_delta[col]:>9.2f}")
+
+    rows = np.flatnonzero(mismatch)
+    rows = rows[np.argsort(-abs_delta[rows], kind='stable')]
+    if len(rows):
+        print(f"\n{'index':>6}  {'element':<28} {'property':<20} {'chrome':>14} {'zbrowser':>14}  path")
+    for row in rows[:top]:
+        pos = int(result['elem'][row])
+        elem = style_items[pos]['element']
+        label = elem['tagName'].lower()
+        if elem.get('className'):
+            label += '.' + '.'.join(elem['className'].split())
+        if elem.get('id'):
+            label += '#' + elem['id']
+        print(f"{elem.get('index', '?'):>6}  {label[:28]:<28} {properties[result['prop'][row]]:<20} "
+              f"{table.labels[result['chrome_ids'][row]]:>14} {table.labels[result['zbrowser_ids'][row]]:>14}  "
+              f"{nodes[pos].path}")
+
+    if unanchored:
+        print(f"\n无法定位的 [STYLE] 记录（Chrome 中没有字号大于 {STYLE_LOG_MIN_FONT_SIZE:g}px 的同名元素，不计入）: "
+              f"{len(unanchored)}")
+        for record in unanchored[:top]:
+            print(f"  line {record.line:>6}  {record.tag:<10} {record.property:<20} {record.value}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="对比 Chrome computed styles 与 ZBrowser 解析出的样式值")
+    arg_parser.add_argument('styles_file', help="Chrome 导出的 computed-styles-structured.json")
+    arg_parser.add_argument('zbrowser_output', nargs='?', help="ZBrowser 的输出（默认读标准输入）")
+    arg_parser.add_argument('--tolerance', type=float, default=0.5, help="长度的误差容差（px）")
+    arg_parser.add_argument('--top', type=int, default=30, help="列出差异最大的前 N 项")
+    arg_parser.add_argument('--properties', nargs='+', default=list(COMPARED_PROPERTIES),
+                            help="要对比的属性（默认为 ZBrowser 输出中能取到的全部属性）")
+    args = arg_parser.parse_args()
+
+    properties = tuple(args.properties) + tuple(p for p in HELPER_PROPERTIES if p not in args.properties)
+    style_items = open_dump(args.styles_file, properties)
+    table = ValueTable()
+    nodes = build_chrome_tree(style_items)
+    chrome_matrix = chrome_value_matrix(style_items, properties, table)
+    records = iter_records(args.zbrowser_output or sys.stdin.buffer)
+    unanchored = []
+    elem, prop, zb_ids = zbrowser_value_rows(records, style_items, properties, table, nodes, unanchored)
+    result = diff_styles(chrome_matrix, elem, prop, zb_ids, table, args.tolerance)
+    print_style_report(result, properties, style_items, table, nodes, args.top, unanchored)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+计算样式的共享存储
+
+Chrome 导出的 computed-styles-structured.json 里每个元素都带 ~400 个属性，
+但绝大多数元素的样式完全相同或只差几个属性（颜色、宽高、display 之类）。
+这里在加载时把样式换成共享记录：
+
+  - 每个元素的样式按 (属性名元组, 全部属性值的摘要) 做哈希，相同的样式只存一条记录，
+    所有这样的元素引用同一个对象
+  - 新出现的样式如果和父元素的属性名一致，只存与父元素不同的属性，其余沿父元素的记录查找
+    （与 src/css/cascade.zig 中可继承属性取父元素计算值的思路一样）；
+    链长超过 MAX_DELTA_DEPTH 或差异超过一半时存完整的样式，查找代价有上界
+  - 属性名元组与属性值都经过驻留，同一个字符串只存一份
+
+SharedStyles 是只读的 Mapping，find_element / print_element_info 等调用方照常使用
+styles.get() / styles[name] / styles.items()，不需要区分它和 dict。
+"""
+
+import hashlib
+from collections.abc import Mapping
+
+from dom_match import iter_chrome_tree
+
+MAX_DELTA_DEPTH = 8
+
+_MISSING = object()
+
+
+class SharedStyles(Mapping):
+    """一条共享的样式记录
+
+    base 为 None 时 values 就是完整的样式；否则只存与 base 不同的属性。
+    属性的名字和顺序由 shape（驻留的属性名元组）决定，与 Chrome 导出的顺序一致。
+    """
+
+    __slots__ = ('_shape', '_values', '_base', 'depth')
+
+    def __init__(self, shape, values, base=None):
+        self._shape = shape
+        self._values = values
+        self._base = base
+        self.depth = 0 if base is None else base.depth + 1
+
+    def __getitem__(self, name):
+        record = self
+        while record._base is not None:
+            value = record._values.get(name, _MISSING)
+            if value is not _MISSING:
+                return value
+            record = record._base
+        return record._values[name]
+
+    def __iter__(self):
+        return iter(self._shape)
+
+    def __len__(self):
+        return len(self._shape)
+
+    def __contains__(self, name):
+        record = self
+        while record._base is not None:
+            record = record._base
+        return name in record._values
+
+    def materialize(self):
+        """展开成普通 dict（每次调用都新建，不缓存，避免把共享省下的内存又占回来）"""
+        chain = []
+        record = self
+        while record is not None:
+            chain.append(record._values)
+            record = record._base
+        styles = dict(chain.pop())
+        while chain:
+            styles.update(chain.pop())
+        return styles
+
+    def items(self):
+        return self.materialize().items()
+
+    def values(self):
+        return self.materialize().values()
+
+
+class StyleTable:
+    """样式记录的驻留表，add() 返回与传入样式等价的共享记录"""
+
+    def __init__(self, max_depth=MAX_DELTA_DEPTH):
+        self.max_depth = max_depth
+        self._shapes = {}
+        self._records = {}
+        self._strings = {}
+
+    def __len__(self):
+        return len(self._records)
+
+    def add(self, styles, parent=None):
+        """styles: 一个元素的样式 dict；parent: 父元素的共享记录（没有则为 None）"""
+        names = tuple(styles)
+        shape = self._shapes.setdefault(names, names)
+        # Chrome 的计算样式值都是字符串；'\0' 不会出现在 CSS 值里，拼接后的摘要不会混淆边界
+        digest = hashlib.blake2b('\0'.join(styles.values()).encode('utf-8'), digest_size=16).digest()
+        key = (id(shape), digest)
+        record = self._records.get(key)
+        if record is None:
+            record = self._records[key] = self._new_record(shape, styles, parent)
+        return record
+
+    def _new_record(self, shape, styles, parent):
+        intern = self._strings.setdefault
+        if parent is not None and parent._shape is shape and parent.depth < self.max_depth:
+            base = parent.materialize()
+            delta = {name: intern(value, value) for name, value in zip(shape, styles.values())
+                     if base[name] != value}
+            if len(delta) * 2 <= len(shape):
+                return SharedStyles(shape, delta, parent)
+        return SharedStyles(shape, {name: intern(value, value) for name, value in zip(shape, styles.values())})
+
+
+def share_styles(items, table=None):
+    """把每个元素记录的 styles 换成共享记录，返回元素记录列表
+
+    items 可以是 iter_elements() 这样的流式迭代器：每个元素的完整样式 dict
+    在换成共享记录后就被释放，峰值内存只与不同样式的数量有关。
+    """
+    if table is None:
+        table = StyleTable()
+    shared = []
+    for item, node in iter_chrome_tree(items):
+        styles = item.get('styles')
+        if styles is not None:
+            parent = shared[node.parent.pos].get('styles') if node.parent is not None else None
+            item['styles'] = table.add(styles, parent)
+        shared.append(item)
+    return shared
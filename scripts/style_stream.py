@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+流式读取 computed-styles-structured.json
+
+Chrome 的样式导出对每个元素都带上全部 ~400 个计算属性，真实页面能到几百 MB，
+json.load 一次性读入会被 OOM。这里按顶层数组逐个元素解码，
+并且只保留调用方需要的 styles 属性，峰值内存只与单个元素大小有关。
+"""
+
+import json
+
+CHUNK_SIZE = 1 << 16
+# 被截断的记号（-Infinity、\uXXXX 转义、数字）最长的长度；截断导致的解码错误都在缓冲区末尾这个距离之内
+MAX_TOKEN_LENGTH = 16
+
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    """从文本流中逐个产出顶层 JSON 数组的元素
+
+    注意：顶层元素必须是对象或数组（Chrome 导出的都是对象），
+    否则缓冲区末尾被截断的数字会被误认为是完整的值。
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    started = False
+    read_size = chunk_size
+
+    while True:
+        while pos < len(buf) and buf[pos] in ' \t\r\n':
+            pos += 1
+
+        if pos >= len(buf):
+            if eof:
+                raise json.JSONDecodeError("Unexpected end of JSON array", buf, pos)
+            more = f.read(read_size)
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+
+        if not started:
+            if buf[pos] != '[':
+                raise json.JSONDecodeError("Expecting '['", buf, pos)
+            started = True
+            pos += 1
+            continue
+
+        if buf[pos] == ',':
+            pos += 1
+            continue
+        if buf[pos] == ']':
+            return
+
+        try:
+            value, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            # 元素被缓冲区截断时，出错位置就在缓冲区末尾附近；出错位置之后还有一整块以上的数据，
+            # 说明元素本身有语法错误，补读也没用，不再把文件剩下的部分读进内存。
+            # 没读完的字符串例外：报错位置是字符串的开头，字符串一直延续到缓冲区末尾
+            truncated = (e.msg.startswith('Unterminated string') or
+                         len(buf) - e.pos <= max(chunk_size, MAX_TOKEN_LENGTH))
+            if eof or not truncated:
+                raise
+            # 当前元素还没读完整：补读一块再试，块大小翻倍保证总代价是线性的
+            more = f.read(read_size)
+            eof = not more
+            buf = buf[pos:] + more
+            pos = 0
+            read_size *= 2
+            continue
+
+        read_size = chunk_size
+        pos = end
+        yield value
+
+
+def project_styles(item, properties):
+    """只保留 item['styles'] 中指定的属性；properties 为 None 时保留全部"""
+    if properties is None:
+        return item
+    styles = item.get('styles', {})
+    item['styles'] = {name: styles[name] for name in properties if name in styles}
+    return item
+
+
+def iter_elements(json_file_path, properties=None):
+    """逐个产出元素记录 {'element': ..., 'styles': ...}
+
+    properties: 需要保留的样式属性名列表；None 表示全部保留，空列表表示丢弃 styles
+    """
+    if properties is not None:
+        properties = tuple(properties)
+    with open(json_file_path, 'r', encoding='utf-8') as f:
+        for item in iter_json_array(f):
+            yield project_styles(item, properties)
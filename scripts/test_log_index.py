@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+`zig build test` 输出的索引：一次流式扫描，按测试切分，失败的测试可以直接查
+
+zig 的测试运行器只在出问题时输出测试名，通过的测试只体现在计数里：
+  error: 'tests.layout.flexbox_test.test.flex grow' failed: ...        -> 失败（后面是栈）
+  error: 'tests.html.xxx.test.yyy' logged errors: [STYLE] ...         -> 测试期间有 error 级日志（含 GPA 泄漏）
+  error: while executing test 'tests.font.xxx', the following test command failed:
+                                                                       -> 测试进程在该测试处崩溃 / 退出
+  +- run test 650/653 passed, 3 failed [2s MaxRSS:166M]                -> 步骤计数（--summary all 时带耗时）
+  Build Summary: 1/3 steps succeeded; 1 failed; 653/653 tests passed   -> 总计
+每个测试头开始一个片段，到下一个测试头或汇总为止。对每个片段记录类型、行号和字节范围、
+第一条失败信息（expected/found、TestExpected*、panic、error 日志、GPA 泄漏……）、
+第一个非标准库的源码位置和 GPA 泄漏数量；崩溃的测试取上一个测试头之后的第一条失败信息。
+zig 不输出单个测试的耗时，只记录步骤耗时；从标准输入流式读取时另外记录整次运行的墙钟时间。
+
+索引是一个 JSON 文件，按日志内容的 sha1 区分运行（重复索引同一份日志只更新），保留最近 MAX_RUNS 次，
+查询不需要重新扫描日志；show 按字节范围只读出那一段。测试在某次运行里没出现、且这次运行有汇总时算通过，
+据此统计不稳定（flaky）的测试。
+
+用法:
+  python3 test_log_index.py index logs/test_output.log             # 索引一次运行
+  zig build test 2>&1 | tee logs/test_output.log | python3 test_log_index.py index - --log logs/test_output.log
+  python3 test_log_index.py failed 'tests/layout/*'                 # 失败的测试和第一条错误（默认最近一次运行）
+  python3 test_log_index.py show flexbox                           # 打印匹配测试的完整输出片段
+  python3 test_log_index.py flaky                                  # 跨运行状态反复变化的测试
+  python3 test_log_index.py runs                                   # 已索引的运行
+"""
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+from leak_report import _FRAME_RE, frame_label, is_std_frame
+
+DEFAULT_INDEX = os.path.join('logs', 'test_index.json')
+DEFAULT_LOG = os.path.join('logs', 'test_output.log')
+MAX_RUNS = 100
+INDEX_VERSION = 1
+
+_HEADER_RE = re.compile(
+    rb"^error: (?:'(?P<name>.+)' (?P<kind>failed|logged errors|leaked[^:]*|timed out)(?::\s?(?P<rest>.*))?"
+    rb"|while executing test '(?P<crashed>.+)', the following test command (?:failed|crashed|terminated)[^:]*:)\s*$"
+)
+_SUMMARY_RE = re.compile(rb'^Build Summary: (?P<steps_ok>\d+)/(?P<steps>\d+) steps succeeded(?P<rest>.*)$')
+_TESTS_RE = re.compile(rb'(\d+)/(\d+) tests passed((?:; \d+ [a-z ]+)*)')
+_COUNT_RE = re.compile(rb'(\d+) (skipped|failed|leaked|timed out|crashed)')
+_STEP_RE = re.compile(rb'^[ |]*\+- (?P<step>run test\S*(?: \S+)??) (?P<passed>\d+)(?:/(?P<total>\d+))? (?:tests )?passed'
+                      rb'(?P<rest>.*)$')
+_DURATION_RE = re.compile(rb'(?<![\w.])(\d+(?:\.\d+)?)(us|ms|s|m)(?![\w])')
+_DURATION_UNITS = {b'us': 1e-6, b'ms': 1e-3, b's': 1.0, b'm': 60.0}
+# 第一条失败信息：按出现顺序取第一条匹配的行
+_ERROR_RE = re.compile(
+    rb'expected .*, found |TestExpected\w*|TestUnexpected\w*|panic: |reached unreachable|'
+    rb'^error(?:\([\w.]+\))?: |^\[[\w.]+\] \(err\): |Segmentation fault|index out of bounds|integer overflow'
+)
+_LEAK_PREFIXES = (b'[gpa] (err): memory address', b'error(gpa): memory address')
+
+
+def test_path(name):
+    """'tests.layout.flexbox_test.test.flex grow' -> ('tests/layout/flexbox_test', 'flex grow')"""
+    module, sep, test = name.partition('.test.')
+    if not sep:
+        return name.replace('.', '/'), ''
+    return module.replace('.', '/'), test
+
+
+def _decode(raw):
+    return raw.decode('utf-8', 'replace').rstrip('\r\n')
+
+
+def _duration(rest):
+    """步骤行里的耗时（秒），没有时为 None"""
+    m = _DURATION_RE.search(rest)
+    return float(m.group(1)) * _DURATION_UNITS[m.group(2)] if m else None
+
+
+def _parse_summary(m):
+    summary = {'steps_ok': int(m.group('steps_ok')), 'steps': int(m.group('steps'))}
+    rest = m.group('rest')
+    tests = _TESTS_RE.search(rest)
+    steps_part = rest[:tests.start()] if tests else rest
+    for count, what in _COUNT_RE.findall(steps_part):
+        summary[f"steps_{what.decode().replace(' ', '_')}"] = int(count)
+    if tests:
+        summary['passed'] = int(tests.group(1))
+        summary['tests'] = int(tests.group(2))
+        for count, what in _COUNT_RE.findall(tests.group(3)):
+            summary[what.decode().replace(' ', '_')] = int(count)
+    return summary
+
+
+class TestLogIndexer:
+    """逐行喂入原始字节行，维护当前片段并收集失败的测试"""
+
+    def __init__(self):
+        self.failures = []
+        self.steps = []
+        self.summary = None
+        self.lines = 0
+        self.offset = 0
+        self.digest = hashlib.sha1()
+        self._current = None
+        # 上一个测试头之后出现的第一条失败信息和泄漏数（给崩溃的测试用）
+        self._pending_error = None
+        self._pending_leaks = 0
+
+    def _close(self):
+        if self._current is not None:
+            self._current['end_line'] = self.lines - 1
+            self._current['end_offset'] = self.offset
+            self.failures.append(self._current)
+            self._current = None
+
+    def _open(self, name, kind, first_error=None):
+        self._close()
+        module, test = test_path(name)
+        self._current = {
+            'name': name, 'module': module, 'test': test, 'kind': kind,
+            'line': self.lines, 'offset': self.offset, 'end_line': self.lines, 'end_offset': self.offset,
+            'first_error': first_error, 'location': None, 'leaks': 0,
+        }
+
+    def feed(self, raw):
+        """处理一行（原始字节，含行尾换行）"""
+        self.digest.update(raw)
+        self.lines += 1
+        line = raw.rstrip(b'\r\n')
+        if line.startswith(b'error: '):
+            m = _HEADER_RE.match(line)
+            if m is not None:
+                if m.group('crashed') is not None:
+                    pending = self._pending_error
+                    self._open(_decode(m.group('crashed')), 'crashed', pending and pending[0])
+                    if pending:
+                        self._current['location'] = pending[1]
+                    self._current['leaks'] = self._pending_leaks
+                else:
+                    rest = m.group('rest')
+                    self._open(_decode(m.group('name')), _decode(m.group('kind')),
+                               _decode(rest) if m.group('kind') == b'failed' and rest else None)
+                self._pending_error = None
+                self._pending_leaks = 0
+                self.offset += len(raw)
+                return
+            if line.startswith(b'error: the following build command failed'):
+                self._close()
+        elif line.startswith(b'Build Summary: '):
+            self._close()
+            m = _SUMMARY_RE.match(line)
+            if m is not None:
+                self.summary = _parse_summary(m)
+        elif b'+- ' in line[:40] and b'passed' in line:
+            m = _STEP_RE.match(line)
+            if m is not None:
+                self._close()
+                # zig 在日志开头和结尾都会打印步骤树，同一个步骤保留最后一次
+                self.steps = [step for step in self.steps if step['step'] != _decode(m.group('step'))]
+                self.steps.append({
+                    'step': _decode(m.group('step')),
+                    'passed': int(m.group('passed')),
+                    'total': int(m.group('total')) if m.group('total') else None,
+                    'counts': {what.decode(): int(n) for n, what in _COUNT_RE.findall(m.group('rest'))},
+                    'duration': _duration(m.group('rest')),
+                })
+        else:
+            self._scan_body(line)
+        self.offset += len(raw)
+
+    def _scan_body(self, line):
+        current = self._current
+        if line.startswith(_LEAK_PREFIXES):
+            if current is not None:
+                current['leaks'] += 1
+            else:
+                self._pending_leaks += 1
+        if current is not None:
+            first_error, location = current['first_error'], current['location']
+        else:
+            first_error, location = self._pending_error or (None, None)
+        if first_error is not None and location is not None:
+            return
+        if first_error is None and _ERROR_RE.search(line):
+            message = _decode(line).strip()
+            if current is not None:
+                current['first_error'] = message
+            else:
+                self._pending_error = (message, None)
+            return
+        if first_error is not None and location is None:
+            m = _FRAME_RE.match(_decode(line))
+            if m is not None:
+                label = frame_label(m.group(1), m.group(2), m.group(4))
+                if not is_std_frame(label):
+                    if current is not None:
+                        current['location'] = label
+                    else:
+                        self._pending_error = (self._pending_error[0], label)
+
+    def finish(self):
+        self._close()
+
+
+def index_log(source):
+    """流式扫描一份测试日志（路径或二进制流），返回运行记录"""
+    indexer = TestLogIndexer()
+    streaming = not isinstance(source, str)
+    started = time.monotonic()
+    with (open(source, 'rb') if not streaming else source) as f:
+        for raw in f:
+            indexer.feed(raw)
+    indexer.finish()
+    return {
+        'id': indexer.digest.hexdigest(),
+        'indexed': time.time(),
+        'lines': indexer.lines,
+        'size': indexer.offset,
+        'wall': time.monotonic() - started if streaming else None,
+        'summary': indexer.summary,
+        'steps': indexer.steps,
+        'failures': indexer.failures,
+    }
+
+
+def load_index(path):
+    if not os.path.exists(path):
+        return {'version': INDEX_VERSION, 'runs': []}
+    with open(path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    if index.get('version') != INDEX_VERSION:
+        raise ValueError(f"'{path}' 的索引版本 {index.get('version')} 不受支持")
+    return index
+
+
+def save_index(index, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def add_run(index, run, max_runs=MAX_RUNS):
+    """加入一次运行（同一份日志再次索引时替换原来的记录），只保留最近 max_runs 次"""
+    runs = [r for r in index['runs'] if r['id'] != run['id']]
+    runs.append(run)
+    index['runs'] = runs[-max_runs:]
+
+
+def resolve_run(index, spec):
+    """latest / previous / 运行序号（从 1 开始）/ sha1 前缀 -> 运行记录"""
+    runs = index['runs']
+    if not runs:
+        raise ValueError("索引里还没有运行记录（先运行 index）")
+    if spec == 'latest':
+        return runs[-1]
+    if spec == 'previous':
+        if len(runs) < 2:
+            raise ValueError("索引里只有一次运行")
+        return runs[-2]
+    if spec.isdigit() and 1 <= int(spec) <= len(runs) and len(spec) < 6:
+        return runs[int(spec) - 1]
+    found = [r for r in runs if r['id'].startswith(spec)]
+    if len(found) != 1:
+        raise ValueError(f"运行 '{spec}' {'不存在' if not found else '不唯一'}")
+    return found[0]
+
+
+def match_test(failure, pattern):
+    """pattern 带通配符时按 fnmatch 匹配模块路径或完整测试名，否则按子串匹配（不区分大小写）"""
+    if pattern is None:
+        return True
+    if any(ch in pattern for ch in '*?['):
+        pattern = pattern[:-4] if pattern.endswith('.zig') else pattern
+        return (fnmatch.fnmatchcase(failure['module'], pattern) or fnmatch.fnmatchcase(failure['name'], pattern)
+                or fnmatch.fnmatchcase(f"{failure['module']}/{failure['test']}", pattern))
+    pattern = pattern.lower()
+    return pattern in failure['name'].lower() or pattern in failure['module'].lower()
+
+
+def test_history(index):
+    """{测试名: [(运行, 状态)]}，状态为 'pass' / 失败类型；运行没有汇总时测试状态未知，不计入"""
+    history = {}
+    names = {f['name'] for run in index['runs'] for f in run['failures']}
+    for run in index['runs']:
+        failed = {f['name']: f['kind'] for f in run['failures']}
+        for name in names:
+            if name in failed:
+                history.setdefault(name, []).append((run, failed[name]))
+            elif run['summary'] is not None:
+                history.setdefault(name, []).append((run, 'pass'))
+    return history
+
+
+def flaky_tests(index, min_flips=2):
+    """状态在通过 / 失败之间变化至少 min_flips 次的测试：[(测试名, 失败次数, 运行次数, 状态序列)]"""
+    result = []
+    for name, entries in test_history(index).items():
+        states = ['P' if status == 'pass' else 'F' for _, status in entries]
+        flips = sum(1 for a, b in zip(states, states[1:]) if a != b)
+        if flips >= min_flips:
+            result.append((name, states.count('F'), len(states), ''.join(states)))
+    result.sort(key=lambda row: (-row[1], row[0]))
+    return result
+
+
+def _run_label(run):
+    when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run['indexed']))
+    return f"{run['id'][:10]} {when}"
+
+
+def _summary_text(run):
+    summary = run['summary']
+    if summary is None:
+        return "没有 Build Summary（运行未结束？）"
+    text = f"步骤 {summary['steps_ok']}/{summary['steps']} 成功"
+    if 'tests' in summary:
+        text += f"，测试 {summary['passed']}/{summary['tests']} 通过"
+    extra = [f"{key} {value}" for key, value in summary.items()
+             if key in ('failed', 'skipped', 'leaked', 'timed_out', 'crashed')]
+    return text + (f"（{', '.join(extra)}）" if extra else '')
+
+
+def print_run(run):
+    print(f"运行 {_run_label(run)}: {run['lines']} 行, {run['size'] / 1e6:.1f} MB")
+    print(f"  {_summary_text(run)}")
+    for step in run['steps']:
+        total = f"/{step['total']}" if step['total'] else ''
+        counts = ''.join(f", {what} {n}" for what, n in step['counts'].items())
+        duration = f", {step['duration']:.2f}s" if step['duration'] is not None else ''
+        print(f"  {step['step']}: {step['passed']}{total} passed{counts}{duration}")
+    if run['wall'] is not None:
+        print(f"  墙钟时间: {run['wall']:.1f}s")
+
+
+def print_failures(run, failures):
+    print("=" * 100)
+    print(f"失败的测试（{len(failures)} 个）")
+    print("=" * 100)
+    print_run(run)
+    for failure in failures:
+        print(f"\n[{failure['kind']}] {failure['module']}: {failure['test'] or failure['name']}")
+        print(f"  日志行 {failure['line']}-{failure['end_line']}"
+              + (f", GPA 泄漏 {failure['leaks']} 处" if failure['leaks'] else ''))
+        if failure['first_error']:
+            print(f"  第一条错误: {failure['first_error'][:200]}")
+        if failure['location']:
+            print(f"  位置: {failure['location']}")
+
+
+def print_flaky(rows, runs):
+    print("=" * 100)
+    print(f"不稳定的测试（最近 {runs} 次运行，P = 通过, F = 失败）")
+    print("=" * 100)
+    if not rows:
+        print("没有")
+    for name, fails, total, states in rows:
+        module, test = test_path(name)
+        print(f"{fails:>3}/{total:<3} {states[-40:]:<40}  {module}: {test}")
+
+
+def show_failure(failure, log_path, run):
+    """按字节范围读出一个测试的输出片段"""
+    if not os.path.exists(log_path) or os.path.getsize(log_path) != run['size']:
+        raise ValueError(f"'{log_path}' 不是这次运行的日志（大小不同或不存在），用 --log 指定")
+    with open(log_path, 'rb') as f:
+        f.seek(failure['offset'])
+        data = f.read(failure['end_offset'] - failure['offset'])
+    print(f"===== [{failure['kind']}] {failure['name']}（日志行 {failure['line']}-{failure['end_line']}）=====")
+    sys.stdout.write(data.decode('utf-8', 'replace'))
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="zig build test 输出的索引和失败测试查询")
+    arg_parser.add_argument('--index', default=DEFAULT_INDEX, help=f"索引文件（默认 {DEFAULT_INDEX}）")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    index_cmd = commands.add_parser('index', help="扫描一份测试日志并加入索引")
+    index_cmd.add_argument('log', nargs='?', default=DEFAULT_LOG, help=f"测试日志，'-' 读标准输入（默认 {DEFAULT_LOG}）")
+    index_cmd.add_argument('--log', dest='log_path', default=None, help="读标准输入时，tee 出来的日志文件路径（show 用）")
+    index_cmd.add_argument('--max-runs', type=int, default=MAX_RUNS, help="最多保留的运行次数")
+    index_cmd.add_argument('--quiet', action='store_true', help="只写索引，不打印失败列表")
+
+    failed_cmd = commands.add_parser('failed', help="列出失败的测试和第一条错误")
+    failed_cmd.add_argument('pattern', nargs='?', default=None,
+                            help="测试名子串，或 tests/layout/* 这样的通配符")
+    failed_cmd.add_argument('--run', default='latest', help="运行（latest / previous / 序号 / sha1 前缀）")
+
+    show_cmd = commands.add_parser('show', help="打印匹配测试的完整输出片段")
+    show_cmd.add_argument('pattern', help="测试名子串或通配符")
+    show_cmd.add_argument('--run', default='latest', help="运行（latest / previous / 序号 / sha1 前缀）")
+    show_cmd.add_argument('--log', dest='log_path', default=None, help="这次运行的日志文件（默认为索引时的路径）")
+
+    flaky_cmd = commands.add_parser('flaky', help="跨运行状态反复变化的测试")
+    flaky_cmd.add_argument('--min-flips', type=int, default=2, help="状态至少变化几次")
+
+    commands.add_parser('runs', help="列出已索引的运行")
+    args = arg_parser.parse_args()
+
+    try:
+        index = load_index(args.index)
+        if args.command == 'index':
+            if args.log == '-':
+                run = index_log(sys.stdin.buffer)
+                run['log'] = os.path.abspath(args.log_path) if args.log_path else None
+            else:
+                run = index_log(args.log)
+                run['log'] = os.path.abspath(args.log)
+            add_run(index, run, args.max_runs)
+            save_index(index, args.index)
+            if not args.quiet:
+                print_failures(run, run['failures'])
+            print(f"\n索引已写入 {args.index}（{len(index['runs'])} 次运行）")
+        elif args.command == 'failed':
+            run = resolve_run(index, args.run)
+            print_failures(run, [f for f in run['failures'] if match_test(f, args.pattern)])
+        elif args.command == 'show':
+            run = resolve_run(index, args.run)
+            failures = [f for f in run['failures'] if match_test(f, args.pattern)]
+            if not failures:
+                raise ValueError(f"运行 {run['id'][:10]} 里没有匹配 '{args.pattern}' 的失败测试")
+            log_path = args.log_path or run.get('log')
+            if not log_path:
+                raise ValueError("索引里没有记录日志路径，用 --log 指定")
+            for failure in failures:
+                show_failure(failure, log_path, run)
+        elif args.command == 'flaky':
+            print_flaky(flaky_tests(index, args.min_flips), len(index['runs']))
+        else:
+            for run in index['runs']:
+                print_run(run)
+                print(f"  失败: {len(run['failures'])}")
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+文本行高精度报告：把 ZBrowser 的 [TEXT HEIGHT] 记录与 Chrome 的元素矩形、computed styles 对齐
+
+三个来源：
+  [TEXT HEIGHT] text: "...", font_size=32.0, line_height=46.0, height=46.0   （ZBrowser，文本节点）
+  element-rects.json        文本所在元素的真实高度（content box = 矩形高度 - padding - border）
+  computed-styles-structured.json   font-size / font-family / line-height
+[TEXT HEIGHT] 里的文本只有前 20 个字节，PowerShell 日志中的 UTF-8 还被当成 GBK 显示成了乱码：
+先还原成 UTF-8、截掉被切断的最后一个字符，再用 ElementStore 的 textContent trigram 索引找到所在元素。
+
+每条文本归入 (字号, 字体族, 文字) 分组，文字按字符判断（CJK / 阿拉伯文 / 泰文 / 拉丁），
+并按 cpu_backend.zig 的选字体逻辑对应到字体文件和 src/font/ 下的解析路径：
+  CJK       NotoSansCJKSC / SourceHanSans（CFF 轮廓）-> cff.zig
+  阿拉伯文  fonts/NotoSansArabic-*.ttf（glyf）        -> ttf.zig
+  泰文      fonts/NotoSansThai-*.ttf（glyf）          -> ttf.zig
+  拉丁      默认字体（glyf）                          -> ttf.zig
+ZBrowser 的文本高度来自 style_utils.computeLineHeight：line-height 为 normal 时用按字号分档的系数，
+不读字体的 hhea 指标，所以另按 (line-height 写法, 字体路径) 汇总，看纵向误差主要来自哪条路径。
+分组统计用 np.unique + np.bincount 整列计算。Chrome 里折成多行的文本（高度超过 1.5 倍行高，line-height 为 normal 时行高按 1.2 倍字号估算）
+不参与误差统计，只计数。
+textContent 不以前缀开头、只是包含它的元素（比如前缀只剩 "的div"）可能配错，这样的配对单独列出，也不参与误差统计。
+日志中 [TEXT HEIGHT] 的原始行数与解析出的记录数不同时，报告里给出没能解析的条数。
+
+用法: python3 text_metrics.py element-rects.json computed-styles-structured.json [zbrowser_output.txt] [--top 20]
+"""
+
+import argparse
+import json
+import re
+import sys
+
+import numpy as np
+
+from dump_snapshot import open_dump
+from element_store import ElementStore
+from zbrowser_log import TextHeightRecord, count_tags, iter_records
+
+STYLE_PROPERTIES = ('font-size', 'font-family', 'line-height', 'padding-top', 'padding-bottom',
+                    'border-top-width', 'border-bottom-width')
+# ZBrowser 只为这些父元素输出 [TEXT HEIGHT]（layout/block.zig）
+TEXT_PARENTS = ('BODY', 'H1', 'P')
+WRAP_RATIO = 1.5
+# line-height: normal 的行高按字号估算（Chrome 对常见字体取 hhea 指标，约 1.15 ~ 1.3 倍）
+NORMAL_LINE_HEIGHT = 1.2
+
+# 文字 -> 字体解析路径（见 render/cpu_backend.zig 的 tryLoad*Font）
+FONT_PATHS = {
+    'cjk': 'cff.zig (NotoSansCJKSC / SourceHanSans)',
+    'arabic': 'ttf.zig (NotoSansArabic)',
+    'thai': 'ttf.zig (NotoSansThai)',
+    'latin': 'ttf.zig (默认字体)',
+}
+_SCRIPT_RANGES = (
+    (0x0600, 0x06FF, 'arabic'), (0x0750, 0x077F, 'arabic'), (0xFB50, 0xFDFF, 'arabic'), (0xFE70, 0xFEFF, 'arabic'),
+    (0x0E00, 0x0E7F, 'thai'),
+    (0x1100, 0x11FF, 'cjk'), (0x2E80, 0x9FFF, 'cjk'), (0xAC00, 0xD7AF, 'cjk'), (0xF900, 0xFAFF, 'cjk'),
+    (0xFF00, 0xFFEF, 'cjk'), (0x20000, 0x2FA1F, 'cjk'),
+)
+_BROKEN_CHAR_RE = re.compile('\ufffd\\??')
+
+
+def repair_preview(text):
+    """还原被当成 GBK 显示的 UTF-8 文本前缀，返回用来查找的候选（按优先顺序）
+
+    GBK 里没有对应字符的字节在 PowerShell 输出中变成了 '?'，还原后这个字符就丢了（'�' 或 '�?'），
+    20 字节截断也会切坏最后一个字符；在这些位置断开，取最长的一段完整文本。
+    坏掉的字符再多也只是断成更短的段，不整条放弃。
+    文本本来就不是乱码（UTF-8 日志）时还原结果没有意义，所以原文作为第二个候选。
+    """
+    repaired = text.encode('gbk', 'replace').decode('utf-8', 'replace')
+    segment = max((segment.strip() for segment in _BROKEN_CHAR_RE.split(repaired)), key=len)
+    candidates = [segment] if segment else []
+    if text.strip() and text.strip() != segment:
+        candidates.append(text.strip())
+    return candidates
+
+
+def script_of(text):
+    """按字符数最多的非拉丁文字分类；没有非拉丁字符时为 'latin'"""
+    counts = {}
+    for ch in text:
+        code = ord(ch)
+        if code < 0x0600:
+            continue
+        for start, end, script in _SCRIPT_RANGES:
+            if start <= code <= end:
+                counts[script] = counts.get(script, 0) + 1
+                break
+    return max(counts, key=counts.get) if counts else 'latin'
+
+
+def _px(value, default=0.0):
+    value = (value or '').strip()
+    if value.endswith('px'):
+        try:
+            return float(value[:-2])
+        except ValueError:
+            pass
+    return default
+
+
+def _first_family(value):
+    family = (value or '').split(',', 1)[0].strip().strip('"\'')
+    return family or '?'
+
+
+def line_height_mode(value):
+    """'normal' / 'px'（长度）/ 'number'（无单位倍数）"""
+    value = (value or '').strip()
+    if not value or value == 'normal':
+        return 'normal'
+    return 'px' if value.endswith('px') else 'number'
+
+
+def match_text_runs(records, store, styles_by_index):
+    """把 [TEXT HEIGHT] 记录配对到 Chrome 元素，返回 (配对结果列表, 没配上的记录列表)
+
+    候选元素：textContent 以该前缀开头（或包含它）、且是 ZBrowser 会输出文本高度的父元素；
+    同一前缀出现多次时优先取上一条配对之后的元素（按文档顺序依次分配）。配对结果的 'match' 为 'prefix'（textContent 以前缀开头）
+    或 'substring'（只是包含前缀，可能配错）。
+    """
+    used = set()
+    last = -1
+    runs = []
+    unmatched = []
+    for record in records:
+        for prefix in repair_preview(record.text):
+            positions = [pos for pos in store.find_positions(text_content_substring=prefix)
+                         if pos not in used and store.items[pos]['element'].get('tagName') in TEXT_PARENTS]
+            if positions:
+                break
+        else:
+            unmatched.append(record)
+            continue
+        # 日志按文档顺序输出，上一条配对之后的元素优先（还原后只剩两三个字的前缀常有多个候选）；
+        # 其次以前缀开头的（直接包含这段文本），BODY 包含所有文本，排在 P / H1 之后，最后按文档顺序
+        pos = min(positions, key=lambda p: (
+            p < last, not store.items[p]['element'].get('textContent', '').lstrip().startswith(prefix),
+            store.items[p]['element'].get('tagName') == 'BODY', p))
+        used.add(pos)
+        last = pos
+
+        item = store.items[pos]
+        elem = item['element']
+        match = 'prefix' if elem.get('textContent', '').lstrip().startswith(prefix) else 'substring'
+        styles = styles_by_index.get(elem.get('index'), {})
+        chrome_height = item['rect']['height'] - sum(_px(styles.get(name)) for name in STYLE_PROPERTIES[3:])
+        font_size = _px(styles.get('font-size'), record.font_size)
+        chrome_line_height = _px(styles.get('line-height'), None)
+        mode = line_height_mode(styles.get('line-height'))
+        if chrome_line_height is None:
+            if mode == 'number':
+                chrome_line_height = float(styles['line-height']) * font_size
+            else:
+                chrome_line_height = NORMAL_LINE_HEIGHT * font_size
+        wrapped = chrome_height > WRAP_RATIO * chrome_line_height
+        script = script_of(elem.get('textContent', '')[:200] or prefix)
+        runs.append({
+            'line': record.line,
+            'text': prefix,
+            'index': elem.get('index'),
+            'tag': elem.get('tagName', '').lower(),
+            'match': match,
+            'font_size': font_size,
+            'zb_font_size': record.font_size,
+            'family': _first_family(styles.get('font-family')),
+            'script': script,
+            'font_path': FONT_PATHS[script],
+            'line_height_mode': mode,
+            'chrome_height': chrome_height,
+            'zb_height': record.height,
+            'error': record.height - chrome_height,
+            'wrapped': wrapped,
+        })
+    return runs, unmatched
+
+
+def group_errors(runs, keys):
+    """按 keys 分组统计误差（ZBrowser - Chrome），返回按绝对误差总和降序的分组列表"""
+    runs = [run for run in runs if not run['wrapped']]
+    if not runs:
+        return []
+    labels = [tuple(run[key] for key in keys) for run in runs]
+    unique, inverse = np.unique(np.array([repr(label) for label in labels]), return_inverse=True)
+    first = {}
+    for row, group in enumerate(inverse):
+        first.setdefault(group, labels[row])
+    error = np.array([run['error'] for run in runs])
+    count = np.bincount(inverse, minlength=len(unique))
+    total = np.bincount(inverse, weights=error, minlength=len(unique))
+    total_abs = np.bincount(inverse, weights=np.abs(error), minlength=len(unique))
+    max_abs = np.zeros(len(unique))
+    np.maximum.at(max_abs, inverse, np.abs(error))
+    all_abs = total_abs.sum()
+
+    order = np.argsort(-total_abs, kind='stable')
+    return [{
+        'key': dict(zip(keys, first[group])),
+        'count': int(count[group]),
+        'mean': float(total[group] / count[group]),
+        'mean_abs': float(total_abs[group] / count[group]),
+        'max_abs': float(max_abs[group]),
+        'share': float(total_abs[group] / all_abs) if all_abs else 0.0,
+    } for group in order]
+
+
+def print_text_report(runs, unmatched, top=20, tolerance=0.5, raw_count=None):
+    """raw_count: 日志中 [TEXT HEIGHT] 的原始行数（读标准输入时为 None，不核对）"""
+    substring = [run for run in runs if run['match'] != 'prefix']
+    compared = [run for run in runs if not run['wrapped'] and run['match'] == 'prefix']
+    wrapped = sum(1 for run in runs if run['wrapped'] and run['match'] == 'prefix')
+    parsed = len(runs) + len(unmatched)
+    print("=" * 100)
+    print("文本高度对比（ZBrowser [TEXT HEIGHT] - Chrome content 高度）")
+    print("=" * 100)
+    if raw_count is None:
+        print(f"文本记录: {parsed}（读标准输入，未与日志原始行数核对）")
+    else:
+        print(f"日志中 [TEXT HEIGHT]: {raw_count} 行, 解析出: {parsed}, 无法解析: {max(raw_count - parsed, 0)}")
+    print(f"前缀配对: {len(runs) - len(substring)}, 子串配对（不计入）: {len(substring)}, 未配对: {len(unmatched)}, "
+          f"Chrome 中折行（不计入）: {wrapped}")
+    if compared:
+        error = np.array([run['error'] for run in compared])
+        print(f"超出容差 {tolerance}px: {int((np.abs(error) > tolerance).sum())} / {len(compared)}, "
+              f"平均误差 {error.mean():+.2f}px, 平均绝对误差 {np.abs(error).mean():.2f}px")
+    mismatched = sum(1 for run in compared if abs(run['zb_font_size'] - run['font_size']) > 0.05)
+    if mismatched:
+        print(f"ZBrowser 字号与 Chrome 不同: {mismatched} 条（文本高度按父元素标签估算字号）")
+
+    sections = (
+        ("按 line-height 写法和字体路径", ('line_height_mode', 'font_path')),
+        ("按字号 / 字体族 / 文字", ('font_size', 'family', 'script')),
+    )
+    for title, keys in sections:
+        groups = group_errors(compared, keys)
+        print(f"\n{title}（按绝对误差总和排序）:")
+        print(f"  {'分组':<58} {'数量':>5} {'平均误差':>9} {'平均|误差|':>10} {'最大|误差|':>10} {'占比':>7}")
+        for group in groups[:top]:
+            label = ' / '.join(f"{value:g}px" if key == 'font_size' else str(value)
+                               for key, value in group['key'].items())
+            print(f"  {label[:58]:<58} {group['count']:>5} {group['mean']:>+9.2f} {group['mean_abs']:>10.2f} "
+                  f"{group['max_abs']:>10.2f} {group['share']:>7.1%}")
+
+    if compared:
+        print("\n误差最大的文本:")
+        for run in sorted(compared, key=lambda r: -abs(r['error']))[:top]:
+            print(f"  line {run['line']:>6}  <{run['tag']}> #{run['index']:<5} {run['text'][:20]:<20}  "
+                  f"Chrome {run['chrome_height']:7.2f}  ZBrowser {run['zb_height']:7.2f}  {run['error']:+7.2f}")
+    if substring:
+        print("\n子串配对（textContent 只是包含前缀，可能配错，不计入统计）:")
+        for run in substring[:top]:
+            print(f"  line {run['line']:>6}  <{run['tag']}> #{run['index']:<5} {run['text'][:20]:<20}  "
+                  f"Chrome {run['chrome_height']:7.2f}  ZBrowser {run['zb_height']:7.2f}  {run['error']:+7.2f}")
+    for record in unmatched[:top]:
+        print(f"  未配对: line {record.line}  \"{record.text}\"")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="按字号 / 字体 / 文字汇总 ZBrowser 文本高度与 Chrome 的误差")
+    arg_parser.add_argument('rects_file', help="Chrome 导出的 element-rects.json")
+    arg_parser.add_argument('styles_file', help="Chrome 导出的 computed-styles-structured.json")
+    arg_parser.add_argument('zbrowser_output', nargs='?', help="ZBrowser 的输出（默认读标准输入）")
+    arg_parser.add_argument('--tolerance', type=float, default=0.5, help="误差容差（px）")
+    arg_parser.add_argument('--top', type=int, default=20, help="每个表显示的行数")
+    arg_parser.add_argument('--json', default=None, help="把逐条配对结果写入 JSON")
+    args = arg_parser.parse_args()
+
+    try:
+        store = ElementStore.load(args.rects_file, ())
+        style_items = open_dump(args.styles_file, STYLE_PROPERTIES)
+        records = [r for r in iter_records(args.zbrowser_output or sys.stdin.buffer)
+                   if isinstance(r, TextHeightRecord)]
+        raw_count = count_tags(args.zbrowser_output)['[TEXT HEIGHT]'] if args.zbrowser_output else None
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    styles_by_index = {item['element'].get('index'): item['styles'] for item in style_items}
+    runs, unmatched = match_text_runs(records, store, styles_by_index)
+    print_text_report(runs, unmatched, args.top, args.tolerance, raw_count)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(runs, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+监视模式的一致性测试：文件一变就重新渲染、重新对比受影响的页面
+
+监视的文件：
+  - ZBrowser 可执行文件：变化（zig build 完成）后重跑所有页面，最近失败过的页面排在最前面
+  - 页面的 HTML、element-rects.json、computed-styles-structured.json（或它们的 .zbsnap 快照）：
+    只重跑这个页面
+页面在进程池里并行运行（复用 batch_conformance.run_page），结果按完成顺序实时输出，
+并标出状态变化（通过 -> 失败为回归，失败 -> 通过为修复）。
+
+Linux 上通过 ctypes 调用 inotify 监视文件所在的目录（编辑器和 zig build 常用改名替换文件，
+直接监视文件会丢事件）；没有 inotify 时退回到定时 stat 轮询。
+一次保存或一次构建往往产生一串事件，收到事件后等到安静 --debounce 秒再开始运行。
+
+用法:
+  python3 watch_conformance.py test_page.html                  # 单个页面（导出在同一目录）
+  python3 watch_conformance.py <corpus_dir> [--jobs N]         # 整个语料库（目录结构同 batch_conformance.py）
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from batch_conformance import DEFAULT_BINARY, RECTS_FILE, STYLES_FILE, Page, discover_pages, page_result, run_page
+from dump_snapshot import dump_exists, snapshot_path_for
+
+DEFAULT_DEBOUNCE = 0.2
+POLL_INTERVAL = 0.5
+
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_ATTRIB
+_EVENT = struct.Struct('iIII')
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class InotifyWatcher:
+    """用 inotify 监视一组文件（实际监视它们所在的目录，按文件名过滤）"""
+
+    def __init__(self, paths):
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError("找不到 libc")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("libc 不支持 inotify")
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+
+        self.paths = set(paths)
+        self._dirs = {}
+        for dir_path in sorted({os.path.dirname(path) for path in self.paths}):
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(dir_path), WATCH_MASK)
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"无法监视 '{dir_path}'")
+            self._dirs[wd] = dir_path
+
+    def read(self, timeout):
+        """等待最多 timeout 秒，返回这段时间里变化了的被监视文件"""
+        changed = set()
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changed
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, _, _, name_len = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + name_len].rstrip(b'\0')
+            offset += name_len
+            path = os.path.join(self._dirs.get(wd, ''), os.fsdecode(name))
+            if path in self.paths:
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """没有 inotify 时的退化实现：定时比较文件的 (mtime, 大小)"""
+
+    def __init__(self, paths, interval=POLL_INTERVAL):
+        self.paths = set(paths)
+        self.interval = interval
+        self._stamps = {path: _file_stamp(path) for path in self.paths}
+
+    def read(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        changed = set()
+        for path in self.paths:
+            stamp = _file_stamp(path)
+            if stamp != self._stamps[path]:
+                self._stamps[path] = stamp
+                changed.add(path)
+        return changed
+
+    def close(self):
+        pass
+
+
+def open_watcher(paths, poll=False):
+    """优先用 inotify，不可用时退回轮询"""
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(paths)
+        except OSError as e:
+            print(f"Warning: inotify 不可用（{e}），改为每 {POLL_INTERVAL}s 轮询", file=sys.stderr)
+    return PollingWatcher(paths)
+
+
+def wait_for_changes(watcher, debounce=DEFAULT_DEBOUNCE):
+    """阻塞到有文件变化，再等到连续 debounce 秒没有新变化，返回变化的文件集合"""
+    changed = set()
+    while not changed:
+        changed = watcher.read(3600.0)
+    while True:
+        more = watcher.read(debounce)
+        if not more:
+            return changed
+        changed |= more
+
+
+def page_files(page):
+    """页面的所有输入文件（导出同时监视 JSON 和快照）"""
+    files = [page.html]
+    for dump in (page.rects, page.styles):
+        if dump is not None:
+            files += [dump, snapshot_path_for(dump)]
+    return [os.path.abspath(path) for path in files]
+
+
+def single_page(html):
+    """把单个 HTML 文件当作一个页面，Chrome 导出在同一目录"""
+    dir_path = os.path.dirname(os.path.abspath(html))
+    styles = os.path.join(dir_path, STYLES_FILE)
+    return Page(os.path.basename(html), html, os.path.join(dir_path, RECTS_FILE),
+                styles if dump_exists(styles) else None)
+
+
+def schedule(pages, last_failed):
+    """运行顺序：最近失败过的页面在前（按失败时间从近到远），从没失败过的按名字排在后面"""
+    return sorted(pages, key=lambda page: (-last_failed.get(page.name, 0.0), page.name))
+
+
+def _result_line(result, previous):
+    detail = result['error'] if result['status'] == 'error' else f"max error {result['max_error']:.2f}px"
+    if result['status'] == 'fail' and result.get('worst'):
+        detail += f"  {result['worst']['path']}"
+    change = ''
+    if previous == 'pass' and result['status'] != 'pass':
+        change = '  <- 回归'
+    elif previous in ('fail', 'error') and result['status'] == 'pass':
+        change = '  <- 修复'
+    return (f"[{time.strftime('%H:%M:%S')}] {result['status'].upper():<5} {result['page']}  "
+            f"{detail} ({result['seconds']:.2f}s){change}")
+
+
+def run_round(pool, pages, binary, tolerance, timeout, status, last_failed):
+    """运行一轮并实时输出，更新每个页面的状态和最近失败时间"""
+    started = time.monotonic()
+    futures = {pool.submit(run_page, page, binary, tolerance, timeout): page for page in pages}
+    counts = {'pass': 0, 'fail': 0, 'error': 0}
+    for future in as_completed(futures):
+        result, _ = page_result(future, futures[future])
+        print(_result_line(result, status.get(result['page'])), flush=True)
+        status[result['page']] = result['status']
+        counts[result['status']] += 1
+        if result['status'] != 'pass':
+            last_failed[result['page']] = time.time()
+    print(f"—— {len(pages)} 个页面: 通过 {counts['pass']}, 失败 {counts['fail']}, 出错 {counts['error']}"
+          f"（{time.monotonic() - started:.2f}s）", flush=True)
+
+
+def watch(pages, binary, jobs=None, tolerance=0.5, timeout=120.0, debounce=DEFAULT_DEBOUNCE, poll=False,
+          initial=True):
+    """监视循环（Ctrl+C 退出）"""
+    owners = {}
+    for page in pages:
+        for path in page_files(page):
+            owners.setdefault(path, []).append(page)
+    watcher = open_watcher([binary, *owners], poll)
+    status = {}
+    last_failed = {}
+    print(f"监视 {len(pages)} 个页面和 {binary}（{type(watcher).__name__}），Ctrl+C 退出", flush=True)
+
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            if initial:
+                run_round(pool, pages, binary, tolerance, timeout, status, last_failed)
+            while True:
+                changed = wait_for_changes(watcher, debounce)
+                if binary in changed:
+                    if not os.access(binary, os.X_OK):
+                        # 构建失败或还没写完，等下一次变化
+                        print(f"[{time.strftime('%H:%M:%S')}] {binary} 不可执行，跳过", flush=True)
+                        continue
+                    print(f"\n[{time.strftime('%H:%M:%S')}] ZBrowser 已更新，重跑全部页面", flush=True)
+                    todo = pages
+                else:
+                    names = {page.name for path in changed for page in owners.get(path, [])}
+                    todo = [page for page in pages if page.name in names]
+                    print(f"\n[{time.strftime('%H:%M:%S')}] 输入变化，重跑: {', '.join(sorted(names))}", flush=True)
+                run_round(pool, schedule(todo, last_failed), binary, tolerance, timeout, status, last_failed)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="监视 ZBrowser 和测试页面，变化后只重跑受影响的页面")
+    arg_parser.add_argument('target', help="单个 HTML 页面（导出在同一目录）或语料库目录")
+    arg_parser.add_argument('--binary', default=DEFAULT_BINARY, help=f"ZBrowser 可执行文件（默认 {DEFAULT_BINARY}）")
+    arg_parser.add_argument('--jobs', '-j', type=int, default=None, help="并行进程数（默认 CPU 核数）")
+    arg_parser.add_argument('--tolerance', type=float, default=0.5, help="误差容差（px）")
+    arg_parser.add_argument('--timeout', type=float, default=120.0, help="单个页面的超时时间（秒）")
+    arg_parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                            help=f"收到变化后等待安静的时间（秒，默认 {DEFAULT_DEBOUNCE}）")
+    arg_parser.add_argument('--poll', action='store_true', help="不用 inotify，改为轮询")
+    arg_parser.add_argument('--no-initial', action='store_true', help="启动时不先跑一遍所有页面")
+    args = arg_parser.parse_args()
+
+    if os.path.isdir(args.target):
+        pages = discover_pages(args.target)
+        if not pages:
+            print(f"Error: '{args.target}' 中没有找到带 {RECTS_FILE} 的页面")
+            sys.exit(1)
+    elif os.path.isfile(args.target):
+        page = single_page(args.target)
+        if not dump_exists(page.rects):
+            print(f"Error: 找不到 '{page.rects}'（先用 get_element_rects.js 导出）")
+            sys.exit(1)
+        pages = [page]
+    else:
+        print(f"Error: '{args.target}' 不存在")
+        sys.exit(1)
+    if not os.access(args.binary, os.X_OK):
+        print(f"Error: 找不到 ZBrowser 可执行文件 '{args.binary}'（先运行 zig build，或用 --binary 指定）")
+        sys.exit(1)
+
+    watch(pages, os.path.abspath(args.binary), args.jobs, args.tolerance, args.timeout, args.debounce, args.poll,
+          not args.no_initial)
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+ZBrowser 布局调试输出的流式解析器
+
+输入可以是文件路径或二进制流（管道），按块增量读取，内存占用与日志大小无关。
+编码自动识别：UTF-8（可带 BOM）、带 BOM 的 UTF-16（PowerShell 的 `> output.txt`）。
+PowerShell 会把长行按控制台宽度折行，UTF-16 日志默认会把折行拼回去。
+
+所有记录类型共用一个预编译的组合正则，每行只匹配一次：
+  [STYLE] h1 font-size parsed: 32.0px                  -> StyleRecord
+  [LAYOUT] Element: body, is_root: false + 子行          -> BoxRecord(source='layout')
+  === Element Layout Info === / Tag: / Content: ...     -> BoxRecord(source='info')
+  [LAYOUT] Child element: h1 (parent: body) + 子行       -> ChildRecord
+  [UPDATE Y] child: h1, content_height=...              -> UpdateYRecord
+  [TEXT HEIGHT] text: "...", font_size=...              -> TextHeightRecord
+  [CONTAINING BLOCK] body.content.width=...             -> ContainingBlockRecord
+  [WIDTH DEBUG] h1: containing_block.width=...          -> WidthRecord
+
+用法: python3 zbrowser_log.py <zbrowser_output.txt>   （不带参数时读标准输入）
+打印各类记录解析出的数量，并与日志中该标记的原始行数（相当于 grep -c）核对，有记录没解析出来时退出码为 1。
+"""
+
+import io
+import re
+import sys
+from collections import Counter
+from typing import NamedTuple, Optional, Tuple
+
+
+class StyleRecord(NamedTuple):
+    line: int
+    tag: str
+    property: str
+    value: str
+
+
+class BoxRecord(NamedTuple):
+    line: int
+    source: str
+    tag: str
+    id: str
+    class_name: str
+    is_root: Optional[bool]
+    margin: Optional[Tuple[float, float, float, float]]
+    border: Optional[Tuple[float, float, float, float]]
+    padding: Optional[Tuple[float, float, float, float]]
+    content: Optional[Tuple[float, float, float, float]]
+    containing_block: Optional[Tuple[float, float]]
+
+
+class ChildRecord(NamedTuple):
+    line: int
+    tag: str
+    parent: str
+    x: Optional[float]
+    y: Optional[float]
+    old_x: Optional[float]
+    old_y: Optional[float]
+
+
+class UpdateYRecord(NamedTuple):
+    line: int
+    tag: str
+    content_height: float
+    margin_bottom: float
+    total_height: float
+    y_after: float
+
+
+class TextHeightRecord(NamedTuple):
+    line: int
+    text: str
+    font_size: float
+    line_height: float
+    height: float
+
+
+class ContainingBlockRecord(NamedTuple):
+    line: int
+    parent_width: float
+    child_width: float
+
+
+class WidthRecord(NamedTuple):
+    line: int
+    tag: str
+    containing_width: float
+    available_width: float
+    calculated_width: float
+
+
+NUM = r'(-?(?:\d+(?:\.\d*)?|inf|nan))'
+
+_PATTERN = re.compile('|'.join((
+    r'(?P<STYLE>\[STYLE\] (?P<st_tag>\S+) (?P<st_prop>[\w-]+) parsed: (?P<st_value>.*))',
+    r'(?P<ELEMENT>\[LAYOUT\] Element: (?P<le_tag>\S+), is_root: (?P<le_root>true|false))',
+    r'(?P<CHILD>\[LAYOUT\] Child element: (?P<ce_tag>\S+) \(parent: (?P<ce_parent>[^)]*)\))',
+    r'(?P<EDGE>(?P<ed_name>[Mm]argin|[Bb]order|[Pp]adding): top=' + NUM + ', right=' + NUM
+    + ', bottom=' + NUM + ', left=' + NUM + ')',
+    r'(?P<CONTENT>[Cc]ontent: x=' + NUM + r',\s*y=' + NUM + r',\s*width=' + NUM + r',\s*height=' + NUM + ')',
+    r'(?P<CONTAINING>containing_block: width=' + NUM + ', height=' + NUM + ')',
+    r'(?P<CHILD_CONTENT>child\.content: x=' + NUM + r' \(was ' + NUM + r'\), y=' + NUM + r' \(was ' + NUM + r'\))',
+    r'(?P<UPDATE_Y>\[UPDATE Y\] child: (?P<uy_tag>\S+), content_height=' + NUM + ', margin.bottom=' + NUM
+    + ', total_height=' + NUM + ', y after=' + NUM + ')',
+    # 预览是文本的前 20 个字节，切断的 UTF-8 字符在 GBK 控制台上会吃掉后面的 '.'，所以省略号可能不足三个
+    r'(?P<TEXT_HEIGHT>\[TEXT HEIGHT\] text: "(?P<th_text>[\s\S]*?)\.{0,3}", font_size=' + NUM + ', line_height=' + NUM
+    + ', height=' + NUM + ')',
+    r'(?P<CONTAINING_BLOCK>\[CONTAINING BLOCK\] body\.content\.width=' + NUM
+    + ', child_containing_block\.width=' + NUM + ')',
+    r'(?P<WIDTH>\[WIDTH DEBUG\] (?P<wd_tag>\S+): containing_block\.width=' + NUM + ', available_width=' + NUM
+    + ', calculated_width=' + NUM + ')',
+    r'(?P<INFO>=== Element Layout Info ===)',
+    r'(?P<TAG>Tag: (?P<tg_value>.*))',
+    r'(?P<ID>ID: (?P<id_value>.*))',
+    r'(?P<CLASS>Class: (?P<cl_value>.*))',
+    r'(?P<END>={10,})',
+)))
+
+# 只有在列 0 出现、且不是下面这些开头的行，才被认为是 PowerShell 折行产生的续行
+# （'所在位置' / 'At line' / '+ ' 是 PowerShell 给第一行 stderr 附加的错误记录；
+# 折行可能正好断在 '=' 前面，所以只认完整的 '=== Element Layout Info ===' 和 '=====' 分隔行）
+_LINE_STARTS = (
+    '[', '=== Element Layout Info ===', '=' * 10, 'Tag:', 'ID:', 'Class:', 'Box Model:', 'Computed Styles:', 'DEBUG:', 'Body ', 'Warning:',
+    '所在位置', 'At line', '+ ',
+)
+
+
+def _number_groups():
+    """计算每个记录类型的数字捕获组编号
+
+    组合正则里的 NUM 是匿名组，它们属于哪个记录类型由前面最近的大写命名组决定。
+    """
+    named = {index: name for name, index in _PATTERN.groupindex.items()}
+    groups = {}
+    current = None
+    for index in range(1, _PATTERN.groups + 1):
+        name = named.get(index)
+        if name is None:
+            groups.setdefault(current, []).append(index)
+        elif name.isupper():
+            current = name
+    return groups
+
+
+_NUM_GROUPS = _number_groups()
+
+# 文本预览里的换行会把 [TEXT HEIGHT] 记录拆成多行，预览最多 20 个字节，续行不会超过这么多
+MAX_TEXT_LINES = 20
+
+# 各记录类型在日志中的起始标记，count_tags() 用它们统计原始行数
+RECORD_TAGS = (
+    '[STYLE]', '[LAYOUT] Element:', '[LAYOUT] Child element:', '=== Element Layout Info ===',
+    '[UPDATE Y]', '[TEXT HEIGHT]', '[CONTAINING BLOCK]', '[WIDTH DEBUG]',
+)
+
+
+def _detect_encoding(head):
+    """根据文件开头的字节判断编码，返回 (encoding, is_utf16)"""
+    if head.startswith(b'\xff\xfe') or head.startswith(b'\xfe\xff'):
+        return 'utf-16', True
+    if head.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig', False
+    # 没有 BOM 的 UTF-16LE：ASCII 字符的高字节全是 0
+    if len(head) >= 4 and head[1] == 0 and head[3] == 0 and head[0] != 0:
+        return 'utf-16-le', True
+    return 'utf-8', False
+
+
+def open_log(source):
+    """打开日志（路径或二进制流），返回 (文本流, 是否为 UTF-16)"""
+    if isinstance(source, (str, bytes)) or hasattr(source, '__fspath__'):
+        raw = open(source, 'rb')
+    else:
+        raw = source
+    if not hasattr(raw, 'peek'):
+        raw = io.BufferedReader(raw)
+    encoding, is_utf16 = _detect_encoding(raw.peek(4)[:4])
+    return io.TextIOWrapper(raw, encoding=encoding, errors='replace', newline=None), is_utf16
+
+
+def iter_lines(stream, unwrap=False):
+    """逐行产出 (行号, 行内容)；unwrap 时把 PowerShell 折行拼回原来的一行"""
+    if not unwrap:
+        for line_no, line in enumerate(stream, 1):
+            yield line_no, line.rstrip('\r\n')
+        return
+
+    pending = None
+    pending_no = 0
+    for line_no, line in enumerate(stream, 1):
+        line = line.rstrip('\r\n')
+        if (pending and line and not line[0].isspace() and not line.startswith(_LINE_STARTS)):
+            pending += line
+            continue
+        if pending is not None:
+            yield pending_no, pending
+        pending, pending_no = line, line_no
+    if pending is not None:
+        yield pending_no, pending
+
+
+def _floats(match, kind):
+    return [float(match.group(i)) for i in _NUM_GROUPS[kind]]
+
+
+def iter_records(source, unwrap=None):
+    """流式解析 ZBrowser 输出，逐个产出类型化的记录
+
+    source: 日志文件路径或二进制流；unwrap 为 None 时 UTF-16 日志自动拼接折行
+    """
+    stream, is_utf16 = open_log(source)
+    if unwrap is None:
+        unwrap = is_utf16
+
+    box = None    # 正在收集子行的 BoxRecord 字段
+    child = None  # 正在等待 child.content 的 ChildRecord 字段
+    text = None   # 被预览里的换行截断的 [TEXT HEIGHT] 记录：[行号, 已读到的内容, 续行数]
+    match_line = _PATTERN.match
+
+    for line_no, raw_line in iter_lines(stream, unwrap):
+        line = raw_line.strip()
+        if text is not None:
+            # 续行一直拼到记录完整，或者遇到下一条记录的开头为止
+            if line.startswith(('[', '=== Element Layout Info ===')) or text[2] >= MAX_TEXT_LINES:
+                text = None
+            else:
+                text[1] += '\n' + raw_line.rstrip()
+                text[2] += 1
+                m = match_line(text[1])
+                if m is not None:
+                    yield TextHeightRecord(text[0], m.group('th_text'), *_floats(m, 'TEXT_HEIGHT'))
+                    text = None
+                continue
+        if not line:
+            continue
+        m = match_line(line)
+        if m is None:
+            if line.startswith('[TEXT HEIGHT] text: "'):
+                if box is not None:
+                    yield BoxRecord(**box)
+                    box = None
+                if child is not None:
+                    yield ChildRecord(child['line'], child['tag'], child['parent'], None, None, None, None)
+                    child = None
+                text = [line_no, line, 0]
+                continue
+            # PowerShell 会把第一行 stderr 输出加上 "xxx.exe : " 前缀
+            prefix = line.find(' : [')
+            if prefix < 0:
+                continue
+            m = match_line(line, prefix + 3)
+            if m is None:
+                continue
+        kind = m.lastgroup
+
+        if kind == 'EDGE' or kind == 'CONTENT' or kind == 'CONTAINING':
+            if box is None:
+                continue
+            if kind == 'EDGE':
+                box[m.group('ed_name').lower()] = tuple(_floats(m, 'EDGE'))
+            elif kind == 'CONTENT':
+                box['content'] = tuple(_floats(m, 'CONTENT'))
+            else:
+                box['containing_block'] = tuple(_floats(m, 'CONTAINING'))
+            continue
+
+        if kind == 'CHILD_CONTENT':
+            if child is not None:
+                x, old_x, y, old_y = _floats(m, 'CHILD_CONTENT')
+                yield ChildRecord(child['line'], child['tag'], child['parent'], x, y, old_x, old_y)
+                child = None
+            continue
+
+        if kind == 'TAG' or kind == 'ID' or kind == 'CLASS':
+            if box is None or box['source'] != 'info':
+                continue
+            if kind == 'TAG':
+                box['tag'] = m.group('tg_value').strip()
+            elif kind == 'ID':
+                box['id'] = m.group('id_value').strip()
+            else:
+                box['class_name'] = m.group('cl_value').strip()
+            continue
+
+        # 其余记录都会结束正在收集的盒子
+        if box is not None:
+            yield BoxRecord(**box)
+            box = None
+        if child is not None:
+            yield ChildRecord(child['line'], child['tag'], child['parent'], None, None, None, None)
+            child = None
+
+        if kind == 'ELEMENT':
+            box = _new_box(line_no, 'layout', m.group('le_tag'), m.group('le_root') == 'true')
+        elif kind == 'INFO':
+            box = _new_box(line_no, 'info', '', None)
+        elif kind == 'CHILD':
+            child = {'line': line_no, 'tag': m.group('ce_tag'), 'parent': m.group('ce_parent')}
+        elif kind == 'STYLE':
+            yield StyleRecord(line_no, m.group('st_tag'), m.group('st_prop'), m.group('st_value').strip())
+        elif kind == 'UPDATE_Y':
+            yield UpdateYRecord(line_no, m.group('uy_tag'), *_floats(m, 'UPDATE_Y'))
+        elif kind == 'TEXT_HEIGHT':
+            yield TextHeightRecord(line_no, m.group('th_text'), *_floats(m, 'TEXT_HEIGHT'))
+        elif kind == 'CONTAINING_BLOCK':
+            yield ContainingBlockRecord(line_no, *_floats(m, 'CONTAINING_BLOCK'))
+        elif kind == 'WIDTH':
+            yield WidthRecord(line_no, m.group('wd_tag'), *_floats(m, 'WIDTH'))
+
+    if box is not None:
+        yield BoxRecord(**box)
+    if child is not None:
+        yield ChildRecord(child['line'], child['tag'], child['parent'], None, None, None, None)
+
+
+def tag_of(record):
+    """记录在日志中对应的起始标记（RECORD_TAGS 之一）"""
+    if isinstance(record, BoxRecord):
+        return '[LAYOUT] Element:' if record.source == 'layout' else '=== Element Layout Info ==='
+    return _TAG_BY_TYPE[type(record)]
+
+
+def count_tags(source):
+    """统计每个记录标记在日志中的原始行数，用来核对有没有记录被解析器丢掉
+
+    标记必须出现在行首（允许缩进和 PowerShell 的 "xxx.exe : " 前缀）；
+    PowerShell 错误记录里 "+ CategoryInfo : ...([STYLE] ...)" 这样的回显是同一条记录，不重复计数。
+    """
+    stream, _ = open_log(source)
+    counts = Counter()
+    with stream:
+        for line in stream:
+            line = line.strip()
+            prefix = line.find(' : [')
+            if prefix >= 0 and not line.startswith('+ '):
+                line = line[prefix + 3:]
+            if line.startswith(('[', '=== ')):
+                for tag in RECORD_TAGS:
+                    if line.startswith(tag):
+                        counts[tag] += 1
+                        break
+    return counts
+
+
+def _new_box(line_no, source, tag, is_root):
+    return {
+        'line': line_no, 'source': source, 'tag': tag, 'id': '', 'class_name': '',
+        'is_root': is_root, 'margin': None, 'border': None, 'padding': None,
+        'content': None, 'containing_block': None,
+    }
+
+
+_TAG_BY_TYPE = {
+    StyleRecord: '[STYLE]',
+    ChildRecord: '[LAYOUT] Child element:',
+    UpdateYRecord: '[UPDATE Y]',
+    TextHeightRecord: '[TEXT HEIGHT]',
+    ContainingBlockRecord: '[CONTAINING BLOCK]',
+    WidthRecord: '[WIDTH DEBUG]',
+}
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        parsed = Counter(tag_of(record) for record in iter_records(sys.argv[1]))
+        raw = count_tags(sys.argv[1])
+    else:
+        # 标准输入只能读一遍，无法核对原始行数
+        parsed = Counter(tag_of(record) for record in iter_records(sys.stdin.buffer))
+        raw = parsed
+    missing = 0
+    for tag in RECORD_TAGS:
+        if not raw[tag] and not parsed[tag]:
+            continue
+        mark = '✓' if parsed[tag] == raw[tag] else '✗'
+        print(f"{mark} {tag} 解析 {parsed[tag]} / 日志中 {raw[tag]} 行")
+        missing += max(raw[tag] - parsed[tag], 0)
+    if missing:
+        print(f"Error: {missing} 条记录没能解析")
+        sys.exit(1)